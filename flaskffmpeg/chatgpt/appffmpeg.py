@@ -1,8 +1,17 @@
 import os
+import json
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
 import uuid
-from flask import Flask, request, jsonify, send_from_directory, render_template
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, send_from_directory, render_template, Response
 import ffmpeg
 import pprint
+import re
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
@@ -13,11 +22,110 @@ app.config['JSON_SORT_KEYS'] = False  # on garde l'ordre lisible
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
+PREVIEW_DURATION = 3  # secondes rendues en mode preview
+
+# Proxies basse résolution (360p, GOP court) utilisés pour la preview
+app.config['PROXY_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'proxies')
+os.makedirs(app.config['PROXY_FOLDER'], exist_ok=True)
+PROXY_HEIGHT = 360
+PROXY_GOP = 12
+PROXIES = {}  # chemin source -> {"state", "path", "factor"}
+
+# Jobs de rendu en cours / terminés, indexés par id (ordre de création)
+JOBS = {}
+JOBS_LOCK = threading.Lock()
+# Jobs terminés gardés pour /jobs/<id> : au plus JOB_HISTORY_SIZE, pendant JOB_TTL secondes
+JOB_HISTORY_SIZE = int(os.environ.get('JOB_HISTORY_SIZE', 200))
+JOB_TTL = int(os.environ.get('JOB_TTL', 3600))
+
+# Budget disque du cache de rendus (OUTPUT_FOLDER), 10 Go par défaut
+app.config['RENDER_CACHE_BYTES'] = int(os.environ.get('RENDER_CACHE_BYTES', 10 * 1024**3))
+# Mémoire des images sources décodées (aperçu image par image)
+app.config['FRAME_CACHE_BYTES'] = int(os.environ.get('FRAME_CACHE_BYTES', 256 * 1024**2))
+
+# Uploads par morceaux : taille max du fichier complet, taille conseillée d'un morceau
+app.config['MAX_UPLOAD_BYTES'] = int(os.environ.get('MAX_UPLOAD_BYTES', 20 * 1024**3))
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024
+app.config['UPLOAD_SESSION_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'sessions')
+os.makedirs(app.config['UPLOAD_SESSION_FOLDER'], exist_ok=True)
+UPLOAD_SESSIONS = {}  # id -> {"path", "size", "sha256", "offset", "hash", "lock"}
+UPLOAD_SESSIONS_LOCK = threading.Lock()
+
+# Format d'image fixe -> (encodeur ffmpeg, type MIME)
+FRAME_FORMATS = {
+    "jpeg": ("mjpeg", "image/jpeg"),
+    "webp": ("libwebp", "image/webp"),
+}
+
 
 ###########################
 # Helpers
 ###########################
 
+def start_proxy(path):
+    """
+    Encode en arrière-plan un proxy 360p à GOP court de la vidéo uploadée :
+    la preview le lit (et y seek) au lieu de décoder la source complète.
+    Un proxy déjà présent sur le disque (encodé avant un redémarrage) est
+    repris tel quel : seul le rapport de taille est recalculé.
+    """
+    proxy_path = os.path.join(app.config['PROXY_FOLDER'], os.path.splitext(os.path.basename(path))[0] + ".mp4")
+    PROXIES[path] = {"state": "pending", "path": proxy_path, "factor": 1.0}
+
+    def encode():
+        try:
+            probe = ffmpeg.probe(path)
+            video = next(st for st in probe["streams"] if st["codec_type"] == "video")
+            height = int(video["height"])
+            if not os.path.exists(proxy_path):
+                # encodé à côté puis renommé : un proxy interrompu n'est jamais repris
+                partial_path = proxy_path[:-4] + ".partial.mp4"
+                (
+                    ffmpeg
+                    .input(path)
+                    .video
+                    .filter("scale", -2, min(PROXY_HEIGHT, height))
+                    .output(partial_path, vcodec="libx264", preset="ultrafast", crf=30,
+                            g=PROXY_GOP, pix_fmt="yuv420p")
+                    .overwrite_output()
+                    .run(quiet=True)
+                )
+                os.replace(partial_path, proxy_path)
+            PROXIES[path].update(state="ready", factor=min(PROXY_HEIGHT, height) / height)
+        except (ffmpeg.Error, OSError, StopIteration, KeyError, ValueError):
+            PROXIES[path]["state"] = "failed"
+
+    threading.Thread(target=encode, daemon=True).start()
+
+
+def proxy_for(path):
+    """
+    Proxy prêt pour cette source, sinon None. Une source uploadée avant un
+    redémarrage n'est pas dans PROXIES : son proxy est alors retrouvé sur
+    le disque (ou encodé) en arrière-plan pour les previews suivantes.
+    """
+    proxy = PROXIES.get(path)
+    if proxy is None and os.path.exists(path):
+        start_proxy(path)
+    return proxy if proxy and proxy["state"] == "ready" else None
+
+
+def scale_px(value, factor, even=False):
+    """
+    Ramène une valeur en pixels de la source à la taille du proxy.
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    if factor == 1.0 or number <= 0:
+        return value
+    scaled = max(1, round(number * factor))
+    if even:
+        scaled = max(2, scaled - scaled % 2)
+    return scaled
+
+
 def save_upload(file_storage):
     """
     Sauvegarde le fichier uploadé et renvoie le chemin.
@@ -29,32 +137,17 @@ def save_upload(file_storage):
     return path, video_id
 
 
-def build_ffmpeg_pipeline(graph_json, preview=False):
+def ordered_node_ids(nodes):
     """
-    Transforme le graphe Drawflow (envoyé par le front) en pipeline ffmpeg-python.
-
-    graph_json = {
-      "nodes": {
-        "1": { "name": "input", "data": {"path": "..."} , "outputs": {"out": [{"node":"2","input":"in"}]} },
-        "2": { "name": "brightness", "data": {"brightness":0.2,"contrast":1.0}, ... },
-        "3": { "name": "output", "data": {} }
-      }
-    }
-
-    Idée:
-    - on va parcourir les nodes dans l'ordre du flux: input -> filtres -> output
-    - pour simplifier : on suppose une seule chaîne linéaire (pas de branchement/mixage audio compliqué)
+    Ordre de passage des nodes : on part du node 'input' et on suit
+    la première connexion de sortie de chaque node.
     """
-
-    nodes = graph_json.get("nodes", {})
-
     # Trouver le node "input"
     input_node_id = None
     for node_id, node in nodes.items():
         if node["name"] == "input":
             input_node_id = node_id
             break
-    pprint.pprint(input_node_id) 
 
     if input_node_id is None:
         raise ValueError("Graph invalide: aucun node 'input' trouvé.")
@@ -78,20 +171,43 @@ def build_ffmpeg_pipeline(graph_json, preview=False):
                 break
 
         current = next_id
-        # outputs = nodes[current].get("outputs", {})
-        # next_id = None
-        #  if "out" in outputs and len(outputs["out"]) > 0:
-            # On prend la première connexion
-        #     next_id = outputs["out"][0]["node"]
-        #  current = next_id
-    pprint.pprint(current) 
+
+    return ordered_nodes
+
+
+def build_ffmpeg_pipeline(graph_json, preview=False, out_name=None, input_kwargs=None, output_path=None,
+                          still_format=None, proxy=None):
+    """
+    Transforme le graphe Drawflow (envoyé par le front) en pipeline ffmpeg-python.
+
+    graph_json = {
+      "nodes": {
+        "1": { "name": "input", "data": {"path": "..."} , "outputs": {"out": [{"node":"2","input":"in"}]} },
+        "2": { "name": "brightness", "data": {"brightness":0.2,"contrast":1.0}, ... },
+        "3": { "name": "output", "data": {} }
+      }
+    }
+
+    Idée:
+    - on va parcourir les nodes dans l'ordre du flux: input -> filtres -> output
+    - pour simplifier : on suppose une seule chaîne linéaire (pas de branchement/mixage audio compliqué)
+
+    still_format ("jpeg" / "webp") : la chaîne est appliquée à une seule image
+    PPM lue sur stdin, et l'image résultante est écrite sur stdout.
+
+    proxy : proxy lu par la preview (résolu une fois par requête avec
+    proxy_for, le même que celui de la clé du cache), None = la source.
+    """
+
+    nodes = graph_json.get("nodes", {})
+    ordered_nodes = ordered_node_ids(nodes)
 
     # Maintenant ordered_nodes est typiquement ["1","2","3"] → input, filtre, output
     # On va générer la chaîne ffmpeg-python vidéo uniquement (sans audio pour l'instant)
 
     stream = None
     input_path = None
-    output_path = None
+    factor = 1.0  # rapport proxy / source pour les paramètres en pixels
 
     for idx, node_id in enumerate(ordered_nodes):
         node = nodes[node_id]
@@ -103,7 +219,19 @@ def build_ffmpeg_pipeline(graph_json, preview=False):
             input_path = data.get("path")
             if not input_path or not os.path.exists(input_path):
                 raise ValueError("Chemin d'entrée invalide ou manquant.")
-            stream = ffmpeg.input(input_path)
+            if still_format:
+                # image fixe déjà décodée, fournie sur stdin
+                stream = ffmpeg.input("pipe:", format="image2pipe", vcodec="ppm")
+                continue
+            if preview:
+                # preview : proxy basse résolution + seek à l'instant demandé ;
+                # la durée est aussi passée à l'entrée : le demuxer s'arrête
+                # à la fin de l'extrait au lieu de lire jusqu'au bout
+                if proxy:
+                    input_path, factor = proxy["path"], proxy["factor"]
+                input_kwargs = dict(input_kwargs or {}, ss=float(graph_json.get("preview_time") or 0),
+                                    t=PREVIEW_DURATION)
+            stream = ffmpeg.input(input_path, **(input_kwargs or {}))
 
         elif name == "brightness":
             # exemple filtre brightness/contrast => eq
@@ -118,10 +246,10 @@ def build_ffmpeg_pipeline(graph_json, preview=False):
 
         elif name == "crop":
             # crop: width, height, x, y
-            w = data.get("w", 640)
-            h = data.get("h", 360)
-            x = data.get("x", 0)
-            y = data.get("y", 0)
+            w = scale_px(data.get("w", 640), factor, even=True)
+            h = scale_px(data.get("h", 360), factor, even=True)
+            x = scale_px(data.get("x", 0), factor)
+            y = scale_px(data.get("y", 0), factor)
             stream = ffmpeg.crop(stream, x, y, w, h)
 
         elif name == "grayscale":
@@ -130,22 +258,27 @@ def build_ffmpeg_pipeline(graph_json, preview=False):
 
         elif name == "scale":
             # resize
-            width = data.get("width", 640)
-            height = data.get("height", 360)
+            width = scale_px(data.get("width", 640), factor, even=True)
+            height = scale_px(data.get("height", 360), factor, even=True)
             stream = ffmpeg.filter(stream, 'scale', width, height)
 
         elif name == "output":
             # dernier noeud
+            if still_format:
+                vcodec = FRAME_FORMATS[still_format][0]
+                return ffmpeg.output(stream, "pipe:", vcodec=vcodec, vframes=1,
+                                     format="image2pipe"), None
+
             # si on est en mode preview, on ne rend qu'un court extrait
-            out_name = f"{uuid.uuid4()}.mp4"
-            output_path = os.path.join(app.config['OUTPUT_FOLDER'], out_name)
+            if output_path is None:
+                out_name = out_name or f"{uuid.uuid4()}.mp4"
+                output_path = os.path.join(app.config['OUTPUT_FOLDER'], out_name)
 
-            # pour une preview on peut limiter à 3 secondes via .output(..., t=3)
+            # pour une preview, l'extrait est déjà limité à l'entrée (ss, t)
             if preview:
                 out_stream = ffmpeg.output(stream, output_path,
                                            vcodec='libx264',
                                            preset='veryfast',
-                                           t=3,
                                            pix_fmt='yuv420p')
             else:
                 out_stream = ffmpeg.output(stream, output_path,
@@ -162,20 +295,611 @@ def build_ffmpeg_pipeline(graph_json, preview=False):
     raise ValueError("Graph sans noeud 'output' valide.")
 
 
-def run_ffmpeg_pipeline(graph_json, preview=False):
+###########################
+# Cache des rendus
+###########################
+
+_digest_memo = {}
+
+
+def file_digest(path):
+    """
+    SHA-256 du fichier source, mémorisé par (chemin, taille, mtime)
+    pour ne pas relire la vidéo à chaque rendu.
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _digest_memo:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        _digest_memo[memo_key] = sha.hexdigest()
+    return _digest_memo[memo_key]
+
+
+def render_cache_key(graph_json, preview, proxy=None):
+    """
+    Clé d'un rendu = hash du fichier source + chaîne de filtres ordonnée
+    (nom + paramètres, sérialisée en JSON trié) + réglages encodeur
+    (+ proxy lu par la preview).
+    """
+    nodes = graph_json.get("nodes", {})
+    chain = []
+    for node_id in ordered_node_ids(nodes):
+        node = nodes[node_id]
+        if node["name"] not in ("input", "output"):
+            chain.append([node["name"], node.get("data", {})])
+    input_path = find_input_path(graph_json)
+    if not input_path or not os.path.exists(input_path):
+        raise ValueError("Chemin d'entrée invalide ou manquant.")
+    payload = json.dumps({
+        "input": file_digest(input_path),
+        "chain": chain,
+        "encoder": {"vcodec": "libx264", "pix_fmt": "yuv420p",
+                    "preset": "veryfast" if preview else "medium",
+                    "t": PREVIEW_DURATION if preview else None},
+        "preview": {"time": float(graph_json.get("preview_time") or 0),
+                    "proxy": proxy is not None} if preview else None,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Nom d'un rendu du cache : clé SHA-256 (render_cache_key) + .mp4 / .partial.mp4
+CACHE_FILE_RE = re.compile(r"^([0-9a-f]{64})(\.partial)?\.mp4$")
+
+
+class RenderCache:
+    """
+    Index LRU des rendus présents dans OUTPUT_FOLDER (nommés <clé>.mp4),
+    avec éviction au-delà du budget disque et compteurs hit/miss.
+    Les autres fichiers du dossier ne sont ni indexés ni supprimés.
+    """
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # clé -> taille en octets
+        # reprise après redémarrage : mtime = ordre d'utilisation
+        files = []
+        for name in os.listdir(folder):
+            match = CACHE_FILE_RE.match(name)
+            path = os.path.join(folder, name)
+            if match is None or not os.path.isfile(path):
+                continue
+            if match.group(2):
+                os.remove(path)
+            else:
+                files.append((os.path.getmtime(path), match.group(1), os.path.getsize(path)))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+
+    def path(self, key, partial=False):
+        suffix = ".partial.mp4" if partial else ".mp4"
+        return os.path.join(self.folder, key + suffix)
+
+    def lookup(self, key):
+        with self.lock:
+            if key in self.entries and os.path.exists(self.path(key)):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                os.utime(self.path(key))
+                return True
+            self.entries.pop(key, None)
+            self.misses += 1
+            return False
+
+    def store(self, key):
+        os.replace(self.path(key, partial=True), self.path(key))
+        with self.lock:
+            self.entries[key] = os.path.getsize(self.path(key))
+            self.entries.move_to_end(key)
+            total = sum(self.entries.values())
+            for old_key in list(self.entries):
+                if total <= self.max_bytes:
+                    break
+                if old_key == key:
+                    continue
+                total -= self.entries.pop(old_key)
+                self.evictions += 1
+                if os.path.exists(self.path(old_key)):
+                    os.remove(self.path(old_key))
+
+    def discard(self, key):
+        if os.path.exists(self.path(key, partial=True)):
+            os.remove(self.path(key, partial=True))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": sum(self.entries.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+
+RENDER_CACHE = RenderCache(app.config['OUTPUT_FOLDER'], app.config['RENDER_CACHE_BYTES'])
+
+
+def decode_frame(path, timestamp):
+    """
+    Décode l'image de la source à `timestamp` en PPM (format qui contient
+    ses dimensions, relisible tel quel par ffmpeg sur stdin).
+    """
+    frame, _ = (
+        ffmpeg
+        .input(path, ss=timestamp)
+        .output("pipe:", vframes=1, format="image2pipe", vcodec="ppm")
+        .run(capture_stdout=True, quiet=True)
+    )
+    if not frame:
+        raise ValueError(f"Aucune image à {timestamp} s")
+    return frame
+
+
+class FrameCache:
+    """
+    LRU en mémoire des images sources décodées, indexé par (upload, instant)
+    et borné en octets : changer un paramètre ne refait pas seek + décodage.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.frames = OrderedDict()  # (chemin, instant) -> octets PPM
+        self.bytes = 0
+
+    def get(self, path, timestamp):
+        key = (path, round(float(timestamp), 3))
+        with self.lock:
+            if key in self.frames:
+                self.frames.move_to_end(key)
+                self.hits += 1
+                return self.frames[key]
+            self.misses += 1
+        frame = decode_frame(path, key[1])
+        with self.lock:
+            if key not in self.frames:
+                self.frames[key] = frame
+                self.bytes += len(frame)
+                while self.bytes > self.max_bytes and len(self.frames) > 1:
+                    _, old = self.frames.popitem(last=False)
+                    self.bytes -= len(old)
+        return frame
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.frames),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+FRAME_CACHE = FrameCache(app.config['FRAME_CACHE_BYTES'])
+
+
+###########################
+# Uploads par morceaux (reprenables)
+###########################
+
+def session_paths(upload_id):
+    """
+    Fichier partiel + description JSON d'une session (pour reprendre après redémarrage).
+    """
+    folder = app.config['UPLOAD_SESSION_FOLDER']
+    upload_id = os.path.basename(upload_id)
+    return os.path.join(folder, upload_id + ".part"), os.path.join(folder, upload_id + ".json")
+
+
+def get_upload_session(upload_id):
+    """
+    Session en mémoire, ou rechargée depuis le disque (le hash de la
+    partie déjà reçue est alors recalculé une fois). None si inconnue.
+    """
+    with UPLOAD_SESSIONS_LOCK:
+        if upload_id in UPLOAD_SESSIONS:
+            return UPLOAD_SESSIONS[upload_id]
+    part_path, meta_path = session_paths(upload_id)
+    if not (os.path.exists(part_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path) as f:
+        session = json.load(f)
+    session.update(offset=0, hash=hashlib.sha256(), lock=threading.Lock())
+    with open(part_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            session["hash"].update(chunk)
+            session["offset"] += len(chunk)
+    with UPLOAD_SESSIONS_LOCK:
+        return UPLOAD_SESSIONS.setdefault(upload_id, session)
+
+
+def session_status(upload_id, session):
+    return {"status": "ok", "upload_id": upload_id, "offset": session["offset"],
+            "size": session["size"], "complete": session["offset"] == session["size"]}
+
+
+def write_chunk(session, upload_id, offset, stream, length, chunk_sha256=None):
+    """
+    Écrit le corps de la requête directement dans le fichier partiel, à
+    l'offset courant, en faisant avancer le SHA-256. Un morceau incomplet
+    ou dont le hash ne correspond pas est retiré du fichier.
+    Retourne un message d'erreur, ou None si le morceau est accepté.
+    """
+    part_path, _ = session_paths(upload_id)
+    new_hash = session["hash"].copy()
+    chunk_hash = hashlib.sha256()
+    written = 0
+    with open(part_path, "r+b") as f:
+        f.seek(offset)
+        while written < length:
+            block = stream.read(min(1024 * 1024, length - written))
+            if not block:
+                break
+            f.write(block)
+            new_hash.update(block)
+            chunk_hash.update(block)
+            written += len(block)
+        if written != length:
+            error = "Morceau incomplet"
+        elif chunk_sha256 and chunk_hash.hexdigest() != chunk_sha256.lower():
+            error = "SHA-256 du morceau invalide"
+        else:
+            error = None
+        if error:
+            f.truncate(offset)
+            return error
+    session["hash"] = new_hash
+    session["offset"] += length
+    return None
+
+
+###########################
+# Rendu (jobs + progression)
+###########################
+
+def prune_jobs():
+    """
+    Oublie les jobs terminés depuis plus de JOB_TTL secondes, puis les plus
+    anciens au-delà de JOB_HISTORY_SIZE. À appeler avec JOBS_LOCK.
+    """
+    now = time.time()
+    # finished_at est posé juste après l'état final par le worker
+    finished = [job_id for job_id, job in JOBS.items() if job["state"] != "running"]
+    excess = len(JOBS) - JOB_HISTORY_SIZE
+    for job_id in finished:
+        if now - (JOBS[job_id]["finished_at"] or now) > JOB_TTL or excess > 0:
+            del JOBS[job_id]
+            excess -= 1
+
+
+def find_input_path(graph_json):
+    """
+    Retourne le chemin du node 'input' du graphe (ou None).
+    """
+    for node in graph_json.get("nodes", {}).values():
+        if node.get("name") == "input":
+            return node.get("data", {}).get("path")
+    return None
+
+
+def probe_duration(path):
+    """
+    Durée de la vidéo en secondes via ffprobe (None si impossible).
+    """
+    try:
+        return float(ffmpeg.probe(path)["format"]["duration"])
+    except (ffmpeg.Error, KeyError, ValueError, OSError):
+        return None
+
+
+def parse_progress(lines):
+    """
+    Parse la sortie de `ffmpeg -progress pipe:1`.
+    ffmpeg écrit des blocs clé=valeur terminés par `progress=continue|end` :
+    on renvoie un dict par bloc.
+    """
+    block = {}
+    for raw in lines:
+        line = raw.decode(errors="replace").strip()
+        if "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        block[key] = value.strip()
+        if key == "progress":
+            yield block
+            block = {}
+
+
+def progress_to_dict(block, duration=None):
+    """
+    Convertit un bloc brut (chaînes) en valeurs exploitables par le front.
+    """
+    def to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    out_time_us = to_float(block.get("out_time_us", block.get("out_time_ms")))
+    out_time = out_time_us / 1e6 if out_time_us is not None and out_time_us >= 0 else None
+    finished = block.get("progress") == "end"
+
+    percent = None
+    if duration and out_time is not None:
+        percent = round(min(100.0, out_time / duration * 100), 1)
+    if finished:
+        percent = 100.0
+
+    return {
+        "frame": int(to_float(block.get("frame")) or 0),
+        "fps": to_float(block.get("fps")),
+        "out_time": out_time,
+        "speed": to_float(block.get("speed", "").rstrip("x")),
+        "percent": percent,
+        "finished": finished,
+    }
+
+
+def run_ffmpeg_pipeline(graph_json, preview=False, out=None, on_progress=None):
     """
     Build + run ffmpeg command, return output file path (string).
+
+    ffmpeg est lancé en asynchrone avec `-progress pipe:1` :
+    chaque bloc de progression est passé à `on_progress` (si fourni).
+    `out` permet de passer un (out_stream, out_path) déjà construit.
     """
-    out_stream, out_path = build_ffmpeg_pipeline(graph_json, preview=preview)
-    # Lance ffmpeg
-    (
+    out_stream, out_path = out or build_ffmpeg_pipeline(graph_json, preview=preview)
+    process = (
         out_stream
+        .global_args("-progress", "pipe:1", "-nostats")
         .overwrite_output()
-        .run(quiet=True)  # passe en True pour pas spammer logs serveur
+        .run_async(pipe_stdout=True, pipe_stderr=True)
     )
+
+    # on vide stderr à côté pour que ffmpeg ne bloque pas sur un pipe plein
+    stderr_tail = deque(maxlen=20)
+    stderr_reader = threading.Thread(target=lambda: stderr_tail.extend(process.stderr), daemon=True)
+    stderr_reader.start()
+
+    for block in parse_progress(process.stdout):
+        if on_progress:
+            on_progress(block)
+    process.wait()
+    stderr_reader.join()
+
+    if process.returncode != 0:
+        lines = [l.decode(errors="replace").strip() for l in stderr_tail if l.strip()]
+        raise RuntimeError(lines[-1] if lines else "ffmpeg a échoué")
     return out_path
 
 
+###########################
+# Rendu parallèle par segments
+###########################
+
+# Filtres dont le résultat dépend du temps absolu dans la vidéo :
+# les appliquer segment par segment donnerait un résultat faux.
+TIME_DEPENDENT_NODES = {"fade", "trim", "speed"}
+MIN_SEGMENT_DURATION = 10  # secondes, en dessous le découpage ne vaut pas le coût
+
+
+def parallel_segment_count(value):
+    """
+    Lit le paramètre ?parallel= : 'auto' = nombre de CPU, sinon un entier.
+    """
+    if not value:
+        return None
+    if value == "auto":
+        return os.cpu_count() or 1
+    count = int(value)
+    return count if count > 1 else None
+
+
+def keyframe_times(path):
+    """
+    Timestamps des images clés du flux vidéo (lecture des paquets, sans décodage).
+    """
+    probe = ffmpeg.probe(path, select_streams="v:0",
+                         show_entries="packet=pts_time,flags")
+    times = []
+    for packet in probe.get("packets", []):
+        if "K" in packet.get("flags", "") and packet.get("pts_time") not in (None, "N/A"):
+            times.append(float(packet["pts_time"]))
+    return sorted(times)
+
+
+def plan_segments(path, duration, count):
+    """
+    Découpe [0, duration] en `count` segments de durée proche,
+    avec des bornes calées sur les images clés pour des coupes propres.
+    Retourne une liste de (start, length) ; length=None pour le dernier.
+    """
+    count = max(1, min(count, int(duration // MIN_SEGMENT_DURATION)))
+    try:
+        keyframes = keyframe_times(path)
+    except ffmpeg.Error:
+        keyframes = []
+
+    bounds = [0.0]
+    for i in range(1, count):
+        target = duration * i / count
+        if keyframes:
+            target = min(keyframes, key=lambda t: abs(t - target))
+        if target > bounds[-1]:
+            bounds.append(target)
+
+    segments = []
+    for i, start in enumerate(bounds):
+        end = bounds[i + 1] if i + 1 < len(bounds) else None
+        segments.append((start, end - start if end is not None else None))
+    return segments
+
+
+def run_parallel_render(graph_json, output_path, duration, count, on_progress=None, baseline=False):
+    """
+    Rend chaque segment dans son propre ffmpeg (en parallèle), puis les
+    concatène sans ré-encodage avec le demuxer concat.
+    Retourne les statistiques de temps :
+    - realtime_factor = durée de la vidéo / temps réel écoulé (x fois le temps réel)
+    - speedup = temps d'un rendu en série / temps réel écoulé, mesuré seulement
+      si `baseline` (le rendu complet est alors fait une fois de plus, en série)
+    - concurrency = somme des temps des segments / temps réel écoulé : nombre
+      moyen de segments rendus en même temps (chaque segment est ralenti par
+      les autres, ce n'est pas un gain)
+    """
+    input_path = find_input_path(graph_json)
+    segments = plan_segments(input_path, duration, count)
+    work_dir = tempfile.mkdtemp(dir=app.config['OUTPUT_FOLDER'])
+    positions = [0.0] * len(segments)
+    started = time.monotonic()
+
+    def render_segment(index):
+        start, length = segments[index]
+        input_kwargs = {"ss": start}
+        if length is not None:
+            input_kwargs["t"] = length
+        out = build_ffmpeg_pipeline(graph_json, input_kwargs=input_kwargs,
+                                    output_path=os.path.join(work_dir, f"seg{index:04d}.mp4"))
+
+        def segment_progress(block):
+            info = progress_to_dict(block)
+            if info["out_time"] is not None:
+                positions[index] = info["out_time"]
+            if on_progress:
+                on_progress(sum(positions), info)
+
+        t0 = time.monotonic()
+        run_ffmpeg_pipeline(graph_json, out=out, on_progress=segment_progress)
+        return time.monotonic() - t0
+
+    try:
+        # chaque worker ne fait qu'attendre son sous-processus ffmpeg :
+        # des threads suffisent pour occuper tous les cœurs
+        with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            segment_times = list(pool.map(render_segment, range(len(segments))))
+
+        list_path = os.path.join(work_dir, "segments.txt")
+        with open(list_path, "w") as f:
+            for index in range(len(segments)):
+                f.write(f"file '{os.path.abspath(os.path.join(work_dir, f'seg{index:04d}.mp4'))}'\n")
+        (
+            ffmpeg
+            .input(list_path, format="concat", safe=0)
+            .output(output_path, c="copy")
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        wall_time = time.monotonic() - started
+
+        serial_time = None
+        if baseline:
+            # référence : le même rendu en un seul ffmpeg, après le rendu parallèle
+            # (les deux ne se disputent pas les CPU)
+            out = build_ffmpeg_pipeline(graph_json, output_path=os.path.join(work_dir, "serial.mp4"))
+            t0 = time.monotonic()
+            run_ffmpeg_pipeline(graph_json, out=out)
+            serial_time = time.monotonic() - t0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "segments": len(segments),
+        "wall_time": round(wall_time, 3),
+        "segment_time_total": round(sum(segment_times), 3),
+        "concurrency": round(sum(segment_times) / wall_time, 2) if wall_time else None,
+        "realtime_factor": round(duration / wall_time, 2) if wall_time else None,
+        "serial_time": round(serial_time, 3) if serial_time is not None else None,
+        "speedup": round(serial_time / wall_time, 2) if serial_time and wall_time else None,
+    }
+
+
+def start_render_job(graph_json, preview=False, parallel=None, baseline=False):
+    """
+    Construit le pipeline (les erreurs de graphe remontent tout de suite)
+    puis lance le rendu dans un thread. Retourne le job (dict).
+
+    Si le même rendu existe déjà dans le cache, le job est créé terminé ;
+    si un rendu identique est en cours, on renvoie ce job-là.
+    `parallel` = nombre de segments rendus en parallèle (rendu complet) ;
+    `baseline` mesure aussi un rendu en série pour calculer le speedup.
+    """
+    if parallel:
+        names = {node["name"] for node in graph_json.get("nodes", {}).values()}
+        refused = sorted(names & TIME_DEPENDENT_NODES)
+        if refused:
+            raise ValueError(f"Rendu parallèle impossible avec les nodes temporels: {', '.join(refused)}")
+    # proxy résolu une seule fois : la clé et le rendu lisent la même vidéo
+    # même si l'encodage du proxy se termine entre les deux
+    input_path = find_input_path(graph_json)
+    proxy = proxy_for(input_path) if preview and input_path else None
+    proxy = dict(proxy) if proxy else None
+    key = render_cache_key(graph_json, preview, proxy)
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "state": "running",
+        "preview": preview,
+        "cached": False,
+        "output_file": key + ".mp4",
+        "duration": None,
+        "progress": None,
+        "parallel": None,
+        "error": None,
+        "started_at": time.time(),
+        "finished_at": None,
+    }
+
+    with JOBS_LOCK:
+        prune_jobs()
+        if RENDER_CACHE.lookup(key):
+            job.update(state="done", cached=True, finished_at=time.time())
+            JOBS[job["job_id"]] = job
+            return job
+        for other in JOBS.values():
+            if other["output_file"] == job["output_file"] and other["state"] == "running":
+                return other
+        out = build_ffmpeg_pipeline(graph_json, preview=preview, out_name=key + ".partial.mp4", proxy=proxy)
+        JOBS[job["job_id"]] = job
+
+    def worker():
+        # durée attendue : celle de la source (bornée en preview)
+        duration = probe_duration(find_input_path(graph_json))
+        if duration and preview:
+            duration = min(duration, PREVIEW_DURATION)
+        job["duration"] = duration
+        try:
+            if parallel and duration and not preview:
+                def parallel_progress(position, info):
+                    percent = round(min(100.0, position / duration * 100), 1)
+                    job["progress"] = dict(info, out_time=position, percent=percent)
+                job["parallel"] = run_parallel_render(graph_json, out[1], duration, parallel,
+                                                      on_progress=parallel_progress, baseline=baseline)
+            else:
+                run_ffmpeg_pipeline(graph_json, preview=preview, out=out,
+                                    on_progress=lambda b: job.update(progress=progress_to_dict(b, duration)))
+            RENDER_CACHE.store(key)
+            job["state"] = "done"
+        except Exception as e:
+            RENDER_CACHE.discard(key)
+            job["error"] = str(e)
+            job["state"] = "failed"
+        job["finished_at"] = time.time()
+
+    threading.Thread(target=worker, daemon=True).start()
+    return job
+
+
 ###########################
 # Routes Flask
 ###########################
@@ -199,6 +923,7 @@ def upload_video():
         return jsonify({"error": "Nom de fichier vide"}), 400
 
     path, vid_id = save_upload(file)
+    start_proxy(path)
     return jsonify({
         "status": "ok",
         "video_id": vid_id,
@@ -206,6 +931,118 @@ def upload_video():
     })
 
 
+@app.route("/upload_sessions", methods=["POST"])
+def create_upload():
+    """
+    Ouvre un upload par morceaux : {"filename", "size", "sha256" (optionnel)}.
+    Les morceaux sont ensuite envoyés en PUT à leur offset.
+    """
+    data = request.get_json() or {}
+    try:
+        size = int(data.get("size", 0))
+    except (TypeError, ValueError):
+        size = 0
+    if size <= 0:
+        return jsonify({"error": "Taille invalide"}), 400
+    if size > app.config['MAX_UPLOAD_BYTES']:
+        return jsonify({"error": "Fichier trop volumineux"}), 413
+
+    upload_id = str(uuid.uuid4())
+    ext = os.path.splitext(data.get("filename", ""))[1]
+    session = {
+        "path": os.path.join(app.config['UPLOAD_FOLDER'], upload_id + ext),
+        "size": size,
+        "sha256": (data.get("sha256") or "").lower() or None,
+    }
+    part_path, meta_path = session_paths(upload_id)
+    open(part_path, "wb").close()
+    with open(meta_path, "w") as f:
+        json.dump(session, f)
+    session.update(offset=0, hash=hashlib.sha256(), lock=threading.Lock())
+    with UPLOAD_SESSIONS_LOCK:
+        UPLOAD_SESSIONS[upload_id] = session
+
+    return jsonify(dict(session_status(upload_id, session),
+                        chunk_size=app.config['UPLOAD_CHUNK_SIZE'])), 201
+
+
+@app.route("/upload_sessions/<upload_id>", methods=["GET"])
+def upload_status(upload_id):
+    """
+    Offset déjà reçu : le client reprend à partir de là après une coupure.
+    """
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload inconnu"}), 404
+    return jsonify(session_status(upload_id, session))
+
+
+@app.route("/upload_sessions/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id):
+    """
+    Corps brut = un morceau, placé à ?offset=N (doit être l'offset courant).
+    En-tête optionnel X-Chunk-SHA256 pour vérifier le morceau.
+    """
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload inconnu"}), 404
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return jsonify({"error": "Paramètre offset requis"}), 400
+    length = request.content_length or 0
+
+    with session["lock"]:
+        if offset != session["offset"]:
+            return jsonify(dict(session_status(upload_id, session), status="error", error="Offset inattendu")), 409
+        if length <= 0 or offset + length > session["size"]:
+            return jsonify(dict(session_status(upload_id, session), status="error", error="Longueur invalide")), 416
+        error = write_chunk(session, upload_id, offset, request.stream, length,
+                            request.headers.get("X-Chunk-SHA256"))
+        if error:
+            return jsonify(dict(session_status(upload_id, session), status="error", error=error)), 422
+        return jsonify(session_status(upload_id, session))
+
+
+@app.route("/upload_sessions/<upload_id>/finalize", methods=["POST"])
+def finalize_upload(upload_id):
+    """
+    Vérifie taille + SHA-256 et place le fichier dans UPLOAD_FOLDER
+    (un simple renommage, pas de copie). Même réponse que /upload.
+    """
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload inconnu"}), 404
+    part_path, meta_path = session_paths(upload_id)
+
+    with session["lock"]:
+        if session["offset"] != session["size"]:
+            return jsonify(dict(session_status(upload_id, session), status="error", error="Upload incomplet")), 409
+        digest = session["hash"].hexdigest()
+        if session["sha256"] and digest != session["sha256"]:
+            for path in (part_path, meta_path):
+                os.remove(path)
+            with UPLOAD_SESSIONS_LOCK:
+                UPLOAD_SESSIONS.pop(upload_id, None)
+            return jsonify({"error": "SHA-256 du fichier invalide"}), 422
+        path = session["path"]
+        os.replace(part_path, path)
+        os.remove(meta_path)
+        with UPLOAD_SESSIONS_LOCK:
+            UPLOAD_SESSIONS.pop(upload_id, None)
+
+    # le hash calculé à la réception sert directement de clé au cache de rendus
+    st = os.stat(path)
+    _digest_memo[(os.path.abspath(path), st.st_size, st.st_mtime_ns)] = digest
+    start_proxy(path)
+    return jsonify({
+        "status": "ok",
+        "video_id": os.path.basename(path),
+        "path": path,
+        "sha256": digest
+    })
+
+
 @app.route("/process", methods=["POST"])
 def process_video():
     """
@@ -219,38 +1056,121 @@ def process_video():
         return jsonify({"error": "JSON manquant"}), 400
 
     try:
-        output_path = run_ffmpeg_pipeline(data, preview=True)
+        job = start_render_job(data, preview=True)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-    filename = os.path.basename(output_path)
-    return jsonify({
-        "status": "ok",
-        "output_file": filename,
-        "url": f"/outputs/{filename}"
-    })
+    return jsonify(render_response(job))
 
 
 @app.route("/render_full", methods=["POST"])
 def render_full():
     """
     Comme /process mais sans preview (rend la vidéo complète).
+    ?parallel=N (ou auto) découpe la vidéo en N segments rendus en parallèle.
+    ?baseline=1 refait le rendu en série pour mesurer le speedup réel.
     """
     data = request.get_json()
     if data is None:
         return jsonify({"error": "JSON manquant"}), 400
 
     try:
-        output_path = run_ffmpeg_pipeline(data, preview=False)
+        parallel = parallel_segment_count(request.args.get("parallel"))
+        job = start_render_job(data, preview=False, parallel=parallel,
+                               baseline=request.args.get("baseline") == "1")
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-    filename = os.path.basename(output_path)
-    return jsonify({
+    return jsonify(render_response(job))
+
+
+@app.route("/preview_frame", methods=["POST"])
+def preview_frame():
+    """
+    Applique le graphe à une seule image (instant `time` de la source)
+    et renvoie directement l'image JPEG ou WebP, sans fichier temporaire.
+    """
+    data = request.get_json()
+    if data is None:
+        return jsonify({"error": "JSON manquant"}), 400
+
+    image_format = data.get("format", "jpeg")
+    if image_format not in FRAME_FORMATS:
+        return jsonify({"error": f"Format inconnu : {image_format}"}), 400
+
+    try:
+        input_path = find_input_path(data)
+        if not input_path or not os.path.exists(input_path):
+            raise ValueError("Chemin d'entrée invalide ou manquant.")
+        frame = FRAME_CACHE.get(input_path, float(data.get("time", 0)))
+        out_stream, _ = build_ffmpeg_pipeline(data, still_format=image_format)
+        image, _ = ffmpeg.run(out_stream, input=frame, capture_stdout=True, quiet=True)
+    except ffmpeg.Error as e:
+        return jsonify({"error": e.stderr.decode(errors="replace").strip().splitlines()[-1]}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    return Response(image, mimetype=FRAME_FORMATS[image_format][1])
+
+
+def render_response(job):
+    """
+    Réponse commune de /process et /render_full : le rendu tourne en
+    arrière-plan, la vidéo sera dispo à `url` une fois le job terminé.
+    """
+    filename = job["output_file"]
+    return {
         "status": "ok",
+        "job_id": job["job_id"],
+        "cached": job["cached"],
         "output_file": filename,
-        "url": f"/outputs/{filename}"
-    })
+        "url": f"/outputs/{filename}",
+        "events_url": f"/jobs/{job['job_id']}/events"
+    }
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    """
+    Compteurs du cache de rendus.
+    """
+    return jsonify(dict(RENDER_CACHE.stats(), frames=FRAME_CACHE.stats()))
+
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    """
+    État courant d'un rendu (progression, erreur éventuelle).
+    """
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job inconnu"}), 404
+    return jsonify(job)
+
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """
+    Flux Server-Sent Events : un message à chaque changement de progression,
+    jusqu'à la fin du rendu.
+    """
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job inconnu"}), 404
+
+    def generate():
+        last = None
+        while True:
+            payload = json.dumps(job)
+            if payload != last:
+                yield f"data: {payload}\n\n"
+                last = payload
+            if job["state"] != "running":
+                break
+            time.sleep(0.5)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
 
 
 @app.route("/outputs/<path:filename>")
@@ -262,10 +262,37 @@ function renderInspectorForNode(id) {
       const value = e.target.value;
       node.data[field] = tryNumber(value);
       editor.updateNodeDataFromId(id, node.data);
+      scheduleFrame();
     });
   });
 }
 
+// Aperçu image fixe, rafraîchi après chaque réglage (debounce)
+let frameTimer = null;
+let frameRequest = 0;
+
+function scheduleFrame() {
+  clearTimeout(frameTimer);
+  frameTimer = setTimeout(previewFrame, 150);
+}
+
+async function previewFrame() {
+  const g = serializeGraph();
+  g.time = g.preview_time;
+  g.format = 'webp';
+  const requestId = ++frameRequest;
+  const res = await fetch('/preview_frame', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(g)
+  });
+  // une réponse plus récente est déjà partie
+  if (requestId !== frameRequest || !res.ok) return;
+  const img = document.getElementById('preview-frame');
+  if (img.src) URL.revokeObjectURL(img.src);
+  img.src = URL.createObjectURL(await res.blob());
+}
+
 function tryNumber(v) {
   if (v === '' || isNaN(v)) return v;
   return Number(v);
@@ -281,15 +308,7 @@ function initUpload() {
     const file = e.target.files[0];
     if (!file) return;
 
-    const formData = new FormData();
-    formData.append('video', file);
-
-    const res = await fetch('/upload', {
-      method: 'POST',
-      body: formData
-    });
-
-    const json = await res.json();
+    const json = await uploadInChunks(file);
     if (json.status === "ok") {
       currentUploadedVideoPath = json.path;
       alert("Upload OK !");
@@ -308,6 +327,65 @@ function initUpload() {
 }
 
 
+// Upload par morceaux : en cas de coupure on relit l'offset du serveur et on reprend
+async function sha256Hex(blob) {
+  if (!window.crypto || !crypto.subtle) return null;
+  const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadInChunks(file) {
+  const storageKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+  let session = null;
+  const savedId = localStorage.getItem(storageKey);
+  if (savedId) {
+    const res = await fetch(`/upload_sessions/${savedId}`);
+    if (res.ok) session = await res.json();
+  }
+  if (!session) {
+    const res = await fetch('/upload_sessions', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size })
+    });
+    session = await res.json();
+    if (!res.ok) return session;
+    localStorage.setItem(storageKey, session.upload_id);
+  }
+
+  const status = document.getElementById('render-status');
+  const chunkSize = session.chunk_size || 8 * 1024 * 1024;
+  let offset = session.offset;
+  let failures = 0;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + chunkSize);
+    const headers = { 'Content-Type': 'application/octet-stream' };
+    const chunkHash = await sha256Hex(chunk);
+    if (chunkHash) headers['X-Chunk-SHA256'] = chunkHash;
+    try {
+      const res = await fetch(`/upload_sessions/${session.upload_id}?offset=${offset}`, {
+        method: 'PUT', headers, body: chunk
+      });
+      const json = await res.json();
+      if (json.offset === undefined) return json;
+      offset = json.offset;
+      if (res.ok) failures = 0;
+      else if (++failures > 5) return json;
+    } catch (err) {
+      if (++failures > 5) return { error: "connexion perdue" };
+      await new Promise(r => setTimeout(r, 1000 * failures));
+    }
+    status.textContent = `Upload ${Math.round(offset / file.size * 100)}%`;
+  }
+  status.textContent = '';
+
+  const res = await fetch(`/upload_sessions/${session.upload_id}/finalize`, { method: 'POST' });
+  const json = await res.json();
+  if (res.ok) localStorage.removeItem(storageKey);
+  return json;
+}
+
+
 /////////////////////////////////////////////
 // Générer Preview / Export complet
 /////////////////////////////////////////////
@@ -320,30 +398,69 @@ function initButtons() {
       body: JSON.stringify(g)
     });
     const json = await res.json();
-    if (json.status === 'ok') {
+    if (json.status !== 'ok') {
+      alert("Erreur preview: " + json.error);
+      return;
+    }
+    const job = await waitForJob(json.events_url);
+    if (job.state === 'done') {
       setPreviewVideo(json.url);
     } else {
-      alert("Erreur preview: " + json.error);
+      alert("Erreur preview: " + job.error);
     }
   });
 
   document.getElementById('btn-render').addEventListener('click', async () => {
     const g = serializeGraph();
-    const res = await fetch('/render_full', {
+    const parallel = document.getElementById('parallel-render').checked;
+    const res = await fetch(parallel ? '/render_full?parallel=auto' : '/render_full', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(g)
     });
     const json = await res.json();
-    if (json.status === 'ok') {
+    if (json.status !== 'ok') {
+      alert("Erreur export: " + json.error);
+      return;
+    }
+    const job = await waitForJob(json.events_url);
+    if (job.state === 'done') {
       setPreviewVideo(json.url);
-      alert("Export complet prêt !");
+      const p = job.parallel;
+      const gain = p && (p.speedup ? `speedup x${p.speedup}` : `x${p.realtime_factor} temps réel`);
+      alert(p ? `Export complet prêt ! (${p.segments} segments en ${p.wall_time} s, ${gain})` : "Export complet prêt !");
     } else {
-      alert("Erreur export: " + json.error);
+      alert("Erreur export: " + job.error);
     }
   });
 }
 
+// Suit la progression d'un rendu (Server-Sent Events) jusqu'à sa fin
+function waitForJob(eventsUrl) {
+  const status = document.getElementById('render-status');
+  return new Promise((resolve) => {
+    const source = new EventSource(eventsUrl);
+    source.onmessage = (event) => {
+      const job = JSON.parse(event.data);
+      const p = job.progress;
+      if (p) {
+        const percent = p.percent !== null ? `${p.percent}%` : `frame ${p.frame}`;
+        status.textContent = `${percent} — ${p.fps ?? 0} fps (x${p.speed ?? '?'})`;
+      }
+      if (job.state !== 'running') {
+        source.close();
+        status.textContent = '';
+        resolve(job);
+      }
+    };
+    source.onerror = () => {
+      source.close();
+      status.textContent = '';
+      resolve({ state: 'failed', error: 'connexion perdue' });
+    };
+  });
+}
+
 function setPreviewVideo(url) {
   const videoEl = document.getElementById('preview-video');
   videoEl.src = url;
@@ -372,7 +489,9 @@ function serializeGraph() {
   //   }
   // }
 
-  const result = { nodes: {} };
+  // instant de départ de la preview (seek dans le proxy)
+  const previewTime = parseFloat(document.getElementById('preview-time').value) || 0;
+  const result = { nodes: {}, preview_time: previewTime };
 
   Object.keys(data).forEach(id => {
     const node = data[id];
@@ -1,22 +1,95 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response
 import ffmpeg
 import os
 import json
+import math
+import time
 import uuid
 from werkzeug.utils import secure_filename
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from jobs import JobManager, JobCancelled, QueueFullError, FINISHED_STATES, workers_for_cpu
+from render_cache import RenderCache, remember_digest
+from graph import (GraphError, compile_plan, plan_outputs, plan_chain, canonical_subgraph,
+                   untouched_streams)
+from profiles import encoder_settings, PROFILES, DEFAULT_PROFILE
+from fastpath import keyframe_times, plan_cut, cut_input_options, cut_output_options
+from seek import push_down_trims, push_down_window
+from schema import FILTERS, validate_nodes, check_nodes, describe_errors
+from plan_cache import PlanCache, CompiledWorkflow, workflow_digest, plan_key, subset_key
+from uploads import UploadManager, UploadError
+from metadata import MetadataStore, READY
+from preview import (build_proxy, proxy_factor, scale_plan, still_plan,
+                     FrameCache, FRAME_FORMATS)
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
-app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max
+app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max par requête
+# Uploads par morceaux: taille maximale du fichier complet et taille conseillée d'un morceau
+app.config['MAX_UPLOAD_BYTES'] = int(os.environ.get('MAX_UPLOAD_BYTES', 20 * 1024**3))
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024
+app.config['PROXY_FOLDER'] = os.path.join('uploads', 'proxies')
+app.config['PREVIEW_FOLDER'] = os.path.join('outputs', 'previews')
+app.config['PREVIEW_KEEP'] = 50  # nombre de clips de prévisualisation conservés
+# Nombre de rendus ffmpeg simultanés par CPU (ffmpeg est lui-même multi-threadé)
+app.config['JOBS_PER_CPU'] = float(os.environ.get('FFMPEG_JOBS_PER_CPU', 0.5))
+app.config['MAX_PENDING_JOBS'] = int(os.environ.get('FFMPEG_MAX_PENDING_JOBS', 32))
+# Budget disque du cache de rendus (dossier de sortie)
+app.config['RENDER_CACHE_BYTES'] = int(os.environ.get('RENDER_CACHE_BYTES', 10 * 1024**3))
+# Recul maximal (s) du début d'une découpe vers l'image clé précédente pour
+# qu'elle soit faite par copie de flux plutôt que par réencodage (mode 'auto')
+app.config['CUT_KEYFRAME_TOLERANCE'] = float(os.environ.get('CUT_KEYFRAME_TOLERANCE', 1.0))
+# Mémoire des images sources décodées pour /preview_frame
+app.config['FRAME_CACHE_BYTES'] = int(os.environ.get('FRAME_CACHE_BYTES', 256 * 1024**2))
+# Nombre de workflows compilés gardés en mémoire
+app.config['PLAN_CACHE_ENTRIES'] = int(os.environ.get('PLAN_CACHE_ENTRIES', 256))
 
 # Créer les dossiers nécessaires
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+os.makedirs(app.config['PROXY_FOLDER'], exist_ok=True)
+os.makedirs(app.config['PREVIEW_FOLDER'], exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'flv', 'wmv'}
 
+# File des rendus en arrière-plan
+job_manager = JobManager(
+    max_workers=workers_for_cpu(app.config['JOBS_PER_CPU']),
+    max_pending=app.config['MAX_PENDING_JOBS']
+)
+# Threads d'encodage d'un rendu : les CPU sont partagés entre les rendus simultanés
+ENCODER_THREADS = max(1, (os.cpu_count() or 1) // job_manager.max_workers)
+
+# Métadonnées des vidéos uploadées (ffprobe en arrière-plan, JSON par upload) ;
+# le proxy de prévisualisation est lancé à la fin de chaque probe
+metadata_store = MetadataStore(app.config['UPLOAD_FOLDER'],
+                               on_ready=lambda filename, filepath, info: start_proxy(filename, filepath, info))
+# Attente maximale d'un probe en cours avant de compiler sans les infos source
+PROBE_WAIT = 10
+# Attente du probe avant de répondre à un upload (les infos arrivent sinon via /videos/<filename>)
+UPLOAD_PROBE_WAIT = 5
+
+# Sessions d'upload par morceaux (reprenables)
+upload_manager = UploadManager(app.config['UPLOAD_FOLDER'], app.config['MAX_UPLOAD_BYTES'])
+
+# Cache des rendus + sorties en cours de rendu (clé de sortie -> id du job qui l'écrit)
+render_cache = RenderCache(app.config['OUTPUT_FOLDER'], app.config['RENDER_CACHE_BYTES'])
+inflight_renders = {}
+inflight_lock = threading.Lock()
+
+# Proxies basse résolution pour la prévisualisation (un encodage à la fois,
+# pour ne pas concurrencer les rendus)
+proxies = {}
+proxy_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='proxy')
+
+# Images sources décodées, indexées par (upload, instant)
+frame_cache = FrameCache(app.config['FRAME_CACHE_BYTES'])
+
+# Workflows compilés (plan, sorties, argv), indexés par hash du workflow et de la source
+plan_cache = PlanCache(app.config['PLAN_CACHE_ENTRIES'])
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -39,121 +112,697 @@ def upload_video():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
         file.save(filepath)
         
-        # Obtenir les informations de la vidéo
-        probe = ffmpeg.probe(filepath)
-        video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
+        register_upload(unique_filename, filepath)
+        return jsonify(upload_response(unique_filename))
+    
+    return jsonify({'error': 'Type de fichier non autorisé'}), 400
+
+def register_upload(filename, filepath, digest=None):
+    """Lance le probe de la vidéo en arrière-plan, puis son proxy"""
+    metadata_store.submit(filename, filepath, digest)
+
+def upload_response(filename):
+    """
+    Réponse d'upload. Les infos de la vidéo (width, height, duration, codec)
+    sont incluses si le probe se termine dans UPLOAD_PROBE_WAIT secondes ;
+    sinon elles valent null et arrivent via /videos/<filename>.
+    """
+    info = metadata_store.info(filename, timeout=UPLOAD_PROBE_WAIT) or {}
+    return {
+        'success': True,
+        'filename': filename,
+        'width': info.get('width'),
+        'height': info.get('height'),
+        'duration': info.get('duration'),
+        'codec': info.get('codec'),
+        'info_url': f'/videos/{filename}'
+    }
+
+@app.route('/videos/<filename>')
+def video_info(filename):
+    """
+    Métadonnées d'une vidéo uploadée (`state`: pending, ready, failed).
+    `?wait=N` attend jusqu'à N secondes la fin du probe.
+    """
+    try:
+        wait = float(request.args.get('wait', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Paramètre wait invalide'}), 400
+    if not math.isfinite(wait) or wait < 0:
+        return jsonify({'error': 'Paramètre wait invalide'}), 400
+    record = metadata_store.get(filename, timeout=min(wait, 30))
+    if record is None:
+        return jsonify({'error': 'Vidéo inconnue'}), 404
+    if record['state'] == READY:
+        return jsonify(dict(record['info'], state=READY, filename=filename,
+                            sha256=record['sha256'], streams=record['probe']['streams']))
+    return jsonify({k: v for k, v in record.items() if k in ('state', 'error')})
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """
+    Ouvre une session d'upload par morceaux.
+    Body: `filename`, `size` (octets) et optionnellement `sha256` du fichier complet
+    """
+    data = request.json or {}
+    filename = secure_filename(data.get('filename', ''))
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Type de fichier non autorisé'}), 400
+    try:
+        size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Taille invalide'}), 400
+    
+    session = upload_manager.create(filename, size, data.get('sha256'))
+    return jsonify(dict(session.to_dict(), chunk_size=app.config['UPLOAD_CHUNK_SIZE'])), 201
+
+@app.route('/uploads/<upload_id>')
+def get_upload(upload_id):
+    """État d'une session: `offset` indique où reprendre après une coupure"""
+    return jsonify(upload_manager.get(upload_id).to_dict())
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """
+    Reçoit un morceau brut (corps de la requête) à `?offset=`.
+    L'en-tête `X-Chunk-SHA256` permet de vérifier le morceau à la réception.
+    """
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Paramètre offset requis'}), 400
+    session = upload_manager.write_chunk(upload_id, offset, request.stream,
+                                         request.content_length,
+                                         request.headers.get('X-Chunk-SHA256'))
+    return jsonify(session.to_dict())
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Vérifie le fichier complet (taille, SHA-256) et le rend utilisable comme /upload"""
+    session, digest = upload_manager.finalize(upload_id)
+    filepath = upload_manager.final_path(session)
+    # Le hash calculé à la réception sert directement au cache de rendus
+    remember_digest(filepath, digest)
+    register_upload(session.filename, filepath, digest)
+    return jsonify(dict(upload_response(session.filename), sha256=digest))
+
+@app.errorhandler(UploadError)
+def handle_upload_error(e):
+    body = {'error': str(e)}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return jsonify(body), e.status
+
+def proxy_path_for(filename):
+    """Chemin (déterministe) du proxy d'une vidéo uploadée"""
+    return os.path.join(app.config['PROXY_FOLDER'], os.path.splitext(filename)[0] + '.mp4')
+
+def start_proxy(filename, filepath, info):
+    """
+    Lance l'encodage du proxy de prévisualisation en arrière-plan.
+    Un proxy déjà sur le disque (encodé avant un redémarrage) est repris tel quel.
+    """
+    proxy_path = proxy_path_for(filename)
+    proxies[filename] = {'state': 'pending', 'path': proxy_path,
+                         'factor': proxy_factor(info['height'])}
+    if os.path.exists(proxy_path):
+        proxies[filename]['state'] = 'ready'
+        return
+    
+    def encode():
+        # Encodé à côté puis renommé : un proxy interrompu n'est jamais repris
+        partial_path = os.path.splitext(proxy_path)[0] + '.partial.mp4'
+        try:
+            build_proxy(filepath, partial_path, info['height'])
+            os.replace(partial_path, proxy_path)
+            proxies[filename]['state'] = 'ready'
+        except (ffmpeg.Error, OSError) as e:
+            print(f"Erreur lors de la création du proxy {filename}: {e}")
+            proxies[filename]['state'] = 'failed'
+    
+    proxy_executor.submit(encode)
+
+def find_proxy(filename, info):
+    """
+    Proxy prêt de la vidéo, ou None. Après un redémarrage le registre est
+    vide : le proxy est alors cherché sur le disque avant tout réencodage.
+    """
+    proxy = proxies.get(filename)
+    if proxy is None and info is not None:
+        start_proxy(filename, os.path.join(app.config['UPLOAD_FOLDER'], filename), info)
+        proxy = proxies[filename]
+    return proxy if proxy is not None and proxy['state'] == 'ready' else None
+
+@app.route('/preview', methods=['POST'])
+def preview_video():
+    """
+    Prévisualisation rapide: quelques secondes du workflow à partir de `time`,
+    rendues depuis le proxy 360p (ou la source si le proxy n'est pas prêt)
+    """
+    try:
+        data = request.json
+        input_file = data.get('input_file')
+        workflow = data.get('workflow')
+        start = parse_seconds(data, 'time', 0)
+        duration = parse_seconds(data, 'duration', 2)
+        if duration <= 0:
+            return jsonify({'error': "`duration` doit être positive"}), 400
+        
+        if not input_file or not workflow:
+            return jsonify({'error': 'Paramètres manquants'}), 400
+        
+        input_path = os.path.join(app.config['UPLOAD_FOLDER'], input_file)
+        if not os.path.exists(input_path):
+            return jsonify({'error': 'Fichier source introuvable'}), 404
+        
+        started = time.monotonic()
+        nodes = workflow.get('drawflow', {}).get('Home', {}).get('data', {})
+        check_nodes(nodes)
+        source = metadata_store.info(input_file, timeout=PROBE_WAIT)
+        plan, _ = compile_plan(nodes, source)
+        check_instant(plan, plan_outputs(plan)[0]['id'], source, start)
+        
+        proxy = find_proxy(input_file, source)
+        use_proxy = proxy is not None
+        if use_proxy:
+            input_path = proxy['path']
+            plan = scale_plan(plan, proxy['factor'])
+        
+        # Une seule sortie en prévisualisation, encodée au plus vite. `time` est un
+        # instant de la sortie : la fenêtre est ramenée dans la source (seek d'entrée)
+        preview_filename = f"preview_{uuid.uuid4()}.mp4"
+        output = plan_outputs(plan)[0]
+        plan, seek, output_window = push_down_window(plan, output['id'], start, duration)
+        stream = build_streams(input_path, plan,
+                               {output['id']: os.path.join(app.config['PREVIEW_FOLDER'], preview_filename)},
+                               input_kwargs=seek,
+                               overrides=dict({'preset': 'ultrafast', 'crf': 30, 'an': None}, **output_window))
+        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        prune_previews()
         
         return jsonify({
             'success': True,
-            'filename': unique_filename,
-            'width': int(video_info['width']),
-            'height': int(video_info['height']),
-            'duration': float(probe['format']['duration']),
-            'codec': video_info['codec_name']
+            'proxy': use_proxy,
+            'preview_url': f'/previews/{preview_filename}',
+            'elapsed': round(time.monotonic() - started, 3)
         })
     
-    return jsonify({'error': 'Type de fichier non autorisé'}), 400
+    except GraphError as e:
+        return jsonify({'error': str(e)}), 400
+    except ffmpeg.Error as e:
+        return jsonify({'error': e.stderr.decode(errors='replace').strip().splitlines()[-1]}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/process', methods=['POST'])
-def process_video():
+@app.route('/preview_frame', methods=['POST'])
+def preview_frame():
+    """
+    Image fixe du workflow à l'instant `time` de la sortie, renvoyée directement en
+    JPEG ou WebP. L'image source décodée est gardée en cache : modifier un
+    paramètre ne refait ni le seek ni le décodage.
+    """
     try:
         data = request.json
         input_file = data.get('input_file')
         workflow = data.get('workflow')
+        timestamp = parse_seconds(data, 'time', 0)
+        image_format = data.get('format', 'jpeg')
         
         if not input_file or not workflow:
             return jsonify({'error': 'Paramètres manquants'}), 400
+        if image_format not in FRAME_FORMATS:
+            return jsonify({'error': f"Format inconnu: {image_format}"}), 400
         
         input_path = os.path.join(app.config['UPLOAD_FOLDER'], input_file)
         if not os.path.exists(input_path):
             return jsonify({'error': 'Fichier source introuvable'}), 404
         
-        # Créer le nom du fichier de sortie
-        output_filename = f"output_{uuid.uuid4()}.mp4"
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
+        nodes = workflow.get('drawflow', {}).get('Home', {}).get('data', {})
+        check_nodes(nodes)
+        source = metadata_store.info(input_file, timeout=PROBE_WAIT)
+        plan, _ = compile_plan(nodes, source)
+        output_id = str(data.get('output') or plan_outputs(plan)[0]['id'])
+        if output_id not in {node['id'] for node in plan_outputs(plan)}:
+            return jsonify({'error': f"Sortie inconnue: {output_id}"}), 400
+        check_instant(plan, output_id, source, timestamp)
+        # `time` est un instant de la sortie, comme pour /preview
+        plan, source_time = still_plan(plan, output_id, timestamp)
+        
+        frame = frame_cache.get(input_path, input_file, source_time)
+        
+        # L'image est relue sur stdin et le résultat écrit sur stdout
+        vcodec, mimetype = FRAME_FORMATS[image_format]
+        stream = build_streams('pipe:', plan, {output_id: 'pipe:'},
+                               input_kwargs={'format': 'image2pipe', 'vcodec': 'ppm'},
+                               encoder=lambda node: {'vcodec': vcodec, 'vframes': 1,
+                                                     'format': 'image2pipe', 'an': None})
+        image, _ = ffmpeg.run(stream, input=frame, capture_stdout=True, quiet=True)
+        return Response(image, mimetype=mimetype)
+    
+    except GraphError as e:
+        return jsonify({'error': str(e)}), 400
+    except ffmpeg.Error as e:
+        return jsonify({'error': e.stderr.decode(errors='replace').strip().splitlines()[-1]}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def parse_seconds(data, name, default):
+    """Instant ou durée (secondes, positif ou nul) d'une requête ; GraphError si invalide"""
+    value = data.get(name, default)
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise GraphError(f"`{name}` invalide: {value!r}")
+    if not math.isfinite(seconds) or seconds < 0:
+        raise GraphError(f"`{name}` invalide: {value!r}")
+    return seconds
+
+def check_instant(plan, output_id, source, instant):
+    """
+    GraphError si `instant` (temps de la sortie) est au-delà de la fin de la
+    vidéo produite. Durée estimée depuis la source ; non vérifié sans infos
+    source ni à travers un concat (durée inconnue).
+    """
+    chain = plan_chain(plan, output_id)
+    if not source or any(node['name'] == 'concat' for node in chain):
+        return
+    length = estimate_output_duration(source['duration'], chain)
+    if instant >= length:
+        raise GraphError(f"`time` ({instant:g} s) hors de la vidéo produite ({length:.3f} s)")
+
+def prune_previews():
+    """Ne garde que les clips de prévisualisation les plus récents"""
+    folder = app.config['PREVIEW_FOLDER']
+    files = sorted((os.path.join(folder, name) for name in os.listdir(folder)),
+                   key=os.path.getmtime, reverse=True)
+    for path in files[app.config['PREVIEW_KEEP']:]:
+        os.remove(path)
+
+@app.route('/previews/<filename>')
+def serve_preview(filename):
+    return send_file(os.path.join(app.config['PREVIEW_FOLDER'], filename))
+
+@app.route('/process', methods=['POST'])
+def process_video():
+    try:
+        data = request.json
+        input_file = data.get('input_file')
+        workflow = data.get('workflow')
+        
+        if not input_file or not workflow:
+            return jsonify({'error': 'Paramètres manquants'}), 400
         
-        # Construire le pipeline ffmpeg à partir du workflow
-        stream = ffmpeg.input(input_path)
+        input_path = os.path.join(app.config['UPLOAD_FOLDER'], input_file)
+        if not os.path.exists(input_path):
+            return jsonify({'error': 'Fichier source introuvable'}), 404
         
-        # Traiter les nœuds dans l'ordre
+        # Workflow compilé (validé, optimisé, clés de cache), mémorisé par hash
         nodes = workflow.get('drawflow', {}).get('Home', {}).get('data', {})
+        compiled, source, _, key = compile_workflow(input_file, input_path, nodes)
+        if compiled['errors']:
+            return jsonify({'error': describe_errors(compiled['errors']),
+                            'errors': compiled['errors']}), 400
+        plan, rewrites = compiled['plan'], compiled['optimizations']
         
-        # Trier les nœuds par ordre de connexion
-        sorted_nodes = sort_nodes_by_connection(nodes)
+        # Chaque sortie a sa propre clé de cache: seules les sorties absentes sont rendues
+        outputs = [{'node': output['node'], 'key': output['key'], 'cut': output['cut'],
+                    'output_file': render_cache.lookup(output['key'])}
+                   for output in compiled['outputs']]
+        missing = [output for output in outputs if not output['output_file']]
         
-        # Appliquer les filtres dans l'ordre
-        for node_id in sorted_nodes:
-            node = nodes[node_id]
-            node_name = node.get('name')
-            node_data = node.get('data', {})
+        if not missing:
+            return jsonify(dict(render_result(outputs), success=True, cached=True,
+                                optimizations=rewrites))
+        
+        with inflight_lock:
+            # Une sortie déjà en cours de rendu (même pour un autre workflow) n'est
+            # pas rendue une seconde fois dans le même fichier temporaire : elle est attendue
+            for key, job_id in list(inflight_renders.items()):
+                job = job_manager.get(job_id)
+                if job is None or job.state in FINISHED_STATES:
+                    del inflight_renders[key]
+            waiting = {output['key']: job_manager.get(inflight_renders[output['key']])
+                       for output in missing if output['key'] in inflight_renders}
+            # Une clé n'est rendue qu'une fois, même si plusieurs sorties identiques la partagent
+            own, keys = [], set(waiting)
+            for output in missing:
+                if output['key'] not in keys:
+                    own.append(output)
+                    keys.add(output['key'])
             
-            if node_name == 'input':
-                continue  # Déjà traité
-            elif node_name == 'output':
-                continue  # Traité à la fin
+            jobs = {job.id for job in waiting.values()}
+            job_keys = {key for key, job_id in inflight_renders.items() if job_id in jobs}
+            if not own and len(jobs) == 1 and job_keys == {output['key'] for output in missing}:
+                # Rendu identique déjà en cours
+                job = next(iter(waiting.values()))
             else:
-                # Appliquer le filtre
-                stream = apply_filter(stream, node_name, node_data)
-        
-        # Sortie
-        stream = ffmpeg.output(stream, output_path, 
-                               vcodec='libx264',
-                               acodec='aac',
-                               strict='experimental')
-        
-        # Exécuter
-        ffmpeg.run(stream, overwrite_output=True)
+                argv = render_argv(compiled, key, input_path, own, source) if own else None
+                job = submit_render(input_file, plan, outputs, own, argv, waiting=waiting)
+                for output in own:
+                    inflight_renders[output['key']] = job.id
         
         return jsonify({
             'success': True,
-            'output_file': output_filename,
-            'download_url': f'/download/{output_filename}'
-        })
+            'job_id': job.id,
+            'status_url': f'/jobs/{job.id}',
+            'events_url': f'/jobs/{job.id}/events',
+            'optimizations': rewrites
+        }), 202
         
+    except GraphError as e:
+        return jsonify({'error': str(e)}), 400
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def sort_nodes_by_connection(nodes):
-    """Trie les nœuds dans l'ordre de connexion"""
-    sorted_ids = []
-    connections = {}
+def compile_workflow(input_file, input_path, nodes):
+    """
+    Compile le workflow pour cette source : validation contre le schéma de
+    /filters, plan optimisé, sorties (clé du cache de rendus, découpe,
+    réglages) et argv ffmpeg du rendu de toutes les sorties.
+    Mémorisé par hash du workflow et de la source (voir plan_cache.py).
+    Retourne (compilation, infos de la source, True si elle était en cache,
+    clé de la compilation).
+    """
+    source = metadata_store.info(input_file, timeout=PROBE_WAIT)
+    digest = workflow_digest(nodes)
+    st = os.stat(input_path)
+    key = plan_key(digest, input_path, st.st_size, st.st_mtime_ns, source)
+    compiled = plan_cache.get(key)
+    if compiled is not None:
+        return compiled.to_dict(), source, True, key
     
-    # Créer un mapping des connexions
-    for node_id, node in nodes.items():
-        outputs = node.get('outputs', {})
-        for output_key, output_data in outputs.items():
-            for conn in output_data.get('connections', []):
-                target_node = str(conn.get('node'))
-                if target_node not in connections:
-                    connections[target_node] = []
-                connections[target_node].append(node_id)
+    data = {'workflow': digest, 'errors': validate_nodes(nodes), 'plan': None,
+            'optimizations': [], 'outputs': [], 'argv': None}
+    if not data['errors']:
+        try:
+            plan, rewrites = compile_plan(nodes, source)
+            outputs = []
+            for node in plan_outputs(plan):
+                # Une sortie qui ne fait que découper la source est servie par copie de flux
+                cut = find_cut(plan, node, source, input_path)
+                if cut:
+                    settings = dict(cut_settings(node, source), cut=[cut['start'], cut['duration']])
+                    rewrites.append({'rule': 'stream_copy_cut', 'nodes': cut['nodes'],
+                                     'description': cut['description']})
+                else:
+                    settings = output_settings(plan, node, source)
+                outputs.append({'node': node['id'], 'cut': cut, 'settings': settings,
+                                'key': render_cache.key(input_path, canonical_subgraph(plan, node['id']),
+                                                        settings)})
+            
+            # Rendu de toutes les sorties, trim de tête passés dans le seek de l'entrée
+            argv, seek_rewrites = compile_argv(input_path, plan, outputs, source)
+            rewrites.extend(seek_rewrites)
+            data.update(plan=plan, optimizations=rewrites, outputs=outputs, argv=argv)
+        except GraphError as e:
+            data['errors'] = [{'node': None, 'name': None, 'param': None, 'error': str(e)}]
     
-    # Commencer par le nœud input
-    for node_id, node in nodes.items():
-        if node.get('name') == 'input':
-            sorted_ids.append(node_id)
-            break
+    compiled = CompiledWorkflow(data)
+    plan_cache.put(key, compiled)
+    return compiled.to_dict(), source, False, key
+
+def compile_argv(input_path, plan, outputs, source):
+    """
+    argv ffmpeg du rendu des sorties `outputs` dans leurs fichiers temporaires
+    du cache de rendus, trim de tête passés dans le seek de l'entrée (hors
+    sorties découpées par copie). Retourne (argv, réécritures du seek).
+    """
+    render_plan, seek, seek_rewrites = push_down_trims(
+        plan, [output['node'] for output in outputs if not output['cut']])
+    targets = {output['node']: os.path.join(app.config['OUTPUT_FOLDER'],
+                                            render_cache.temp_filename(output['key']))
+               for output in outputs}
+    stream = build_streams(input_path, render_plan, targets, input_kwargs=seek, source=source,
+                           encoder=lambda node: output_settings(plan, node, source),
+                           cuts={output['node']: output['cut'] for output in outputs if output['cut']})
+    return stream.compile(), seek_rewrites
+
+def render_argv(compiled, key, input_path, outputs, source):
+    """
+    argv ffmpeg qui ne rend que `outputs` : celui de la compilation s'il
+    s'agit de toutes ses sorties, sinon compilé une fois pour ce
+    sous-ensemble et mémorisé dans plan_cache (clé dérivée)
+    """
+    nodes = [output['node'] for output in outputs]
+    if nodes == [output['node'] for output in compiled['outputs']]:
+        return compiled['argv']
+    key = subset_key(key, nodes)
+    subset = plan_cache.get(key)
+    if subset is None:
+        argv, _ = compile_argv(input_path, compiled['plan'], outputs, source)
+        subset = CompiledWorkflow({'workflow': compiled['workflow'], 'errors': [],
+                                   'outputs': nodes, 'argv': argv})
+        plan_cache.put(key, subset)
+    return subset.to_dict()['argv']
+
+@app.route('/compile', methods=['POST'])
+def compile_endpoint():
+    """
+    Compile et valide un workflow sans le rendre : plan optimisé, sorties,
+    argv ffmpeg et erreurs (nœud, paramètre, message)
+    """
+    try:
+        data = request.json
+        input_file = data.get('input_file')
+        workflow = data.get('workflow')
+        
+        if not input_file or not workflow:
+            return jsonify({'error': 'Paramètres manquants'}), 400
+        
+        input_path = os.path.join(app.config['UPLOAD_FOLDER'], input_file)
+        if not os.path.exists(input_path):
+            return jsonify({'error': 'Fichier source introuvable'}), 404
+        
+        nodes = workflow.get('drawflow', {}).get('Home', {}).get('data', {})
+        compiled, _, cached, _ = compile_workflow(input_file, input_path, nodes)
+        return jsonify(dict(compiled, valid=not compiled['errors'], cached=cached))
     
-    # Parcourir les connexions
-    visited = set(sorted_ids)
-    queue = sorted_ids.copy()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def output_settings(plan, node, source=None):
+    """
+    Réglages d'encodage d'un nœud de sortie (profil et surcharges du nœud) ;
+    avec les infos de la source, les flux que le graphe ne modifie pas sont recopiés
+    """
+    return encoder_settings(node['params'], ENCODER_THREADS, source,
+                            untouched_streams(plan, node['id']))
+
+def cut_settings(node, source):
+    """Réglages d'une sortie servie par copie de flux (aucun flux modifié par le graphe)"""
+    return encoder_settings(node['params'], ENCODER_THREADS, source, {'video', 'audio'})
+
+def find_cut(plan, node, source, input_path):
+    """Découpe par copie de flux de la sortie (voir fastpath.py), ou None"""
+    if not source:
+        return None
+    return plan_cut(plan, node, cut_settings(node, source),
+                    lambda: keyframe_times(input_path), app.config['CUT_KEYFRAME_TOLERANCE'])
+
+def render_result(outputs):
+    """Résultat d'un rendu: toutes les sorties, la première restant l'URL principale"""
+    files = [{'node': output['node'],
+              'output_file': output['output_file'],
+              'download_url': f"/download/{output['output_file']}"} for output in outputs]
+    return {
+        'output_file': files[0]['output_file'],
+        'download_url': files[0]['download_url'],
+        'outputs': files
+    }
+
+def build_streams(input_path, plan, targets, input_kwargs=None, overrides=None,
+                  source=None, encoder=None, cuts=None):
+    """
+    Construit les streams ffmpeg-python du plan pour les sorties demandées
+    (dict id de sortie -> chemin du fichier). Un nœud lu par plusieurs
+    nœuds passe par un filtre split, l'entrée n'est donc décodée qu'une fois.
+    `input_kwargs` s'ajoute aux options d'entrée (seek), `overrides` aux
+    réglages d'encodage de chaque sortie. `source` (infos de la vidéo)
+    permet de recopier les flux non modifiés ; `encoder(node)` remplace
+    les réglages du profil. `cuts` (id de sortie -> découpe de fastpath.py)
+    liste les sorties lues directement dans la source, par copie de flux.
+    """
+    by_id = {node['id']: node for node in plan}
+    cuts = cuts or {}
+    
+    # Découpes : une entrée par sortie (seek dans le demuxer), hors du graphe de filtres
+    outputs = []
+    for node_id, cut in cuts.items():
+        source_input = ffmpeg.input(input_path, **cut_input_options(cut))
+        options = dict(cut_settings(by_id[node_id], source), **cut_output_options(cut))
+        mapped = [source_input.video]
+        if 'an' not in options:
+            mapped.append(source_input['a?'])
+        outputs.append(ffmpeg.output(*mapped, targets[node_id], **options))
+    targets = {node_id: path for node_id, path in targets.items() if node_id not in cuts}
+    if not targets:
+        return outputs[0] if len(outputs) == 1 else ffmpeg.merge_outputs(*outputs)
+    
+    # Ne garder que les nœuds utiles aux sorties demandées
+    needed = set()
+    stack = list(targets)
+    while stack:
+        node_id = stack.pop()
+        if node_id not in needed:
+            needed.add(node_id)
+            stack.extend(by_id[node_id]['inputs'])
+    
+    settings = {}
+    for node_id in targets:
+        node = by_id[node_id]
+        options = dict(encoder(node) if encoder else output_settings(plan, node, source),
+                       **(overrides or {}))
+        if 'an' in options:
+            options.pop('acodec', None)
+            options.pop('audio_bitrate', None)
+        settings[node_id] = options
+
+    consumers = {}
+    for node in plan:
+        if node['id'] in needed:
+            # Vidéo recopiée : la sortie lit l'entrée hors du graphe de filtres
+            if settings.get(node['id'], {}).get('vcodec') == 'copy':
+                continue
+            for upstream in node['inputs']:
+                consumers[upstream] = consumers.get(upstream, 0) + 1
     
-    while queue:
-        current = queue.pop(0)
-        node = nodes.get(current)
-        if not node:
+    streams = {}  # id -> liste des streams encore disponibles pour les consommateurs
+    input_stream = ffmpeg.input(input_path, **(input_kwargs or {}))
+    
+    def take(node_id):
+        return streams[node_id].pop()
+    
+    for node in plan:
+        if node['id'] not in needed:
             continue
-            
-        outputs = node.get('outputs', {})
-        for output_key, output_data in outputs.items():
-            for conn in output_data.get('connections', []):
-                target_node = str(conn.get('node'))
-                if target_node not in visited:
-                    visited.add(target_node)
-                    sorted_ids.append(target_node)
-                    queue.append(target_node)
+        name = node['name']
+        
+        if name == 'input':
+            stream = input_stream.video
+        elif name == 'output':
+            options = settings[node['id']]
+            if options.get('vcodec') == 'copy':
+                mapped = [input_stream.video]
+            else:
+                mapped = [take(node['inputs'][0])]
+            if 'an' not in options:
+                # Audio de la source (s'il y en a), recopié ou encodé selon le profil
+                mapped.append(input_stream['a?'])
+            outputs.append(ffmpeg.output(*mapped, targets[node['id']], **options))
+            continue
+        elif name == 'overlay':
+            main, overlay = take(node['inputs'][0]), take(node['inputs'][1])
+            stream = ffmpeg.overlay(main, overlay,
+                                    x=node['params'].get('x', 0), y=node['params'].get('y', 0))
+        elif name == 'concat':
+            stream = ffmpeg.concat(*[take(i) for i in node['inputs']])
+        else:
+            stream = apply_filter(take(node['inputs'][0]), name, node['params'])
+        
+        count = consumers.get(node['id'], 0)
+        if count > 1:
+            split = stream.filter_multi_output('split', count)
+            streams[node['id']] = [split[i] for i in reversed(range(count))]
+        else:
+            streams[node['id']] = [stream]
+    
+    return outputs[0] if len(outputs) == 1 else ffmpeg.merge_outputs(*outputs)
+
+def submit_render(input_file, plan, outputs, missing, argv, waiting=None):
+    """
+    Place dans la file le rendu des sorties `missing` (une par clé) par la
+    commande `argv` (voir render_argv). `waiting` (clé -> job) liste les
+    sorties déjà en cours de rendu dans un autre job : elles sont attendues.
+    """
+    waiting = waiting or {}
+    
+    # Exécuter en arrière-plan, puis publier les fichiers dans le cache
+    def render(job):
+        rendered = {}
+        if missing:
+            try:
+                job.run_ffmpeg(argv)
+            except BaseException:
+                for output in missing:
+                    render_cache.discard(output['key'])
+                raise
+            rendered = {output['key']: render_cache.store(output['key']) for output in missing}
+        for key, other in waiting.items():
+            while other.state not in FINISHED_STATES:
+                if job.cancel_requested:
+                    raise JobCancelled()
+                time.sleep(0.2)
+            rendered[key] = render_cache.lookup(key)
+            if not rendered[key]:
+                raise RuntimeError(f"Le rendu {other.id} de cette sortie a échoué")
+        return render_result([dict(output, output_file=output['output_file'] or rendered[output['key']])
+                              for output in outputs])
     
-    return sorted_ids
+    info = metadata_store.info(input_file)
+    duration = None
+    if info and missing:
+        duration = estimate_output_duration(info['duration'], plan_chain(plan, missing[0]['node']))
+    
+    return job_manager.submit(render, {'input_file': input_file}, duration=duration)
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Compteurs du cache de rendus (hits, misses, évictions, taille)"""
+    return jsonify(dict(render_cache.stats(), frames=frame_cache.stats(), plans=plan_cache.stats()))
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Retourne l'état d'un rendu"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Flux Server-Sent Events de la progression d'un rendu"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    
+    def generate():
+        last = None
+        while True:
+            data = job.to_dict()
+            payload = json.dumps({k: data.get(k) for k in ('state', 'progress', 'result', 'error')})
+            if payload != last:
+                yield f"data: {payload}\n\n"
+                last = payload
+            if job.state in FINISHED_STATES:
+                break
+            time.sleep(0.5)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Annule un rendu en attente ou en cours"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    return jsonify(job.to_dict())
+
+def estimate_output_duration(duration, chain):
+    """Estime la durée de la sortie (trim et speed la modifient)"""
+    for node in chain:
+        params = node['params']
+        if node['name'] == 'trim':
+            start = float(params.get('start', 0) or 0)
+            end = params.get('end', None)
+            end = min(float(end), duration) if end else duration
+            duration = max(0.0, end - start)
+        elif node['name'] == 'speed':
+            speed = float(params.get('speed', 1.0) or 1.0)
+            duration = duration / speed
+    return duration
 
 def apply_filter(stream, filter_name, params):
     """Applique un filtre ffmpeg au stream"""
@@ -192,6 +841,12 @@ def apply_filter(stream, filter_name, params):
             saturation = params.get('saturation', 1)
             return stream.filter('eq', saturation=saturation)
         
+        elif filter_name == 'eq':
+            # Produit par l'optimiseur (fusion luminosité / contraste / saturation)
+            return stream.filter('eq', brightness=params.get('brightness', 0),
+                                 contrast=params.get('contrast', 1),
+                                 saturation=params.get('saturation', 1))
+        
         elif filter_name == 'blur':
             sigma = params.get('sigma', 1)
             return stream.filter('gblur', sigma=sigma)
@@ -203,6 +858,10 @@ def apply_filter(stream, filter_name, params):
         elif filter_name == 'fade':
             fade_type = params.get('type', 'in')
             duration = params.get('duration', 1)
+            start_time = params.get('start_time')
+            if start_time not in (None, ''):
+                # Décalé par seek.push_down_window quand la lecture ne commence pas à 0
+                return stream.filter('fade', type=fade_type, start_time=start_time, duration=duration)
             return stream.filter('fade', type=fade_type, duration=duration)
         
         elif filter_name == 'grayscale':
@@ -239,117 +898,15 @@ def download_file(filename):
         as_attachment=True
     )
 
+@app.route('/profiles')
+def get_profiles():
+    """Profils d'encodage sélectionnables sur un nœud de sortie (`profile`)"""
+    return jsonify({'default': DEFAULT_PROFILE, 'profiles': PROFILES})
+
 @app.route('/filters')
 def get_filters():
     """Retourne la liste des filtres disponibles"""
-    filters = [
-        {
-            'name': 'scale',
-            'label': 'Redimensionner',
-            'params': [
-                {'name': 'width', 'label': 'Largeur', 'type': 'number', 'default': 1280},
-                {'name': 'height', 'label': 'Hauteur', 'type': 'number', 'default': 720}
-            ]
-        },
-        {
-            'name': 'crop',
-            'label': 'Rogner',
-            'params': [
-                {'name': 'w', 'label': 'Largeur', 'type': 'number', 'default': 640},
-                {'name': 'h', 'label': 'Hauteur', 'type': 'number', 'default': 480},
-                {'name': 'x', 'label': 'Position X', 'type': 'number', 'default': 0},
-                {'name': 'y', 'label': 'Position Y', 'type': 'number', 'default': 0}
-            ]
-        },
-        {
-            'name': 'rotate',
-            'label': 'Rotation',
-            'params': [
-                {'name': 'angle', 'label': 'Angle (degrés)', 'type': 'number', 'default': 0}
-            ]
-        },
-        {
-            'name': 'hflip',
-            'label': 'Miroir horizontal',
-            'params': []
-        },
-        {
-            'name': 'vflip',
-            'label': 'Miroir vertical',
-            'params': []
-        },
-        {
-            'name': 'brightness',
-            'label': 'Luminosité',
-            'params': [
-                {'name': 'brightness', 'label': 'Luminosité', 'type': 'range', 'min': -1, 'max': 1, 'step': 0.1, 'default': 0}
-            ]
-        },
-        {
-            'name': 'contrast',
-            'label': 'Contraste',
-            'params': [
-                {'name': 'contrast', 'label': 'Contraste', 'type': 'range', 'min': 0, 'max': 3, 'step': 0.1, 'default': 1}
-            ]
-        },
-        {
-            'name': 'saturation',
-            'label': 'Saturation',
-            'params': [
-                {'name': 'saturation', 'label': 'Saturation', 'type': 'range', 'min': 0, 'max': 3, 'step': 0.1, 'default': 1}
-            ]
-        },
-        {
-            'name': 'blur',
-            'label': 'Flou',
-            'params': [
-                {'name': 'sigma', 'label': 'Intensité', 'type': 'range', 'min': 0, 'max': 10, 'step': 0.5, 'default': 1}
-            ]
-        },
-        {
-            'name': 'sharpen',
-            'label': 'Netteté',
-            'params': [
-                {'name': 'amount', 'label': 'Intensité', 'type': 'range', 'min': 0, 'max': 5, 'step': 0.1, 'default': 1}
-            ]
-        },
-        {
-            'name': 'fade',
-            'label': 'Fondu',
-            'params': [
-                {'name': 'type', 'label': 'Type', 'type': 'select', 'options': ['in', 'out'], 'default': 'in'},
-                {'name': 'duration', 'label': 'Durée (s)', 'type': 'number', 'default': 1}
-            ]
-        },
-        {
-            'name': 'grayscale',
-            'label': 'Noir et blanc',
-            'params': []
-        },
-        {
-            'name': 'speed',
-            'label': 'Vitesse',
-            'params': [
-                {'name': 'speed', 'label': 'Vitesse', 'type': 'range', 'min': 0.25, 'max': 4, 'step': 0.25, 'default': 1}
-            ]
-        },
-        {
-            'name': 'fps',
-            'label': 'FPS',
-            'params': [
-                {'name': 'fps', 'label': 'Images par seconde', 'type': 'number', 'default': 30}
-            ]
-        },
-        {
-            'name': 'trim',
-            'label': 'Découper',
-            'params': [
-                {'name': 'start', 'label': 'Début (s)', 'type': 'number', 'default': 0},
-                {'name': 'end', 'label': 'Fin (s)', 'type': 'number', 'default': 10}
-            ]
-        }
-    ]
-    return jsonify(filters)
+    return jsonify(FILTERS)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
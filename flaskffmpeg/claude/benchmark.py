@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai du pipeline workflow -> ffmpeg
+
+Génère des vidéos de test (create_test_video, mire lavfi testsrc) à
+plusieurs résolutions et durées, puis rend une matrice de workflows
+représentatifs (ceux de WORKFLOWS.md et d'example_api_usage.py) par le vrai
+chemin de l'application : POST /upload, POST /process, file de rendus.
+
+Pour chaque rendu sont mesurés : durée totale (de la requête à la fin du
+job), images par seconde (rapportées à cette durée et annoncées par
+ffmpeg), temps CPU et utilisation CPU du processus ffmpeg, pic de mémoire
+(RSS). Les résultats sont écrits en JSON et peuvent être comparés à une
+référence enregistrée.
+
+L'application tourne dans un dossier temporaire (uploads, sorties) : le
+cache de rendus ne sert jamais un résultat d'une exécution précédente.
+Les vidéos générées sont gardées dans --inputs d'une exécution à l'autre.
+
+Exemples :
+    python benchmark.py --resolutions 1280x720 --durations 10 --repeat 3
+    python benchmark.py --output results.json --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json --threshold 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_test_video import create_test_video
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Période d'échantillonnage de la mémoire du processus ffmpeg
+SAMPLE_INTERVAL = 0.05
+
+# Workflows mesurés : nom -> chaîne de nœuds (nom du filtre, paramètres)
+WORKFLOWS = {
+    # example_api_usage.py
+    'api_scale_brightness': [('scale', {'width': 1280, 'height': 720}),
+                             ('brightness', {'brightness': 0.2})],
+    # WORKFLOWS.md
+    'resize_720p': [('scale', {'width': 1280, 'height': 720})],
+    'vintage': [('grayscale', {}), ('contrast', {'contrast': 1.5}), ('blur', {'sigma': 0.5})],
+    'enhance': [('brightness', {'brightness': 0.1}), ('contrast', {'contrast': 1.2}),
+                ('saturation', {'saturation': 1.3}), ('sharpen', {'amount': 1.5})],
+    # Carré centré exprimé en fonction de l'entrée : valable à toutes les résolutions
+    'instagram': [('crop', {'w': 'ih', 'h': 'ih', 'x': '(iw-ih)/2', 'y': 0}),
+                  ('scale', {'width': 1080, 'height': 1080}), ('saturation', {'saturation': 1.4})],
+    'fade_intro': [('fade', {'type': 'in', 'duration': 2}), ('scale', {'width': 1920, 'height': 1080})],
+    'short_clip': [('trim', {'start': 5, 'end': 15}), ('scale', {'width': 1280, 'height': 720}),
+                   ('fps', {'fps': 30})],
+    'slow_motion': [('speed', {'speed': 0.5}), ('brightness', {'brightness': 0.15}),
+                    ('contrast', {'contrast': 1.3}), ('grayscale', {})],
+    'timelapse': [('speed', {'speed': 4}), ('fps', {'fps': 60}),
+                  ('scale', {'width': 1920, 'height': 1080}), ('sharpen', {'amount': 1.2})],
+    'dream': [('blur', {'sigma': 2.0}), ('brightness', {'brightness': 0.2}),
+              ('saturation', {'saturation': 0.7})],
+    'portrait': [('crop', {'w': 'ih*9/16', 'h': 'ih', 'x': '(iw-ow)/2', 'y': 0}),
+                 ('scale', {'width': 1080, 'height': 1920}), ('rotate', {'angle': 0})],
+    'full_correction': [('trim', {'start': 0, 'end': 30}), ('scale', {'width': 1920, 'height': 1080}),
+                        ('brightness', {'brightness': 0.05}), ('contrast', {'contrast': 1.15}),
+                        ('saturation', {'saturation': 1.1}), ('sharpen', {'amount': 1.0}),
+                        ('fps', {'fps': 30})],
+    'rotate_flip': [('rotate', {'angle': 90}), ('vflip', {}), ('scale', {'width': 1920, 'height': 1080})],
+}
+
+# Métriques comparées à la référence : plus grand = pire ?
+COMPARED_METRICS = {'wall': True, 'fps': False, 'peak_rss': True}
+
+
+def drawflow(chain):
+    """Workflow Drawflow linéaire : entrée -> chaîne -> sortie"""
+    names = ['input'] + [name for name, _ in chain] + ['output']
+    params = [{}] + [dict(data) for _, data in chain] + [{}]
+    nodes = {}
+    for index, (name, data) in enumerate(zip(names, params), start=1):
+        outputs = {}
+        if index < len(names):
+            outputs['output_1'] = {'connections': [{'node': str(index + 1), 'output': 'input_1'}]}
+        nodes[str(index)] = {'id': index, 'name': name, 'data': data, 'outputs': outputs}
+    return {'drawflow': {'Home': {'data': nodes}}}
+
+
+def parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def ensure_input(folder, width, height, duration):
+    """Vidéo de test de la matrice, générée une seule fois"""
+    path = os.path.join(folder, f"testsrc_{width}x{height}_{duration}s.mp4")
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        create_test_video(path, duration=duration, width=width, height=height)
+        if not os.path.exists(path):
+            raise RuntimeError(f"Impossible de générer {path}")
+    return path
+
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
+        return result.stdout.splitlines()[0] if result.stdout else None
+    except OSError:
+        return None
+
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': ffmpeg_version(),
+    }
+
+
+def process_peak_rss(pid):
+    """Pic de mémoire résidente (octets) d'un processus vivant, None hors Linux"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class Bench:
+    """Client de test de l'application, importée dans un dossier de travail temporaire"""
+
+    def __init__(self, workdir):
+        os.chdir(workdir)
+        sys.path.insert(0, HERE)
+        import app as webapp  # les dossiers de l'application sont relatifs au dossier courant
+        self.webapp = webapp
+        self.client = webapp.app.test_client()
+
+    def upload(self, path):
+        """Upload par /upload, puis attente du probe et du proxy (qui occuperait le CPU)"""
+        with open(path, 'rb') as f:
+            response = self.client.post('/upload', data={'video': (f, os.path.basename(path))},
+                                        content_type='multipart/form-data')
+        filename = response.get_json()['filename']
+        info = self.client.get(f'/videos/{filename}?wait=30').get_json()
+        if info.get('state') != 'ready':
+            raise RuntimeError(f"Probe de {path} : {info.get('error', info.get('state'))}")
+        while self.webapp.proxies.get(filename, {}).get('state', 'pending') == 'pending':
+            time.sleep(SAMPLE_INTERVAL)
+        return filename
+
+    def run(self, filename, workflow):
+        """Un rendu par /process ; retourne les mesures"""
+        cpu_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        started = time.perf_counter()
+        response = self.client.post('/process', json={'input_file': filename, 'workflow': workflow})
+        data = response.get_json()
+        if response.status_code != 202:
+            return {'error': data.get('error') or f"réponse {response.status_code} inattendue"}
+
+        job = self.webapp.job_manager.get(data['job_id'])
+        peak_rss = None
+        while job.state not in self.webapp.FINISHED_STATES:
+            process = job.process
+            if process is not None:
+                sample = process_peak_rss(process.pid)
+                if sample is not None:
+                    peak_rss = max(peak_rss or 0, sample)
+            time.sleep(SAMPLE_INTERVAL)
+        wall = time.perf_counter() - started
+        cpu_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        if job.state != 'done':
+            return {'error': job.error or job.state, 'wall': round(wall, 3)}
+        cpu_seconds = ((cpu_after.ru_utime + cpu_after.ru_stime)
+                       - (cpu_before.ru_utime + cpu_before.ru_stime))
+        progress = job.progress or {}
+        frames = progress.get('frame') or 0
+
+        # Les sorties sont supprimées : la prochaine mesure ne sera pas un hit du cache
+        for output in job.result['outputs']:
+            os.remove(os.path.join(self.webapp.app.config['OUTPUT_FOLDER'], output['output_file']))
+        return {
+            'wall': round(wall, 3),
+            'frames': frames,
+            'fps': round(frames / wall, 2) if wall else None,
+            'encode_fps': progress.get('fps'),  # vitesse annoncée par ffmpeg, hors attente et probe
+            'cpu_seconds': round(cpu_seconds, 3),
+            'cpu_percent': round(cpu_seconds / wall / (os.cpu_count() or 1) * 100, 1) if wall else None,
+            # None si le rendu s'est terminé avant le premier échantillon : ru_maxrss
+            # serait le maximum de tous les enfants déjà terminés (proxy, rendus précédents)
+            'peak_rss': peak_rss,
+            'optimizations': [rewrite['rule'] for rewrite in data.get('optimizations', [])],
+        }
+
+
+def summarize(runs):
+    """
+    Médiane des répétitions réussies (la première erreur sinon). Une métrique
+    absente d'une répétition (pic de mémoire non échantillonné) est omise :
+    elle n'est alors pas comparée à la référence.
+    """
+    ok = [run for run in runs if 'error' not in run]
+    if not ok:
+        return dict(runs[0], runs=len(runs))
+    summary = {key: statistics.median(run[key] for run in ok)
+               for key in ('wall', 'fps', 'encode_fps', 'cpu_seconds', 'cpu_percent', 'peak_rss', 'frames')
+               if all(run.get(key) is not None for run in ok)}
+    summary['optimizations'] = ok[0]['optimizations']
+    summary['runs'] = len(ok)
+    return summary
+
+
+def result_key(result):
+    source = result['input']
+    return f"{result['workflow']}@{source['width']}x{source['height']}/{source['duration']}s"
+
+
+def compare(results, baseline, threshold):
+    """
+    Écarts relatifs par rapport à la référence ; une métrique est une
+    régression si elle se dégrade de plus de `threshold` (0.1 = 10 %).
+    """
+    reference = {result_key(result): result for result in baseline['results']}
+    comparisons = []
+    for result in results:
+        previous = reference.get(result_key(result))
+        if previous is None or 'error' in result or 'error' in previous:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = change if higher_is_worse else -change
+            comparisons.append({
+                'key': result_key(result),
+                'metric': metric,
+                'baseline': before,
+                'current': after,
+                'change': round(change, 4),
+                'regression': worse > threshold,
+            })
+    return comparisons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--resolutions', default='640x360,1280x720,1920x1080',
+                        help='résolutions des vidéos de test (LxH, séparées par des virgules)')
+    parser.add_argument('--durations', default='10,30',
+                        help='durées des vidéos de test en secondes')
+    parser.add_argument('--workflows', default=','.join(WORKFLOWS),
+                        help=f"workflows à mesurer parmi : {', '.join(WORKFLOWS)}")
+    parser.add_argument('--repeat', type=int, default=3, help='rendus par cas (médiane)')
+    parser.add_argument('--inputs', default=os.path.join(HERE, 'benchmark_inputs'),
+                        help='dossier des vidéos de test générées')
+    parser.add_argument('--output', default='benchmark_results.json', help='fichier JSON des résultats')
+    parser.add_argument('--baseline', help='résultats de référence à comparer')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='dégradation tolérée avant de signaler une régression (0.1 = 10 %%)')
+    parser.add_argument('--save-baseline', help='enregistre aussi les résultats comme référence')
+    args = parser.parse_args()
+
+    workflows = [name.strip() for name in args.workflows.split(',') if name.strip()]
+    unknown = [name for name in workflows if name not in WORKFLOWS]
+    if unknown:
+        parser.error(f"Workflow inconnu : {', '.join(unknown)}")
+    resolutions = [parse_resolution(value) for value in args.resolutions.split(',')]
+    durations = [int(value) for value in args.durations.split(',')]
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    save_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    inputs = [(width, height, duration, ensure_input(os.path.abspath(args.inputs), width, height, duration))
+              for width, height in resolutions for duration in durations]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='ffmpeg-bench-') as workdir:
+        bench = Bench(workdir)
+        for width, height, duration, path in inputs:
+            filename = bench.upload(path)
+            for name in workflows:
+                workflow = drawflow(WORKFLOWS[name])
+                runs = [bench.run(filename, workflow) for _ in range(args.repeat)]
+                result = dict(summarize(runs), workflow=name,
+                              input={'width': width, 'height': height, 'duration': duration})
+                results.append(result)
+                if 'error' in result:
+                    print(f"{result_key(result):<40} ERREUR {result['error']}")
+                else:
+                    rss = f"{result['peak_rss'] / 1024**2:7.1f} Mo" if 'peak_rss' in result else '    n/d'
+                    print(f"{result_key(result):<40} {result['wall']:8.2f} s {result.get('fps', 0):9.1f} img/s "
+                          f"CPU {result.get('cpu_percent', 0):5.1f} % RSS {rss}")
+        os.chdir(HERE)
+
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'machine': machine_info(),
+              'repeat': args.repeat, 'results': results}
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        report['baseline'] = {'path': baseline_path, 'created': baseline.get('created'),
+                              'threshold': args.threshold}
+        report['comparison'] = compare(results, baseline, args.threshold)
+        regressions = [item for item in report['comparison'] if item['regression']]
+        print()
+        for item in report['comparison']:
+            flag = 'RÉGRESSION' if item['regression'] else ''
+            print(f"{item['key']:<40} {item['metric']:<9} {item['change']:+8.1%} {flag}")
+        if baseline.get('machine') != report['machine']:
+            print("Attention : la référence a été mesurée sur une autre machine")
+
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"\nRésultats : {output_path}")
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@ Ce script montre comment interagir avec l'API Flask directement
 
 import requests
 import json
+import time
 
 # URL de base de l'API
 BASE_URL = "http://localhost:5000"
@@ -14,7 +15,14 @@ def upload_video(video_path):
     with open(video_path, 'rb') as f:
         files = {'video': f}
         response = requests.post(f"{BASE_URL}/upload", files=files)
-        return response.json()
+    upload = response.json()
+    if not upload.get('success'):
+        return upload
+    # Les métadonnées (ffprobe) sont lues en arrière-plan
+    while True:
+        info = requests.get(f"{BASE_URL}{upload['info_url']}", params={'wait': 10}).json()
+        if info.get('state') != 'pending':
+            return info
 
 def get_filters():
     """Récupère la liste des filtres disponibles"""
@@ -32,6 +40,22 @@ def process_video(input_filename, workflow):
         json=data,
         headers={'Content-Type': 'application/json'}
     )
+    job = response.json()
+    if not job.get('success') or job.get('cached'):
+        return job
+    
+    # Le rendu est asynchrone: attendre la fin du job
+    while True:
+        status = requests.get(f"{BASE_URL}{job['status_url']}").json()
+        if status.get('state') == 'done':
+            return dict(status['result'], success=True)
+        if status.get('state') in ('failed', 'cancelled') or 'error' in status:
+            return status
+        time.sleep(1)
+
+def cancel_job(job_id):
+    """Annule un rendu en cours"""
+    response = requests.post(f"{BASE_URL}/jobs/{job_id}/cancel")
     return response.json()
 
 def download_video(output_filename, save_path):
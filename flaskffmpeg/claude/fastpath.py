@@ -0,0 +1,157 @@
+"""
+Chemin rapide des workflows de découpe et de remux
+
+Une sortie qui ne lit l'entrée qu'à travers des nœuds trim n'a pas besoin
+d'être décodée ni réencodée : le demuxer saute directement au début de la
+fenêtre (-ss avant -i) et les paquets sont recopiés (-c copy) jusqu'à sa
+fin (-t). L'opération ne coûte que la lecture des octets utiles.
+
+Une copie ne peut commencer que sur une image clé : le début est ramené à
+l'image clé qui le précède. Selon le paramètre `cut` du nœud de sortie :
+- 'auto' (défaut) : chemin rapide si ce recul ne dépasse pas la tolérance,
+  réencodage exact sinon,
+- 'keyframe' : chemin rapide quel que soit le recul,
+- 'exact' : toujours le réencodage image près.
+La fin n'a pas besoin d'être alignée : la copie s'arrête au dernier paquet
+avant la fin demandée.
+
+Les images clés sont lues dans les paquets (ffprobe, sans décodage) à la
+première découpe d'un fichier, puis mémorisées.
+"""
+
+import os
+import threading
+
+import ffmpeg
+
+from graph import GraphError
+
+CUT_MODES = ('auto', 'keyframe', 'exact')
+DEFAULT_CUT_MODE = 'auto'
+
+# Décalage ajouté au seek : -ss retombe sur l'image clé visée malgré l'arrondi des pts
+SEEK_EPSILON = 0.001
+
+_keyframes_memo = {}
+_keyframes_lock = threading.Lock()
+
+
+def keyframe_times(path):
+    """
+    Timestamps des images clés du premier flux vidéo (lecture des paquets,
+    sans décodage), mémorisés par (chemin, taille, mtime).
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _keyframes_lock:
+        if memo_key in _keyframes_memo:
+            return _keyframes_memo[memo_key]
+    probe = ffmpeg.probe(path, select_streams='v:0', show_entries='packet=pts_time,flags')
+    times = sorted(float(packet['pts_time']) for packet in probe.get('packets', [])
+                   if 'K' in packet.get('flags', '') and packet.get('pts_time') not in (None, 'N/A'))
+    with _keyframes_lock:
+        _keyframes_memo[memo_key] = times
+    return times
+
+
+def _num(value, default=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def cut_window(plan, output_id):
+    """
+    (début, fin, ids des trim) dans la source si la sortie ne lit l'entrée
+    qu'à travers des trim (fin None = jusqu'au bout), sinon None.
+    Des trim successifs sont composés : chacun s'exprime dans le temps de
+    l'extrait produit par le précédent.
+    """
+    by_id = {node['id']: node for node in plan}
+    chain = []
+    node = by_id[by_id[output_id]['inputs'][0]]
+    while node['name'] != 'input':
+        if node['name'] != 'trim':
+            return None
+        chain.append(node)
+        node = by_id[node['inputs'][0]]
+    if not chain:
+        return None
+
+    start, end = 0.0, None
+    for trim in reversed(chain):
+        trim_start = max(0.0, _num(trim['params'].get('start', 0), 0.0))
+        trim_end = _num(trim['params'].get('end')) or None  # 0 ou vide : jusqu'à la fin
+        new_start = start + trim_start
+        new_end = start + trim_end if trim_end is not None else None
+        if end is not None:
+            new_start = min(new_start, end)
+            new_end = end if new_end is None else min(new_end, end)
+        start, end = new_start, new_end
+    return start, end, [trim['id'] for trim in reversed(chain)]
+
+
+def snap_to_keyframe(keyframes, start):
+    """Dernière image clé au plus tard à `start` (0 si aucune)"""
+    snapped = 0.0
+    for time in keyframes:
+        if time > start + 1e-6:
+            break
+        snapped = time
+    return snapped
+
+
+def plan_cut(plan, output, settings, keyframes, tolerance):
+    """
+    Découpe par copie de flux d'une sortie, ou None si elle doit passer par
+    le graphe de filtres. `settings` sont les réglages de la sortie sans
+    aucun flux modifié (la vidéo doit pouvoir être recopiée), `keyframes`
+    une fonction qui renvoie les images clés de la source.
+    Retourne {'start', 'duration', 'requested', 'nodes', 'description'}.
+    """
+    mode = output['params'].get('cut') or DEFAULT_CUT_MODE
+    if mode not in CUT_MODES:
+        raise GraphError(f"Mode de découpe inconnu: {mode}")
+    if mode == 'exact' or settings.get('vcodec') != 'copy':
+        return None
+    window = cut_window(plan, output['id'])
+    if window is None:
+        return None
+    start, end, trims = window
+
+    snapped = 0.0
+    if start > 0:
+        try:
+            snapped = snap_to_keyframe(keyframes(), start)
+        except (ffmpeg.Error, OSError):
+            return None
+        if mode == 'auto' and start - snapped > tolerance:
+            return None
+    if end is not None and end <= snapped:
+        return None
+
+    duration = round(end - snapped, 6) if end is not None else None
+    description = f"découpe sans réencodage (copie des flux) à partir de {snapped:.3f} s"
+    if snapped != start:
+        description += f" (image clé avant {start:.3f} s)"
+    return {
+        'start': round(snapped, 6),
+        'duration': duration,
+        'requested': [start, end],
+        'nodes': trims + [output['id']],
+        'description': description,
+    }
+
+
+def cut_input_options(cut):
+    """Options de ffmpeg.input pour une découpe"""
+    return {'ss': cut['start'] + SEEK_EPSILON} if cut['start'] else {}
+
+
+def cut_output_options(cut):
+    """Options de ffmpeg.output pour une découpe (horodatage remis à zéro)"""
+    options = {'avoid_negative_ts': 'make_zero'}
+    if cut['duration'] is not None:
+        options['t'] = cut['duration']
+    return options
@@ -0,0 +1,242 @@
+"""
+Compilation du graphe Drawflow en DAG de filtres
+
+Le workflow n'est plus aplati en une seule chaîne : chaque nœud garde ses
+entrées, ce qui permet les embranchements (une source vers plusieurs
+sorties, encodées dans le même appel ffmpeg) et les nœuds à plusieurs
+entrées (overlay, concat).
+
+Un plan est une liste de nœuds {'id', 'name', 'params', 'inputs'} dans
+l'ordre topologique, où 'inputs' est la liste ordonnée des nœuds amont.
+"""
+
+from collections import deque
+
+from optimizer import optimize_chain, FRAME_LOCAL_FILTERS
+
+# Nœuds à plusieurs entrées et leur nombre de ports d'entrée
+MULTI_INPUT_FILTERS = {'overlay': 2, 'concat': 2}
+
+# Filtres qui gardent la durée et l'horodatage des images : l'audio de la
+# source reste synchrone avec la vidéo filtrée. trim, speed, concat et les
+# filtres génériques (effet inconnu) n'en font pas partie.
+TIMELINE_PRESERVING_FILTERS = FRAME_LOCAL_FILTERS | {'fps', 'fade', 'overlay'}
+
+
+class GraphError(ValueError):
+    """Workflow invalide (cycle, nœud mal connecté...)"""
+
+
+def _port_index(port, default=1):
+    """'input_2' -> 2"""
+    try:
+        return int(str(port).rsplit('_', 1)[1])
+    except (IndexError, ValueError):
+        return default
+
+
+def parse_graph(nodes):
+    """
+    Construit {id: {'id', 'name', 'params', 'inputs'}} à partir des
+    connexions de sortie de chaque nœud Drawflow.
+    """
+    graph = {}
+    for node_id, node in nodes.items():
+        graph[str(node_id)] = {
+            'id': str(node_id),
+            'name': node.get('name'),
+            'params': node.get('data', {}) or {},
+            'ports': {},
+        }
+
+    for node_id, node in nodes.items():
+        for output_data in node.get('outputs', {}).values():
+            for conn in output_data.get('connections', []):
+                target = str(conn.get('node'))
+                if target not in graph:
+                    continue
+                port = _port_index(conn.get('output'))
+                ports = graph[target]['ports']
+                if port in ports:
+                    raise GraphError(f"Le nœud {target} a plusieurs connexions sur l'entrée {port}")
+                ports[port] = str(node_id)
+
+    for node in graph.values():
+        ports = node.pop('ports')
+        node['inputs'] = [ports[port] for port in sorted(ports)]
+    return graph
+
+
+def topological_order(graph):
+    """Ordre topologique (algorithme de Kahn) ; lève GraphError en cas de cycle"""
+    pending = {node_id: len(node['inputs']) for node_id, node in graph.items()}
+    consumers = {node_id: [] for node_id in graph}
+    for node_id, node in graph.items():
+        for upstream in node['inputs']:
+            consumers[upstream].append(node_id)
+
+    queue = deque(node_id for node_id, count in pending.items() if count == 0)
+    order = []
+    while queue:
+        current = queue.popleft()
+        order.append(current)
+        for consumer in consumers[current]:
+            pending[consumer] -= 1
+            if pending[consumer] == 0:
+                queue.append(consumer)
+
+    if len(order) != len(graph):
+        raise GraphError('Le workflow contient un cycle')
+    return order
+
+
+def _reachable(graph, order):
+    """Nœuds atteignables depuis une entrée et menant à une sortie"""
+    from_input = set()
+    for node_id in order:
+        node = graph[node_id]
+        if node['name'] == 'input' or any(i in from_input for i in node['inputs']):
+            from_input.add(node_id)
+
+    to_output = set()
+    for node_id in reversed(order):
+        node = graph[node_id]
+        if node_id in from_input and (node['name'] == 'output' or node_id in to_output):
+            to_output.add(node_id)
+            to_output.update(node['inputs'])
+    return [node_id for node_id in order if node_id in from_input and node_id in to_output]
+
+
+def compile_plan(nodes, source=None):
+    """
+    Compile le workflow en plan (liste topologique) et optimise chaque
+    portion linéaire de la chaîne.
+    Retourne (plan, réécritures de l'optimiseur).
+    """
+    graph = parse_graph(nodes)
+    if not any(node['name'] == 'input' for node in graph.values()):
+        raise GraphError("Aucun nœud d'entrée")
+    order = _reachable(graph, topological_order(graph))
+    if not any(graph[node_id]['name'] == 'output' for node_id in order):
+        raise GraphError("Aucun nœud de sortie relié à l'entrée")
+
+    kept = set(order)
+    consumers = {node_id: [] for node_id in order}
+    for node_id in order:
+        node = graph[node_id]
+        node['inputs'] = [i for i in node['inputs'] if i in kept]
+        for upstream in node['inputs']:
+            consumers[upstream].append(node_id)
+
+    for node_id in order:
+        node = graph[node_id]
+        expected = MULTI_INPUT_FILTERS.get(node['name'], 0 if node['name'] == 'input' else 1)
+        if node['name'] == 'concat':
+            valid = len(node['inputs']) >= 2
+        else:
+            valid = len(node['inputs']) == expected
+        if not valid:
+            raise GraphError(f"Le nœud {node_id} ({node['name']}) n'est pas correctement connecté")
+
+    def linear(node_id):
+        name = graph[node_id]['name']
+        return name not in ('input', 'output') and name not in MULTI_INPUT_FILTERS
+
+    plan = []
+    rewrites = []
+    replaced = {}  # id d'origine -> id dans le plan (fin de chaîne optimisée)
+    done = set()
+    for node_id in order:
+        if node_id in done:
+            continue
+        node = graph[node_id]
+        inputs = [replaced.get(i, i) for i in node['inputs']]
+
+        if not linear(node_id):
+            plan.append({'id': node_id, 'name': node['name'], 'params': node['params'], 'inputs': inputs})
+            done.add(node_id)
+            continue
+
+        # Portion linéaire : on suit tant que le nœud n'a qu'un consommateur linéaire
+        run = [node_id]
+        while len(consumers[run[-1]]) == 1 and linear(consumers[run[-1]][0]):
+            run.append(consumers[run[-1]][0])
+        done.update(run)
+
+        head_source = source if graph[node['inputs'][0]]['name'] == 'input' else None
+        chain = [{'id': n, 'name': graph[n]['name'], 'params': graph[n]['params']} for n in run]
+        chain, run_rewrites = optimize_chain(chain, head_source)
+        rewrites.extend(run_rewrites)
+
+        upstream = inputs[0]
+        for op in chain:
+            plan.append(dict(op, inputs=[upstream]))
+            upstream = op['id']
+        replaced[run[-1]] = upstream
+
+    return plan, rewrites
+
+
+def plan_outputs(plan):
+    """Nœuds de sortie du plan"""
+    return [node for node in plan if node['name'] == 'output']
+
+
+def plan_chain(plan, node_id):
+    """Filtres du chemin principal (première entrée) menant au nœud, dans l'ordre"""
+    by_id = {node['id']: node for node in plan}
+    chain = []
+    node = by_id[node_id]
+    while node['inputs']:
+        node = by_id[node['inputs'][0]]
+        if node['name'] != 'input':
+            chain.append(node)
+    return list(reversed(chain))
+
+
+def canonical_subgraph(plan, node_id):
+    """
+    Sérialisation canonique du sous-graphe menant à un nœud, indépendante
+    des identifiants Drawflow (sert à la clé du cache de rendus).
+    """
+    by_id = {node['id']: node for node in plan}
+    memo = {}
+
+    def canon(current):
+        if current not in memo:
+            node = by_id[current]
+            if node['name'] == 'input':
+                memo[current] = ['input']
+            else:
+                memo[current] = [node['name'], node['params'], [canon(i) for i in node['inputs']]]
+        return memo[current]
+
+    output = by_id[node_id]
+    return [canon(i) for i in output['inputs']]
+
+
+def untouched_streams(plan, node_id):
+    """
+    Flux de la source qu'une sortie peut recopier sans réencodage :
+    'video' si la sortie est directement reliée à l'entrée, 'audio' si
+    aucun nœud du sous-graphe ne change la ligne de temps.
+    """
+    by_id = {node['id']: node for node in plan}
+    output = by_id[node_id]
+    untouched = set()
+    if by_id[output['inputs'][0]]['name'] == 'input':
+        untouched.add('video')
+
+    seen = set()
+    stack = list(output['inputs'])
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        node = by_id[current]
+        if node['name'] != 'input' and node['name'] not in TIMELINE_PRESERVING_FILTERS:
+            return untouched
+        stack.extend(node['inputs'])
+    untouched.add('audio')
+    return untouched
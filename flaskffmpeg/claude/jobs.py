@@ -0,0 +1,260 @@
+"""
+File d'attente des rendus ffmpeg
+
+Les encodages sont exécutés par un pool de workers borné au lieu de bloquer
+le thread de la requête HTTP. Chaque job garde une référence vers le
+sous-processus ffmpeg pour pouvoir l'annuler.
+"""
+
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# États possibles d'un job
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = {DONE, FAILED, CANCELLED}
+
+
+class QueueFullError(Exception):
+    """Levée quand trop de jobs sont déjà en attente"""
+
+
+class JobCancelled(Exception):
+    """Levée dans le worker quand le job a été annulé"""
+
+
+def parse_progress(lines):
+    """
+    Lit la sortie `-progress pipe:1` de ffmpeg.
+    Chaque bloc clé=valeur se termine par une ligne `progress=continue|end`,
+    on retourne un dict par bloc.
+    """
+    block = {}
+    for raw in lines:
+        line = raw.decode(errors='replace').strip() if isinstance(raw, bytes) else raw.strip()
+        if '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        block[key] = value.strip()
+        if key == 'progress':
+            yield block
+            block = {}
+
+
+def summarize_progress(block, duration=None):
+    """Convertit un bloc de progression brut en valeurs numériques"""
+    def number(key, suffix=''):
+        value = block.get(key, '').rstrip(suffix)
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    out_time_us = number('out_time_us')
+    if out_time_us is None:
+        # Les anciennes versions de ffmpeg n'exposent que out_time_ms (en µs)
+        out_time_us = number('out_time_ms')
+    out_time = out_time_us / 1e6 if out_time_us is not None and out_time_us >= 0 else None
+
+    progress = {
+        'frame': int(number('frame') or 0),
+        'fps': number('fps'),
+        'out_time': out_time,
+        'speed': number('speed', 'x'),
+        'finished': block.get('progress') == 'end',
+        'percent': None,
+    }
+    if duration and out_time is not None:
+        progress['percent'] = round(min(100.0, out_time / duration * 100), 1)
+    if progress['finished']:
+        progress['percent'] = 100.0
+    return progress
+
+
+def workers_for_cpu(jobs_per_cpu, cpu_count=None):
+    """Calcule le nombre de workers à partir du nombre de CPU"""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, int(cpu_count * jobs_per_cpu))
+
+
+class Job:
+    """Un rendu ffmpeg suivi par le JobManager"""
+
+    def __init__(self, target, description=None, duration=None):
+        self.id = str(uuid.uuid4())
+        self.target = target
+        self.description = description or {}
+        self.duration = duration
+        self.state = QUEUED
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.process = None
+        self.cancel_requested = False
+        self._lock = threading.Lock()
+
+    def run_ffmpeg(self, argv):
+        """
+        Lance la commande ffmpeg `argv` (liste, voir /compile) de façon
+        asynchrone et attend la fin du processus. Le processus est conservé
+        sur le job pour permettre l'annulation, et la sortie `-progress`
+        met à jour `self.progress` au fil de l'eau.
+        """
+        argv = [argv[0], '-progress', 'pipe:1', '-nostats', '-y'] + list(argv[1:])
+        with self._lock:
+            if self.cancel_requested:
+                raise JobCancelled()
+            self.process = subprocess.Popen(argv, stdout=subprocess.PIPE,
+                                            stderr=subprocess.PIPE)
+        process = self.process
+
+        # stderr est vidé dans un thread séparé pour ne pas bloquer ffmpeg
+        stderr_tail = deque(maxlen=20)
+        stderr_thread = threading.Thread(
+            target=lambda: stderr_tail.extend(process.stderr), daemon=True)
+        stderr_thread.start()
+
+        for block in parse_progress(process.stdout):
+            self.progress = summarize_progress(block, self.duration)
+        process.wait()
+        stderr_thread.join()
+
+        if self.cancel_requested:
+            raise JobCancelled()
+        if process.returncode != 0:
+            message = [line.decode(errors='replace').strip() for line in stderr_tail]
+            message = [line for line in message if line]
+            raise RuntimeError(message[-1] if message else 'ffmpeg a échoué')
+
+    def kill(self):
+        """Demande l'annulation et tue le processus ffmpeg s'il tourne"""
+        with self._lock:
+            self.cancel_requested = True
+            process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'state': self.state,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        data.update(self.description)
+        if self.duration:
+            data['duration'] = self.duration
+        if self.progress is not None:
+            data['progress'] = self.progress
+        if self.started_at:
+            end = self.finished_at or time.time()
+            data['elapsed'] = round(end - self.started_at, 3)
+        if self.result is not None:
+            data['result'] = self.result
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+
+class JobManager:
+    """Pool de workers borné qui exécute les rendus en arrière-plan"""
+
+    def __init__(self, max_workers, max_pending=None, history_size=200):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='ffmpeg-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, target, description=None, duration=None):
+        """
+        Ajoute un job à la file.
+        `target` reçoit le job et retourne le résultat (dict sérialisable).
+        `duration` est la durée attendue de la sortie, pour le pourcentage.
+        """
+        job = Job(target, description, duration)
+        with self._lock:
+            if self.max_pending is not None and self._pending_count() >= self.max_pending:
+                raise QueueFullError('File de rendu pleine, réessayez plus tard')
+            self._jobs[job.id] = job
+            self._prune()
+            job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Annule un job en attente ou tue le ffmpeg d'un job en cours"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.state in FINISHED_STATES:
+            return job
+        if job.future is not None and job.future.cancel():
+            job.state = CANCELLED
+            job.finished_at = time.time()
+        else:
+            job.kill()
+        return job
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'queued': states.count(QUEUED),
+            'running': states.count(RUNNING),
+        }
+
+    def _run(self, job):
+        if job.cancel_requested:
+            job.state = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.state = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = job.target(job)
+            job.state = DONE
+        except JobCancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.state = FAILED
+        finally:
+            job.process = None
+            job.finished_at = time.time()
+
+    def _pending_count(self):
+        return sum(1 for job in self._jobs.values() if job.state == QUEUED)
+
+    def _prune(self):
+        """Oublie les jobs terminés les plus anciens au-delà de history_size"""
+        excess = len(self._jobs) - self.history_size
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].state in FINISHED_STATES:
+                del self._jobs[job_id]
+                excess -= 1
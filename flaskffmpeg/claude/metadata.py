@@ -0,0 +1,171 @@
+"""
+Métadonnées des vidéos uploadées
+
+ffprobe est lancé une seule fois par upload, en arrière-plan, et son
+résultat complet (flux et format) est écrit dans un fichier JSON à côté
+des uploads, avec le SHA-256 du fichier. Le compilateur, le pourcentage de
+progression et la clé du cache de rendus lisent ensuite ce fichier au lieu
+de relancer ffprobe ou de relire la vidéo, y compris après un redémarrage.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ffmpeg
+
+from render_cache import file_digest, remember_digest
+
+# États d'une entrée
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def parse_frame_rate(rate):
+    """Convertit un débit ffprobe ('30000/1001') en images par seconde"""
+    try:
+        num, den = (rate or '').split('/')
+        return float(num) / float(den) if float(den) else None
+    except ValueError:
+        return None
+
+
+def summarize_probe(probe):
+    """Informations utiles de la vidéo à partir du résultat de ffprobe"""
+    video = next(s for s in probe['streams'] if s['codec_type'] == 'video')
+    audio = next((s for s in probe['streams'] if s['codec_type'] == 'audio'), None)
+    return {
+        'width': int(video['width']),
+        'height': int(video['height']),
+        'duration': float(probe['format']['duration']),
+        'codec': video['codec_name'],
+        'fps': parse_frame_rate(video.get('avg_frame_rate')),
+        'has_audio': audio is not None,
+        'audio_codec': audio['codec_name'] if audio else None,
+    }
+
+
+class MetadataStore:
+    """
+    Fichiers JSON de métadonnées (un par upload) remplis en arrière-plan.
+    `on_ready(filename, filepath, info)` est appelé à la fin de chaque probe réussi.
+    """
+
+    def __init__(self, upload_folder, max_workers=2, on_ready=None):
+        self.upload_folder = upload_folder
+        self.folder = os.path.join(upload_folder, 'metadata')
+        os.makedirs(self.folder, exist_ok=True)
+        self.on_ready = on_ready
+        self._records = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='probe')
+
+    def path(self, filename):
+        return os.path.join(self.folder, os.path.basename(filename) + '.json')
+
+    def submit(self, filename, filepath, digest=None, replace=True):
+        """
+        Lance le probe de `filepath` en arrière-plan. `digest` évite de
+        relire le fichier quand son SHA-256 est déjà connu. Avec
+        `replace=False`, une entrée déjà connue n'est pas sondée à nouveau.
+        Retourne l'entrée courante.
+        """
+        with self._lock:
+            if not replace and filename in self._records:
+                return self._records[filename]
+            record = {'state': PENDING}
+            event = threading.Event()
+            self._records[filename] = record
+            self._events[filename] = event
+        self._executor.submit(self._probe, filename, filepath, digest, event)
+        return record
+
+    def get(self, filename, timeout=None):
+        """
+        Entrée complète ({'state', 'info', 'probe', 'sha256'...}) ou None.
+        Une vidéo de UPLOAD_FOLDER sans entrée (uploadée avant le magasin de
+        métadonnées) est sondée à ce moment-là. Si le probe est en cours,
+        attend au plus `timeout` secondes.
+        """
+        with self._lock:
+            record = self._records.get(filename)
+        if record is None:
+            record = self._load(filename) or self._probe_missing(filename)
+        if record is not None and record['state'] == PENDING and timeout:
+            with self._lock:
+                event = self._events.get(filename)
+            if event is not None:
+                event.wait(timeout)
+            with self._lock:
+                record = self._records.get(filename)
+        return record
+
+    def info(self, filename, timeout=None):
+        """Résumé (width, height, duration, codec, fps) ou None si indisponible"""
+        record = self.get(filename, timeout)
+        if record and record['state'] == READY:
+            return record['info']
+        return None
+
+    def _probe_missing(self, filename):
+        """Lance le probe d'un upload présent sur le disque mais jamais sondé"""
+        filepath = os.path.join(self.upload_folder, filename)
+        if os.path.basename(filename) != filename or not os.path.isfile(filepath):
+            return None
+        return self.submit(filename, filepath, replace=False)
+
+    def _probe(self, filename, filepath, digest, event):
+        record = {'state': FAILED, 'error': 'ffprobe a échoué'}
+        try:
+            probe = ffmpeg.probe(filepath)
+            st = os.stat(filepath)
+            record = {
+                'state': READY,
+                'info': summarize_probe(probe),
+                'probe': {'streams': probe['streams'], 'format': probe['format']},
+                'sha256': digest or file_digest(filepath),
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+            }
+            tmp_path = self.path(filename) + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(record, f)
+            os.replace(tmp_path, self.path(filename))
+        except Exception as e:
+            # Toute erreur (y compris une sortie de ffprobe inattendue) termine le
+            # probe ; un JSON non écrit laisse l'entrée prête pour cette exécution
+            if record['state'] != READY:
+                stderr = getattr(e, 'stderr', None)
+                error = stderr.decode(errors='replace').strip().splitlines()[-1] if stderr else str(e)
+                record = {'state': FAILED, 'error': error or 'ffprobe a échoué'}
+        finally:
+            # Les lecteurs en attente sont toujours libérés
+            with self._lock:
+                self._records[filename] = record
+                self._events.pop(filename, None)
+            event.set()
+
+        if record['state'] == READY and self.on_ready is not None:
+            self.on_ready(filename, filepath, record['info'])
+
+    def _load(self, filename):
+        """Relit l'entrée écrite avant un redémarrage"""
+        try:
+            with open(self.path(filename)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Le SHA-256 mémorisé reste valable tant que le fichier n'a pas changé
+        filepath = os.path.join(self.upload_folder, os.path.basename(filename))
+        try:
+            st = os.stat(filepath)
+            if (st.st_size, st.st_mtime_ns) == (record.get('size'), record.get('mtime_ns')):
+                remember_digest(filepath, record['sha256'])
+        except OSError:
+            pass
+        with self._lock:
+            return self._records.setdefault(filename, record)
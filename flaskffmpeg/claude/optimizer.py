@@ -0,0 +1,210 @@
+"""
+Optimiseur de la chaîne de filtres
+
+Réécrit chaque portion linéaire du graphe compilé (graph.py) avant la
+construction du pipeline ffmpeg, pour éviter des passes inutiles sur
+chaque image :
+- fusion des nœuds eq adjacents (luminosité, contraste, saturation)
+- annulation des doubles hflip / vflip
+- suppression des nœuds sans effet (speed=1, rotation 0, scale à la même taille...)
+- trim et fps déplacés en tête pour que les filtres suivants traitent moins d'images
+
+Chaque opération de la chaîne est un dict {'id', 'name', 'params'}.
+"""
+
+# Filtres qui traitent chaque image indépendamment de son horodatage :
+# trim et fps peuvent être déplacés avant eux sans changer le résultat.
+FRAME_LOCAL_FILTERS = {
+    'scale', 'crop', 'rotate', 'hflip', 'vflip', 'eq',
+    'brightness', 'contrast', 'saturation', 'blur', 'sharpen', 'grayscale'
+}
+
+EQ_FILTERS = {'brightness', 'contrast', 'saturation', 'eq'}
+
+# Bornes du filtre eq de ffmpeg
+EQ_LIMITS = {
+    'brightness': (-1.0, 1.0),
+    'contrast': (-1000.0, 1000.0),
+    'saturation': (0.0, 3.0),
+}
+
+MAX_PASSES = 10
+
+
+def _num(value, default=None):
+    """Convertit un paramètre en float (les valeurs du front peuvent être des chaînes)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _eq_params(op):
+    """Paramètres eq complets d'un nœud brightness / contrast / saturation / eq"""
+    params = op['params']
+    eq = {'brightness': 0.0, 'contrast': 1.0, 'saturation': 1.0}
+    if op['name'] == 'eq':
+        for key in eq:
+            eq[key] = _num(params.get(key), eq[key])
+    else:
+        eq[op['name']] = _num(params.get(op['name']), eq[op['name']])
+    return eq
+
+
+def _compose_eq(first, second):
+    """
+    Combine deux eq appliqués l'un après l'autre.
+    Pour la luma, eq calcule (x - 0.5) * contrast + 0.5 + brightness :
+    la luminosité du premier est donc multipliée par le contraste du second.
+    Retourne None si le résultat sort des bornes du filtre.
+    """
+    merged = {
+        'contrast': first['contrast'] * second['contrast'],
+        'brightness': first['brightness'] * second['contrast'] + second['brightness'],
+        'saturation': first['saturation'] * second['saturation'],
+    }
+    for key, (low, high) in EQ_LIMITS.items():
+        if not low <= merged[key] <= high:
+            return None
+    return {key: round(value, 6) for key, value in merged.items()}
+
+
+def _is_eq_identity(eq):
+    return eq['brightness'] == 0 and eq['contrast'] == 1 and eq['saturation'] == 1
+
+
+def _push_forward(chain, rewrites, source):
+    """Déplace trim (et fps quand il réduit la cadence) avant les filtres image par image"""
+    source_fps = _num(source.get('fps'))
+    chain = list(chain)
+    for i in range(1, len(chain)):
+        op = chain[i]
+        if op['name'] == 'trim':
+            crossable = FRAME_LOCAL_FILTERS | {'fps'}
+        elif op['name'] == 'fps':
+            target = _num(op['params'].get('fps', 30))
+            if not (source_fps and target and target <= source_fps):
+                continue
+            crossable = FRAME_LOCAL_FILTERS
+        else:
+            continue
+        j = i
+        while j > 0 and chain[j - 1]['name'] in crossable:
+            j -= 1
+        if j < i:
+            crossed = [other['id'] for other in chain[j:i]]
+            chain.insert(j, chain.pop(i))
+            rewrites.append({
+                'rule': 'push_forward',
+                'nodes': [op['id']] + crossed,
+                'description': f"{op['name']} déplacé avant {len(crossed)} filtre(s)"
+            })
+    return chain
+
+
+def _drop_identities(chain, rewrites, source):
+    """Supprime les nœuds qui ne modifient pas l'image"""
+    width, height = _num(source.get('width')), _num(source.get('height'))
+    result = []
+    for op in chain:
+        name, params = op['name'], op['params']
+        identity = False
+
+        if name == 'speed':
+            identity = _num(params.get('speed', 1.0)) == 1.0
+        elif name == 'rotate':
+            angle = _num(params.get('angle', 0))
+            identity = angle is not None and angle % 360 == 0
+        elif name in EQ_FILTERS:
+            identity = _is_eq_identity(_eq_params(op))
+        elif name == 'blur':
+            identity = _num(params.get('sigma', 1)) == 0
+        elif name == 'sharpen':
+            identity = _num(params.get('amount', 1.0)) == 0
+        elif name == 'trim':
+            identity = not _num(params.get('start', 0)) and not params.get('end')
+        elif name == 'scale':
+            w, h = _num(params.get('width', -1)), _num(params.get('height', -1))
+            if width and height and w in (width, -1) and h in (height, -1) and (w, h) != (-1, -1):
+                identity = True
+            elif w and h and w > 0 and h > 0:
+                width, height = w, h
+            else:
+                width = height = None
+        elif name == 'crop':
+            w, h = _num(params.get('w')), _num(params.get('h'))
+            x, y = _num(params.get('x', 0)), _num(params.get('y', 0))
+            if width and height and (w, h, x, y) == (width, height, 0, 0):
+                identity = True
+            elif w and h:
+                width, height = w, h
+            else:
+                width = height = None
+        elif name not in FRAME_LOCAL_FILTERS | {'fps', 'fade'}:
+            # Filtre générique : taille de sortie inconnue
+            width = height = None
+
+        if identity:
+            rewrites.append({
+                'rule': 'drop_identity',
+                'nodes': [op['id']],
+                'description': f"{name} sans effet supprimé"
+            })
+        else:
+            result.append(op)
+    return result
+
+
+def _cancel_flips(chain, rewrites):
+    """Deux hflip (ou deux vflip) consécutifs s'annulent"""
+    result = []
+    for op in chain:
+        if op['name'] in ('hflip', 'vflip') and result and result[-1]['name'] == op['name']:
+            previous = result.pop()
+            rewrites.append({
+                'rule': 'cancel_flip',
+                'nodes': [previous['id'], op['id']],
+                'description': f"double {op['name']} annulé"
+            })
+        else:
+            result.append(op)
+    return result
+
+
+def _merge_eq(chain, rewrites):
+    """Fusionne les nœuds eq adjacents en un seul filtre eq"""
+    result = []
+    for op in chain:
+        previous = result[-1] if result else None
+        if op['name'] in EQ_FILTERS and previous and previous['name'] in EQ_FILTERS:
+            merged = _compose_eq(_eq_params(previous), _eq_params(op))
+            if merged is not None:
+                result[-1] = {'id': f"{previous['id']}+{op['id']}", 'name': 'eq', 'params': merged}
+                rewrites.append({
+                    'rule': 'merge_eq',
+                    'nodes': [previous['id'], op['id']],
+                    'description': f"{previous['name']} et {op['name']} fusionnés en un seul eq"
+                })
+                continue
+        result.append(op)
+    return result
+
+
+def optimize_chain(chain, source=None):
+    """
+    Optimise une chaîne de filtres.
+    `source` contient les infos de la vidéo d'entrée (width, height, fps) si connues.
+    Retourne (chaîne optimisée, liste des réécritures effectuées).
+    """
+    source = source or {}
+    rewrites = []
+    chain = list(chain)
+    for _ in range(MAX_PASSES):
+        before = len(rewrites)
+        chain = _push_forward(chain, rewrites, source)
+        chain = _drop_identities(chain, rewrites, source)
+        chain = _cancel_flips(chain, rewrites)
+        chain = _merge_eq(chain, rewrites)
+        if len(rewrites) == before:
+            break
+    return chain, rewrites
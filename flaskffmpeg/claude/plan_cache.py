@@ -0,0 +1,102 @@
+"""
+Cache des workflows compilés
+
+Compiler un workflow (validation contre le schéma, graphe, optimiseur,
+clés du cache de rendus, découpes, argv ffmpeg) ne dépend que des nœuds
+Drawflow, du fichier source et de ses métadonnées. Le résultat est
+mémorisé sous le hash de ces trois éléments : /process et /compile ne
+recompilent pas un workflow déjà vu.
+
+Quand une partie seulement des sorties est à rendre, l'argv de ce sous-
+ensemble est compilé une fois et mémorisé sous une clé dérivée
+(subset_key), avec les seules sorties qu'il rend.
+
+Une compilation mémorisée est figée : elle est sérialisée une fois et
+chaque lecture en renvoie une copie, qu'une requête peut modifier sans
+effet sur les suivantes.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+def workflow_digest(nodes):
+    """Hash des nœuds Drawflow, sans les données de présentation (positions, HTML)"""
+    canonical = {}
+    for node_id, node in nodes.items():
+        connections = sorted(
+            [port, str(conn.get('node')), str(conn.get('output'))]
+            for port, output in (node.get('outputs') or {}).items()
+            for conn in output.get('connections', []))
+        canonical[str(node_id)] = [node.get('name'), node.get('data') or {}, connections]
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def plan_key(digest, input_path, size, mtime_ns, source):
+    """Clé d'une compilation : workflow, fichier source (chemin, taille, mtime) et ses métadonnées"""
+    payload = json.dumps([digest, input_path, size, mtime_ns, source],
+                         sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def subset_key(key, nodes):
+    """Clé de l'argv qui ne rend que les sorties `nodes` de la compilation `key`"""
+    return key + '/' + '+'.join(sorted(str(node) for node in nodes))
+
+
+class CompiledWorkflow:
+    """
+    Compilation figée : {'workflow', 'errors', 'plan', 'optimizations', 'outputs', 'argv'},
+    ou {'workflow', 'errors', 'outputs', 'argv'} pour un sous-ensemble de sorties
+    """
+
+    def __init__(self, data):
+        self._data = json.dumps(data)
+        self.digest = data['workflow']
+        self.errors = len(data['errors'])
+
+    def to_dict(self):
+        """Copie modifiable de la compilation"""
+        return json.loads(self._data)
+
+
+class PlanCache:
+    """LRU des compilations, borné en nombre d'entrées"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # clé -> CompiledWorkflow
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return compiled
+
+    def put(self, key, compiled):
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
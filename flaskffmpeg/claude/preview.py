@@ -0,0 +1,190 @@
+"""
+Prévisualisation rapide sur proxy basse résolution
+
+À l'upload, une copie 360p à GOP court (proxy) est encodée en arrière-plan.
+Les prévisualisations lisent ce proxy à partir d'un instant choisi au lieu
+de décoder la source pleine résolution depuis le début. Les paramètres en
+pixels du workflow (crop, scale...) sont mis à l'échelle du proxy.
+
+Pour les réglages fins (flou, rognage...), une seule image suffit : l'image
+source décodée est gardée en mémoire (LRU borné, indexé par upload et
+instant) et la chaîne de filtres lui est appliquée via des pipes, sans
+fichier temporaire. L'instant demandé est celui de la sortie, ramené dans
+la source comme pour les prévisualisations vidéo (seek.py).
+"""
+
+import threading
+from collections import OrderedDict
+
+import ffmpeg
+
+from seek import map_instant
+
+PROXY_HEIGHT = 360
+PROXY_GOP = 12  # une image clé toutes les 12 images: seek quasi immédiat
+
+# Paramètres exprimés en pixels de la source, par filtre
+PIXEL_PARAMS = {
+    'scale': ('width', 'height'),
+    'crop': ('w', 'h', 'x', 'y'),
+    'overlay': ('x', 'y'),
+    'blur': ('sigma',),
+}
+# Dimensions qui doivent rester paires pour l'encodeur yuv420p
+EVEN_PARAMS = {'width', 'height', 'w', 'h'}
+
+# Filtres qui ne modifient que le temps : sans effet sur une image fixe
+TIME_ONLY_FILTERS = {'trim', 'speed', 'fps'}
+# Filtres qui dépendent de l'horodatage de l'image
+TIMED_FILTERS = {'fade'}
+
+# Format d'image -> (encodeur ffmpeg, type MIME)
+FRAME_FORMATS = {
+    'jpeg': ('mjpeg', 'image/jpeg'),
+    'webp': ('libwebp', 'image/webp'),
+}
+
+
+def build_proxy(source_path, proxy_path, source_height, height=PROXY_HEIGHT):
+    """Encode le proxy (vidéo seule, 360p, GOP court, encodage le plus rapide)"""
+    (
+        ffmpeg
+        .input(source_path)
+        .video
+        .filter('scale', -2, min(height, source_height))
+        .output(proxy_path, vcodec='libx264', preset='ultrafast', crf=30,
+                g=PROXY_GOP, pix_fmt='yuv420p', movflags='+faststart')
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+
+def proxy_factor(source_height, height=PROXY_HEIGHT):
+    """Rapport de taille proxy / source"""
+    if not source_height or source_height <= height:
+        return 1.0
+    return height / source_height
+
+
+def _scale_value(name, value, factor):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value  # expression ffmpeg ('iw', ...) laissée telle quelle
+    if name == 'sigma':
+        return round(number * factor, 3)
+    if number <= 0:
+        return value  # -1 / -2: conserver le ratio
+    scaled = max(1, round(number * factor))
+    if name in EVEN_PARAMS:
+        scaled = max(2, scaled - scaled % 2)
+    return scaled
+
+
+def scale_plan(plan, factor):
+    """Copie du plan avec les paramètres en pixels ramenés à la taille du proxy"""
+    if factor == 1.0:
+        return plan
+    scaled = []
+    for node in plan:
+        keys = PIXEL_PARAMS.get(node['name'])
+        if keys:
+            params = dict(node['params'])
+            for key in keys:
+                if key in params:
+                    params[key] = _scale_value(key, params[key], factor)
+            node = dict(node, params=params)
+        scaled.append(node)
+    return scaled
+
+
+def decode_frame(source_path, timestamp):
+    """
+    Décode l'image de la source à `timestamp` (secondes) en PPM, format qui
+    porte ses dimensions et peut être relu tel quel par ffmpeg sur stdin.
+    """
+    frame, _ = (
+        ffmpeg
+        .input(source_path, ss=timestamp)
+        .output('pipe:', vframes=1, format='image2pipe', vcodec='ppm')
+        .run(capture_stdout=True, quiet=True)
+    )
+    if not frame:
+        raise ValueError(f"Aucune image à {timestamp} s")
+    return frame
+
+
+def still_plan(plan, output_id, time):
+    """
+    Plan d'une image fixe de la sortie `output_id` à l'instant `time` (temps
+    de la sortie, comme /preview). Retourne (plan, instant de la source).
+    L'instant est ramené dans la source à travers les trim et les
+    changements de vitesse, qui disparaissent du plan (les consommateurs
+    sont reconnectés). Un fondu reste dans le plan : l'image, lue avec
+    l'horodatage 0, est d'abord recalée (setpts) à l'instant que ce fondu
+    aurait vu. Sans correspondance possible (concat...), `time` est pris
+    comme instant de la source.
+    """
+    instants = map_instant(plan, output_id, time)
+    replaced = {}
+    result = []
+    for node in plan:
+        inputs = [replaced.get(i, i) for i in node['inputs']]
+        if node['name'] in TIME_ONLY_FILTERS:
+            replaced[node['id']] = inputs[0]
+            continue
+        if node['name'] in TIMED_FILTERS:
+            at = instants.get(node['id'], time) if instants else time
+            retimed = f"{node['id']}_setpts"
+            result.append({'id': retimed, 'name': 'setpts', 'inputs': inputs[:1],
+                           'params': {'expr': f"{round(at, 6)}/TB"}})
+            inputs = [retimed] + inputs[1:]
+        result.append(dict(node, inputs=inputs))
+
+    source_time = time
+    if instants:
+        source_time = next((instants[node['id']] for node in plan
+                            if node['name'] == 'input' and node['id'] in instants), time)
+    return result, source_time
+
+
+class FrameCache:
+    """LRU des images sources décodées, borné en octets"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()  # (upload, instant) -> octets PPM
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, source_path, upload, timestamp):
+        """Image à `timestamp`, décodée seulement si elle n'est pas déjà en cache"""
+        key = (upload, round(float(timestamp), 3))
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return frame
+            self.misses += 1
+        frame = decode_frame(source_path, key[1])
+        with self._lock:
+            if key not in self._frames:
+                self._frames[key] = frame
+                self._bytes += len(frame)
+                while self._bytes > self.max_bytes and len(self._frames) > 1:
+                    _, evicted = self._frames.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return frame
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._frames),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
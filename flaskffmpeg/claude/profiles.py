@@ -0,0 +1,90 @@
+"""
+Profils d'encodage nommés
+
+Chaque nœud de sortie choisit un profil (`profile` : draft, web ou archive,
+web par défaut) qui fixe codec, preset, CRF, tune et threads de l'encodeur
+vidéo ainsi que l'encodage audio. Les réglages explicites du nœud (crf,
+preset, vcodec...) s'appliquent par-dessus le profil.
+
+Les codecs sont logiciels (libx264, aac) : disponibles dans toute build
+ffmpeg, sans dépendre d'un GPU ni d'un encodeur matériel.
+
+Un flux que le graphe ne modifie pas est recopié (`copy`) au lieu d'être
+réencodé, si son codec est accepté par le conteneur de sortie (MP4) :
+- la vidéo quand la sortie est directement reliée à l'entrée,
+- l'audio quand aucun filtre du chemin ne change la ligne de temps
+  (voir graph.untouched_streams).
+"""
+
+from graph import GraphError
+
+DEFAULT_PROFILE = 'web'
+
+# threads: None = part du CPU réservée à un rendu (voir app.ENCODER_THREADS),
+# 0 = tous les cœurs (ffmpeg choisit)
+PROFILES = {
+    # Brouillon : encodage le plus rapide, fichier lourd, décodage léger
+    'draft': {'vcodec': 'libx264', 'preset': 'ultrafast', 'crf': 30, 'tune': 'fastdecode',
+              'threads': 0, 'acodec': 'aac', 'audio_bitrate': '96k'},
+    # Diffusion web : réglages par défaut de libx264, lecture progressive
+    'web': {'vcodec': 'libx264', 'preset': 'medium', 'crf': 23, 'tune': None,
+            'threads': None, 'acodec': 'aac', 'audio_bitrate': '128k'},
+    # Archive : qualité quasi transparente, encodage lent
+    'archive': {'vcodec': 'libx264', 'preset': 'slow', 'crf': 18, 'tune': None,
+                'threads': None, 'acodec': 'aac', 'audio_bitrate': '192k'},
+}
+
+# Options communes à toutes les sorties encodées en MP4
+CONTAINER_SETTINGS = {'pix_fmt': 'yuv420p', 'movflags': '+faststart'}
+
+# Réglages qu'un nœud de sortie peut surcharger (une rendition par sortie)
+OUTPUT_SETTINGS_KEYS = {'vcodec', 'acodec', 'crf', 'preset', 'tune', 'threads',
+                        'video_bitrate', 'audio_bitrate'}
+
+# Codecs (noms ffprobe) recopiables tels quels dans un MP4
+MP4_VIDEO_CODECS = {'h264', 'hevc', 'mpeg4', 'av1', 'vp9'}
+MP4_AUDIO_CODECS = {'aac', 'mp3', 'ac3', 'eac3', 'opus', 'alac', 'flac'}
+
+VIDEO_ENCODER_KEYS = ('preset', 'crf', 'tune', 'threads', 'video_bitrate', 'pix_fmt')
+
+
+class ProfileError(GraphError):
+    """Profil d'encodage inconnu"""
+
+
+def encoder_settings(params, threads=None, source=None, untouched=()):
+    """
+    Réglages ffmpeg d'une sortie : profil, surcharges du nœud (`params`),
+    puis recopie des flux `untouched` (sous-ensemble de {'video', 'audio'})
+    quand `source` (infos de la vidéo d'entrée) confirme que le conteneur
+    les accepte. Sans `source`, tous les flux sont réencodés.
+    Retourne un dict d'options de ffmpeg.output ; 'an' signifie sans audio.
+    """
+    name = params.get('profile') or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ProfileError(f"Profil d'encodage inconnu: {name}")
+    settings = dict(PROFILES[name], **CONTAINER_SETTINGS)
+    overrides = {k: v for k, v in params.items() if k in OUTPUT_SETTINGS_KEYS and v not in (None, '')}
+    settings.update(overrides)
+    if settings['threads'] is None:
+        settings['threads'] = threads
+    settings = {k: v for k, v in settings.items() if v is not None}
+
+    source = source or {}
+    # Un codec imposé par le nœud demande un réencodage
+    if ('video' in untouched and 'vcodec' not in overrides
+            and source.get('codec') in MP4_VIDEO_CODECS):
+        settings['vcodec'] = 'copy'
+        for key in VIDEO_ENCODER_KEYS:
+            settings.pop(key, None)
+
+    if 'audio' not in untouched or source.get('has_audio') is False:
+        # Filtre qui change la ligne de temps (trim, speed...) : l'audio de la
+        # source ne serait plus synchrone
+        for key in ('acodec', 'audio_bitrate'):
+            settings.pop(key, None)
+        settings['an'] = None
+    elif 'acodec' not in overrides and source.get('audio_codec') in MP4_AUDIO_CODECS:
+        settings['acodec'] = 'copy'
+        settings.pop('audio_bitrate', None)
+    return settings
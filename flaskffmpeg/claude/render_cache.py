@@ -0,0 +1,154 @@
+"""
+Cache des rendus adressé par contenu
+
+La clé d'un rendu est le hash du fichier source, le sous-graphe de filtres
+qui mène à la sortie (sérialisé de façon canonique) et les réglages de l'encodeur.
+Un rendu identique renvoie donc directement le fichier déjà produit.
+Les sorties sont évincées par ordre LRU au-delà d'un budget disque.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 1024 * 1024
+
+# Hash des fichiers source, indexé par (chemin, taille, mtime)
+_digest_memo = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path):
+    """SHA-256 du contenu d'un fichier (mémorisé tant qu'il n'est pas modifié)"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        if memo_key in _digest_memo:
+            return _digest_memo[memo_key]
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digest_lock:
+        _digest_memo[memo_key] = digest
+    return digest
+
+
+def remember_digest(path, digest):
+    """Enregistre un hash déjà calculé ailleurs (upload par morceaux) pour éviter de relire le fichier"""
+    st = os.stat(path)
+    with _digest_lock:
+        _digest_memo[(os.path.abspath(path), st.st_size, st.st_mtime_ns)] = digest
+
+
+class RenderCache:
+    """Index LRU des sorties présentes dans le dossier de sortie"""
+
+    def __init__(self, folder, max_bytes, prefix='output_', extension='.mp4'):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # clé -> taille en octets
+        self._lock = threading.Lock()
+        self._load()
+
+    def key(self, input_path, chain, encoder):
+        """Clé de cache d'un rendu"""
+        payload = json.dumps({
+            'input': file_digest(input_path),
+            'chain': chain,
+            'encoder': encoder,
+        }, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def filename(self, key):
+        return f"{self.prefix}{key}{self.extension}"
+
+    def temp_filename(self, key):
+        """Nom de fichier pendant le rendu (jamais servi comme un hit)"""
+        return f"{self.prefix}{key}.partial{self.extension}"
+
+    def lookup(self, key):
+        """Retourne le nom du fichier en cache, ou None"""
+        path = os.path.join(self.folder, self.filename(key))
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                self._entries.pop(key, None)
+                self.misses += 1
+                hit = False
+        if not hit:
+            return None
+        # mtime sert d'ordre LRU après un redémarrage
+        os.utime(path)
+        return self.filename(key)
+
+    def store(self, key):
+        """Publie le rendu terminé sous son nom définitif puis applique le budget"""
+        tmp_path = os.path.join(self.folder, self.temp_filename(key))
+        path = os.path.join(self.folder, self.filename(key))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._entries[key] = os.path.getsize(path)
+            self._entries.move_to_end(key)
+            self._evict(keep=key)
+        return self.filename(key)
+
+    def discard(self, key):
+        """Supprime le fichier partiel d'un rendu échoué ou annulé"""
+        tmp_path = os.path.join(self.folder, self.temp_filename(key))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+            }
+
+    def _load(self):
+        """Reconstruit l'index depuis le dossier, du moins au plus récent"""
+        found = []
+        for name in os.listdir(self.folder):
+            if not (name.startswith(self.prefix) and name.endswith(self.extension)):
+                continue
+            key = name[len(self.prefix):-len(self.extension)]
+            path = os.path.join(self.folder, name)
+            if key.endswith('.partial'):
+                os.remove(path)
+                continue
+            st = os.stat(path)
+            found.append((st.st_mtime, key, st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+
+    def _evict(self, keep=None):
+        total = sum(self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key)
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.folder, self.filename(key)))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,248 @@
+"""
+Schéma des nœuds du workflow et validation
+
+FILTERS est la liste servie par /filters (le front en construit les
+nœuds). Avant toute compilation, chaque nœud reçu est vérifié contre ce
+schéma : nom connu, nombres convertibles et dans les bornes des curseurs,
+valeur parmi les options d'une liste. Un filtre inconnu ou un paramètre
+invalide est ainsi signalé avant le lancement de ffmpeg, avec l'id du
+nœud fautif.
+
+Les paramètres en pixels (`expression`) acceptent aussi une expression
+ffmpeg ('iw/2', '(iw-ow)/2'...). Les caractères qui séparent les options
+ou les filtres (':', ';', ',', '[', ']') y sont refusés. Une valeur vide
+ou nulle vaut la valeur par défaut ; les clés absentes du schéma sont
+ignorées.
+"""
+
+import re
+
+from graph import GraphError
+from profiles import PROFILES
+from fastpath import CUT_MODES
+
+FILTERS = [
+    {
+        'name': 'scale',
+        'label': 'Redimensionner',
+        'params': [
+            {'name': 'width', 'label': 'Largeur', 'type': 'number', 'default': 1280, 'expression': True},
+            {'name': 'height', 'label': 'Hauteur', 'type': 'number', 'default': 720, 'expression': True}
+        ]
+    },
+    {
+        'name': 'crop',
+        'label': 'Rogner',
+        'params': [
+            {'name': 'w', 'label': 'Largeur', 'type': 'number', 'default': 640, 'expression': True},
+            {'name': 'h', 'label': 'Hauteur', 'type': 'number', 'default': 480, 'expression': True},
+            {'name': 'x', 'label': 'Position X', 'type': 'number', 'default': 0, 'expression': True},
+            {'name': 'y', 'label': 'Position Y', 'type': 'number', 'default': 0, 'expression': True}
+        ]
+    },
+    {
+        'name': 'rotate',
+        'label': 'Rotation',
+        'params': [
+            {'name': 'angle', 'label': 'Angle (degrés)', 'type': 'number', 'default': 0}
+        ]
+    },
+    {
+        'name': 'hflip',
+        'label': 'Miroir horizontal',
+        'params': []
+    },
+    {
+        'name': 'vflip',
+        'label': 'Miroir vertical',
+        'params': []
+    },
+    {
+        'name': 'brightness',
+        'label': 'Luminosité',
+        'params': [
+            {'name': 'brightness', 'label': 'Luminosité', 'type': 'range', 'min': -1, 'max': 1, 'step': 0.1, 'default': 0}
+        ]
+    },
+    {
+        'name': 'contrast',
+        'label': 'Contraste',
+        'params': [
+            {'name': 'contrast', 'label': 'Contraste', 'type': 'range', 'min': 0, 'max': 3, 'step': 0.1, 'default': 1}
+        ]
+    },
+    {
+        'name': 'saturation',
+        'label': 'Saturation',
+        'params': [
+            {'name': 'saturation', 'label': 'Saturation', 'type': 'range', 'min': 0, 'max': 3, 'step': 0.1, 'default': 1}
+        ]
+    },
+    {
+        'name': 'blur',
+        'label': 'Flou',
+        'params': [
+            {'name': 'sigma', 'label': 'Intensité', 'type': 'range', 'min': 0, 'max': 10, 'step': 0.5, 'default': 1}
+        ]
+    },
+    {
+        'name': 'sharpen',
+        'label': 'Netteté',
+        'params': [
+            {'name': 'amount', 'label': 'Intensité', 'type': 'range', 'min': 0, 'max': 5, 'step': 0.1, 'default': 1}
+        ]
+    },
+    {
+        'name': 'fade',
+        'label': 'Fondu',
+        'params': [
+            {'name': 'type', 'label': 'Type', 'type': 'select', 'options': ['in', 'out'], 'default': 'in'},
+            {'name': 'duration', 'label': 'Durée (s)', 'type': 'number', 'default': 1}
+        ]
+    },
+    {
+        'name': 'grayscale',
+        'label': 'Noir et blanc',
+        'params': []
+    },
+    {
+        'name': 'speed',
+        'label': 'Vitesse',
+        'params': [
+            {'name': 'speed', 'label': 'Vitesse', 'type': 'range', 'min': 0.25, 'max': 4, 'step': 0.25, 'default': 1}
+        ]
+    },
+    {
+        'name': 'fps',
+        'label': 'FPS',
+        'params': [
+            {'name': 'fps', 'label': 'Images par seconde', 'type': 'number', 'default': 30}
+        ]
+    },
+    {
+        'name': 'trim',
+        'label': 'Découper',
+        'params': [
+            {'name': 'start', 'label': 'Début (s)', 'type': 'number', 'default': 0},
+            {'name': 'end', 'label': 'Fin (s)', 'type': 'number', 'default': 10}
+        ]
+    },
+    {
+        'name': 'overlay',
+        'label': 'Incrustation',
+        'inputs': 2,
+        'params': [
+            {'name': 'x', 'label': 'Position X', 'type': 'number', 'default': 0, 'expression': True},
+            {'name': 'y', 'label': 'Position Y', 'type': 'number', 'default': 0, 'expression': True}
+        ]
+    },
+    {
+        'name': 'concat',
+        'label': 'Concaténer',
+        'inputs': 2,
+        'params': []
+    }
+]
+
+FILTERS_BY_NAME = {spec['name']: spec for spec in FILTERS}
+
+# Paramètres du nœud de sortie vérifiés (les autres sont des options d'encodage libres)
+OUTPUT_PARAMS = [
+    {'name': 'profile', 'type': 'select', 'options': list(PROFILES)},
+    {'name': 'cut', 'type': 'select', 'options': list(CUT_MODES)},
+    {'name': 'crf', 'type': 'range', 'min': 0, 'max': 51},
+    {'name': 'threads', 'type': 'number', 'min': 0},
+]
+
+# Expression ffmpeg sans séparateur d'options ni de filtres
+EXPRESSION = re.compile(r'^[\w\s.+\-*/()<>=!?&|^%]+$')
+
+
+def describe_errors(errors):
+    """Message lisible d'une liste d'erreurs {'node', 'name', 'param', 'error'}"""
+    messages = []
+    for error in errors:
+        if error['node'] is None:
+            messages.append(error['error'])  # erreur du graphe (cycle, connexions...)
+            continue
+        where = f"nœud {error['node']} ({error['name']})"
+        if error['param']:
+            where += f", {error['param']}"
+        messages.append(f"{where} : {error['error']}")
+    return '; '.join(messages)
+
+
+class WorkflowError(GraphError):
+    """Nœuds invalides ; `errors` liste {'node', 'name', 'param', 'error'}"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(describe_errors(errors))
+
+
+def _check_param(spec, value):
+    """Message d'erreur pour une valeur de paramètre, ou None"""
+    if spec['type'] == 'select':
+        if value not in spec['options']:
+            return f"valeur {value!r} hors de {spec['options']}"
+        return None
+
+    # number / range
+    if isinstance(value, bool):
+        return f"nombre attendu, reçu {value!r}"
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        if spec.get('expression') and isinstance(value, str) and EXPRESSION.match(value):
+            return None
+        return f"nombre attendu, reçu {value!r}"
+    if number != number or number in (float('inf'), float('-inf')):
+        return f"nombre fini attendu, reçu {value!r}"
+    if 'min' in spec and number < spec['min']:
+        return f"{number:g} inférieur au minimum {spec['min']}"
+    if 'max' in spec and number > spec['max']:
+        return f"{number:g} supérieur au maximum {spec['max']}"
+    return None
+
+
+def validate_nodes(nodes):
+    """
+    Vérifie les nœuds Drawflow ({id: nœud}) contre le schéma.
+    Retourne la liste des erreurs (vide si le workflow est valide).
+    """
+    errors = []
+
+    def error(node_id, name, param, message):
+        errors.append({'node': str(node_id), 'name': name, 'param': param, 'error': message})
+
+    for node_id, node in nodes.items():
+        name = node.get('name')
+        if name == 'input':
+            continue
+        if name == 'output':
+            specs = OUTPUT_PARAMS
+        elif name in FILTERS_BY_NAME:
+            specs = FILTERS_BY_NAME[name]['params']
+        else:
+            error(node_id, name, None, 'filtre inconnu')
+            continue
+
+        params = node.get('data') or {}
+        if not isinstance(params, dict):
+            error(node_id, name, None, 'paramètres invalides')
+            continue
+        for spec in specs:
+            value = params.get(spec['name'])
+            if value is None or value == '':
+                continue
+            message = _check_param(spec, value)
+            if message:
+                error(node_id, name, spec['name'], message)
+    return errors
+
+
+def check_nodes(nodes):
+    """Lève WorkflowError si un nœud est invalide"""
+    errors = validate_nodes(nodes)
+    if errors:
+        raise WorkflowError(errors)
@@ -0,0 +1,208 @@
+"""
+Seek côté entrée : fenêtres temporelles passées au demuxer
+
+Un trim en tête de chaîne laisse ffmpeg décoder toutes les images depuis
+le début de la source pour les jeter ensuite dans le graphe de filtres.
+Ces fenêtres sont déplacées dans les options de l'entrée (`ss`, `t`) : le
+demuxer saute à l'image clé qui précède le début et le décodeur ne touche
+plus les images hors de la fenêtre.
+
+- Rendu : quand tous les consommateurs de l'entrée sont des trim, la source
+  est lue de leur début le plus tôt à leur fin la plus tardive. Les trim
+  sont réexprimés par rapport à ce début, ou supprimés s'ils coïncident
+  avec la fenêtre. Un trim remet ses horodatages à zéro comme le seek :
+  les filtres en aval (fade...) voient la même ligne de temps.
+- Prévisualisation : l'instant demandé est un instant de la sortie. La
+  fenêtre est ramenée dans le temps de la source à travers les trim (qui
+  disparaissent dans le seek) et les changements de vitesse. Un fondu voit
+  alors un flux qui commence au début de la fenêtre : son `start_time` est
+  décalé d'autant. Un fondu déjà en cours ne peut pas commencer avant 0 :
+  la lecture commence au début du fondu et l'avance est retirée en sortie.
+  Si la fenêtre ne peut pas être ramenée à la source (concat, filtre
+  générique), elle est appliquée en sortie.
+- Image fixe : l'instant de la sortie est ramené de la même façon dans le
+  temps de chaque nœud (`map_instant`).
+"""
+
+from graph import TIMELINE_PRESERVING_FILTERS
+
+EPSILON = 1e-6
+# Largeur de la fenêtre qui représente un instant (image fixe)
+INSTANT = 1e-3
+
+
+def _num(value, default=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _trim_bounds(params):
+    """(début, fin) d'un trim ; fin None = jusqu'au bout"""
+    start = max(0.0, _num(params.get('start', 0), 0.0))
+    end = _num(params.get('end')) or None  # 0 ou vide : jusqu'à la fin
+    return start, end
+
+
+def _rewrite(plan, removed, params):
+    """Copie du plan sans les nœuds `removed` (consommateurs reconnectés) et avec `params` (id -> paramètres)"""
+    replaced = {}
+    result = []
+    for node in plan:
+        inputs = [replaced.get(i, i) for i in node['inputs']]
+        if node['id'] in removed:
+            replaced[node['id']] = inputs[0]
+            continue
+        result.append(dict(node, inputs=inputs, params=params.get(node['id'], node['params'])))
+    return result
+
+
+def push_down_trims(plan, output_ids):
+    """
+    Passe les trim de tête des sorties `output_ids` dans le seek de l'entrée.
+    Retourne (plan, options de ffmpeg.input, réécritures) ; le plan est
+    inchangé si un consommateur de l'entrée n'est pas un trim.
+    """
+    by_id = {node['id']: node for node in plan}
+    needed = set()
+    stack = list(output_ids)
+    while stack:
+        node_id = stack.pop()
+        if node_id not in needed:
+            needed.add(node_id)
+            stack.extend(by_id[node_id]['inputs'])
+
+    heads = [node for node in plan if node['id'] in needed
+             and any(by_id[i]['name'] == 'input' for i in node['inputs'])]
+    if not heads or any(node['name'] != 'trim' for node in heads):
+        return plan, {}, []
+
+    bounds = {node['id']: _trim_bounds(node['params']) for node in heads}
+    start = min(s for s, _ in bounds.values())
+    ends = [e for _, e in bounds.values()]
+    end = None if None in ends else max(ends)
+    if end is not None and end <= start + EPSILON:
+        return plan, {}, []
+
+    options = {}
+    if start > 0:
+        options['ss'] = round(start, 6)
+    if end is not None:
+        options['t'] = round(end - start, 6)
+    if not options:
+        return plan, {}, []
+
+    removed, params = set(), {}
+    for node_id, (s, e) in bounds.items():
+        if s - start < EPSILON and (e is None or abs(e - end) < EPSILON):
+            removed.add(node_id)
+        else:
+            params[node_id] = dict(by_id[node_id]['params'], start=round(s - start, 6),
+                                   end=round(e - start, 6) if e is not None else None)
+
+    window = f"{start:.3f} s - {end:.3f} s" if end is not None else f"à partir de {start:.3f} s"
+    rewrites = [{
+        'rule': 'input_seek',
+        'nodes': sorted(bounds),
+        'description': f"lecture de la source limitée à la fenêtre des trim ({window})"
+    }]
+    return _rewrite(plan, removed, params), options, rewrites
+
+
+def _map_window(plan, output_id, start, end):
+    """
+    Fenêtre (début, fin, échelle) de chaque nœud du sous-graphe de la sortie,
+    dans le temps de ce nœud, pour la fenêtre [start, end] de la sortie.
+    L'échelle est la durée du nœud par seconde de sortie (produit des vitesses).
+    None si elle ne peut pas être ramenée à la source.
+    """
+    windows = {output_id: (start, end, 1.0)}
+    for node in reversed(plan):
+        if node['id'] not in windows:
+            continue
+        a, b, scale = windows[node['id']]
+        name = node['name']
+        if name in ('input', 'output') or name in TIMELINE_PRESERVING_FILTERS:
+            upstream = (a, b, scale)
+        elif name == 'speed':
+            speed = _num(node['params'].get('speed', 1.0), 1.0)
+            if speed <= 0:
+                return None
+            upstream = (a * speed, b * speed, scale * speed)
+        elif name == 'trim':
+            trim_start, trim_end = _trim_bounds(node['params'])
+            upstream_end = trim_start + b if trim_end is None else min(trim_end, trim_start + b)
+            upstream = (trim_start + a, upstream_end, scale)
+            if upstream_end <= upstream[0] + EPSILON:
+                return None
+        else:
+            # concat, filtre générique : ligne de temps inconnue
+            return None
+        for upstream_id in node['inputs']:
+            known = windows.setdefault(upstream_id, upstream)
+            if any(abs(x - y) > EPSILON for x, y in zip(known, upstream)):
+                return None
+    return windows
+
+
+def map_instant(plan, output_id, time):
+    """
+    Instant `time` de la sortie dans le temps de chaque nœud de son
+    sous-graphe (id -> secondes), ou None s'il ne peut pas être ramené à la
+    source (concat, filtre générique, instant hors d'un trim).
+    """
+    windows = _map_window(plan, output_id, max(0.0, time), max(0.0, time) + INSTANT)
+    if windows is None:
+        return None
+    return {node_id: a for node_id, (a, _, _) in windows.items()}
+
+
+def push_down_window(plan, output_id, start, duration):
+    """
+    Fenêtre [start, start + duration] (temps de la sortie) d'une
+    prévisualisation ramenée dans la source.
+    Retourne (plan, options de ffmpeg.input, options de ffmpeg.output).
+    """
+    start = max(0.0, start)
+    by_id = {node['id']: node for node in plan}
+    lead = 0.0  # avance de lecture (temps de la sortie) retirée en sortie
+    for _ in range(len(plan) + 1):
+        windows = None
+        if start - lead >= -EPSILON:
+            windows = _map_window(plan, output_id, max(0.0, start - lead), start + duration)
+        if windows is None:
+            break
+
+        removed, params = set(), {}
+        pull = 0.0
+        for node_id, (a, b, scale) in windows.items():
+            node = by_id[node_id]
+            if node['name'] == 'trim':
+                removed.add(node_id)
+            elif node['name'] == 'fade':
+                fade_start = _num(node['params'].get('start_time', 0), 0.0)
+                fade_duration = _num(node['params'].get('duration', 1), 1.0)
+                shifted = fade_start - a
+                if shifted >= -EPSILON:
+                    params[node_id] = dict(node['params'], start_time=round(max(0.0, shifted), 6))
+                elif node['params'].get('type', 'in') == 'in' and shifted + fade_duration <= EPSILON:
+                    removed.add(node_id)  # fondu d'ouverture terminé avant la fenêtre
+                else:
+                    pull = max(pull, -shifted / scale)
+        if pull > EPSILON:
+            lead += pull
+            continue
+
+        a, b, _ = next(windows[node['id']] for node in plan
+                       if node['name'] == 'input' and node['id'] in windows)
+        input_options = {'t': round(b - a, 6)}
+        if a > EPSILON:
+            input_options['ss'] = round(a, 6)
+        output_options = {'ss': round(lead, 6)} if lead > EPSILON else {}
+        return _rewrite(plan, removed, params), input_options, output_options
+
+    output_options = {'t': duration}
+    if start:
+        output_options['ss'] = start
+    return plan, {}, output_options
@@ -77,7 +77,9 @@ function getFilterIcon(filterName) {
         'grayscale': 'fa-eye-slash',
         'speed': 'fa-tachometer-alt',
         'fps': 'fa-film',
-        'trim': 'fa-scissors'
+        'trim': 'fa-scissors',
+        'overlay': 'fa-clone',
+        'concat': 'fa-link'
     };
     return icons[filterName] || 'fa-filter';
 }
@@ -90,6 +92,9 @@ function setupEventListeners() {
     // Boutons
     document.getElementById('clearBtn').addEventListener('click', clearWorkflow);
     document.getElementById('processBtn').addEventListener('click', processVideo);
+    document.getElementById('addOutputBtn').addEventListener('click', addOutputNode);
+    document.getElementById('previewBtn').addEventListener('click', previewVideo);
+    document.getElementById('previewTime').addEventListener('change', schedulePreview);
 }
 
 // Gestion de l'upload de vidéo
@@ -97,20 +102,14 @@ async function handleVideoUpload(event) {
     const file = event.target.files[0];
     if (!file) return;
     
-    const formData = new FormData();
-    formData.append('video', file);
-    
     showLoading(true);
     
     try {
-        const response = await fetch('/upload', {
-            method: 'POST',
-            body: formData
-        });
+        const upload = await uploadInChunks(file);
+        // Les métadonnées sont lues en arrière-plan par le serveur
+        const data = upload.success ? await waitForVideoInfo(upload.info_url) : upload;
         
-        const data = await response.json();
-        
-        if (data.success) {
+        if (data.state === 'ready') {
             currentVideo = data;
             displayVideoInfo(data);
             showNotification('Vidéo chargée avec succès!', 'success');
@@ -125,6 +124,78 @@ async function handleVideoUpload(event) {
     }
 }
 
+async function waitForVideoInfo(infoUrl) {
+    while (true) {
+        const response = await fetch(`${infoUrl}?wait=10`);
+        const data = await response.json();
+        if (data.state !== 'pending') return data;
+    }
+}
+
+// Upload par morceaux: reprend là où le serveur s'est arrêté après une coupure
+const UPLOAD_RETRIES = 5;
+
+async function sha256Hex(blob) {
+    if (!window.crypto || !crypto.subtle) return null;
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadInChunks(file) {
+    // Session mémorisée par fichier pour reprendre même après un rechargement de la page
+    const storageKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+    let session = null;
+    const savedId = localStorage.getItem(storageKey);
+    if (savedId) {
+        const response = await fetch(`/uploads/${savedId}`);
+        if (response.ok) session = await response.json();
+    }
+    if (!session) {
+        const response = await fetch('/uploads', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        session = await response.json();
+        if (!response.ok) return session;
+        localStorage.setItem(storageKey, session.upload_id);
+    }
+    
+    const chunkSize = session.chunk_size || 8 * 1024 * 1024;
+    let offset = session.offset;
+    let failures = 0;
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + chunkSize);
+        const headers = { 'Content-Type': 'application/octet-stream' };
+        const chunkHash = await sha256Hex(chunk);
+        if (chunkHash) headers['X-Chunk-SHA256'] = chunkHash;
+        try {
+            const response = await fetch(`/uploads/${session.upload_id}?offset=${offset}`, {
+                method: 'PUT',
+                headers: headers,
+                body: chunk
+            });
+            const data = await response.json();
+            if (data.offset === undefined) return data;
+            offset = data.offset;  // en cas de 409, le serveur indique où reprendre
+            if (response.ok) failures = 0;
+            else if (++failures > UPLOAD_RETRIES) return data;
+        } catch (error) {
+            if (++failures > UPLOAD_RETRIES) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+        }
+        document.getElementById('loadingText').textContent =
+            `Envoi... ${Math.round(offset / file.size * 100)}%`;
+    }
+    
+    const response = await fetch(`/uploads/${session.upload_id}/finalize`, { method: 'POST' });
+    const data = await response.json();
+    if (response.ok) localStorage.removeItem(storageKey);
+    return data;
+}
+
 // Afficher les informations de la vidéo
 function displayVideoInfo(videoData) {
     const videoInfo = document.getElementById('videoInfo');
@@ -162,11 +233,27 @@ function addOutputNode() {
             <p style="font-size: 0.85rem; color: #6b7280;">
                 Vidéo finale
             </p>
+            <div class="node-input">
+                <label>Profil d'encodage</label>
+                <select name="profile" onchange="updateNodeData(this, ${editor.nodeId + 1})">
+                    <option value="draft">Brouillon (rapide)</option>
+                    <option value="web" selected>Web</option>
+                    <option value="archive">Archive (qualité)</option>
+                </select>
+            </div>
+            <div class="node-input">
+                <label>Découpe</label>
+                <select name="cut" onchange="updateNodeData(this, ${editor.nodeId + 1})">
+                    <option value="auto" selected>Auto (copie si image clé proche)</option>
+                    <option value="keyframe">Sur image clé (rapide)</option>
+                    <option value="exact">Exacte (réencodage)</option>
+                </select>
+            </div>
         </div>
     `;
     
     const posX = window.innerWidth - 400;
-    editor.addNode('output', 1, 0, posX, 100, 'node-output-video', {}, html);
+    editor.addNode('output', 1, 0, posX, 100, 'node-output-video', {profile: 'web', cut: 'auto'}, html);
 }
 
 // Ajouter un nœud de filtre
@@ -231,7 +318,7 @@ function addFilterNode(filter) {
     
     html += '</div>';
     
-    editor.addNode(filter.name, 1, 1, posX, posY, 'drawflow-node', params, html);
+    editor.addNode(filter.name, filter.inputs || 1, 1, posX, posY, 'drawflow-node', params, html);
 }
 
 // Mettre à jour les données d'un nœud
@@ -244,6 +331,81 @@ function updateNodeData(element, nodeId) {
     const nodeData = editor.getNodeFromId(nodeId);
     if (nodeData) {
         nodeData.data[nodeName] = nodeValue;
+        editor.updateNodeDataFromId(nodeId, nodeData.data);
+        schedulePreview();
+    }
+}
+
+// Aperçu rapide: image fixe après chaque réglage, clip (proxy basse résolution) à la demande
+let previewTimer = null;
+let previewRequest = 0;
+let frameRequest = 0;
+
+function schedulePreview() {
+    clearTimeout(previewTimer);
+    previewTimer = setTimeout(previewFrame, 150);
+}
+
+async function previewFrame() {
+    if (!currentVideo) return;
+    
+    const requestId = ++frameRequest;
+    try {
+        const response = await fetch('/preview_frame', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                input_file: currentVideo.filename,
+                workflow: editor.export(),
+                time: parseFloat(document.getElementById('previewTime').value) || 0,
+                format: 'webp'
+            })
+        });
+        if (requestId !== frameRequest) return;
+        
+        if (response.ok) {
+            const image = document.getElementById('previewFrame');
+            if (image.src) URL.revokeObjectURL(image.src);
+            image.src = URL.createObjectURL(await response.blob());
+        } else {
+            console.warn('Aperçu impossible:', (await response.json()).error);
+        }
+    } catch (error) {
+        console.error('Erreur:', error);
+    }
+}
+
+async function previewVideo() {
+    if (!currentVideo) return;
+    
+    // Ignorer les réponses d'aperçus devenus obsolètes
+    const requestId = ++previewRequest;
+    try {
+        const response = await fetch('/preview', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                input_file: currentVideo.filename,
+                workflow: editor.export(),
+                time: parseFloat(document.getElementById('previewTime').value) || 0
+            })
+        });
+        const data = await response.json();
+        if (requestId !== previewRequest) return;
+        
+        if (data.success) {
+            const video = document.getElementById('previewVideo');
+            video.src = data.preview_url;
+            video.play().catch(() => {});
+        } else {
+            console.warn('Aperçu impossible:', data.error);
+        }
+    } catch (error) {
+        console.error('Erreur:', error);
     }
 }
 
@@ -322,11 +484,28 @@ async function processVideo() {
         
         const data = await response.json();
         
-        if (data.success) {
+        if (!data.success) {
+            showNotification(data.error || 'Erreur lors du traitement', 'error');
+            return;
+        }
+        
+        // Rendu identique déjà en cache: résultat immédiat
+        if (data.cached) {
             displayResult(data);
+            showNotification('Vidéo déjà rendue (cache)', 'success');
+            return;
+        }
+        
+        // Le rendu tourne en arrière-plan: on suit sa progression
+        const job = await waitForJob(data.events_url);
+        
+        if (job.state === 'done') {
+            displayResult(job.result);
             showNotification('Vidéo traitée avec succès!', 'success');
+        } else if (job.state === 'cancelled') {
+            showNotification('Traitement annulé', 'info');
         } else {
-            showNotification(data.error || 'Erreur lors du traitement', 'error');
+            showNotification(job.error || 'Erreur lors du traitement', 'error');
         }
     } catch (error) {
         console.error('Erreur:', error);
@@ -336,23 +515,55 @@ async function processVideo() {
     }
 }
 
+// Attendre la fin d'un job de rendu en suivant son flux de progression
+function waitForJob(eventsUrl) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(eventsUrl);
+        source.onmessage = (event) => {
+            const job = JSON.parse(event.data);
+            updateProgress(job.progress);
+            if (['done', 'failed', 'cancelled'].includes(job.state)) {
+                source.close();
+                resolve(job);
+            }
+        };
+        source.onerror = () => {
+            source.close();
+            reject(new Error('Connexion au suivi du rendu perdue'));
+        };
+    });
+}
+
+// Afficher la progression dans l'overlay de chargement
+function updateProgress(progress) {
+    const text = document.getElementById('loadingText');
+    if (!progress) {
+        text.textContent = 'Traitement en cours...';
+        return;
+    }
+    const percent = progress.percent !== null ? `${progress.percent}%` : `image ${progress.frame}`;
+    const fps = progress.fps !== null ? ` — ${progress.fps} fps` : '';
+    text.textContent = `Traitement en cours... ${percent}${fps}`;
+}
+
 // Afficher le résultat
 function displayResult(data) {
     const resultSection = document.getElementById('resultSection');
     const resultContent = document.getElementById('resultContent');
     
-    resultContent.innerHTML = `
-        <p>Vidéo traitée avec succès!</p>
-        <a href="${data.download_url}" class="btn btn-primary" download>
-            <i class="fas fa-download"></i> Télécharger la vidéo
+    const outputs = data.outputs || [data];
+    resultContent.innerHTML = `<p>Vidéo traitée avec succès!</p>` + outputs.map((output, index) => `
+        <a href="${output.download_url}" class="btn btn-primary" download>
+            <i class="fas fa-download"></i> Télécharger la vidéo${outputs.length > 1 ? ` ${index + 1}` : ''}
         </a>
-    `;
+    `).join('');
     
     resultSection.style.display = 'block';
 }
 
 // Afficher/masquer le loading
 function showLoading(show) {
+    updateProgress(null);
     const overlay = document.getElementById('loadingOverlay');
     overlay.style.display = show ? 'flex' : 'none';
 }
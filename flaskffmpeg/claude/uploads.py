@@ -0,0 +1,203 @@
+"""
+Uploads par morceaux, reprenables
+
+Le client ouvre une session (taille et, optionnellement, SHA-256 attendus),
+envoie les morceaux avec leur offset, puis finalise. Chaque morceau est
+écrit directement dans le fichier final (pas de fichier temporaire de
+Werkzeug ni de seconde copie) et le SHA-256 est calculé au fil de l'eau.
+Après une coupure, le client relit l'offset de la session et reprend.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+CHUNK_READ_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Requête d'upload invalide ; `status` est le code HTTP à renvoyer"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class UploadSession:
+    """Un upload en cours: fichier partiel, offset et hash calculé jusque-là"""
+
+    def __init__(self, upload_id, filename, size, sha256=None, offset=0):
+        self.id = upload_id
+        self.filename = filename  # nom final (déjà sécurisé et unique)
+        self.size = size
+        self.expected_sha256 = sha256.lower() if sha256 else None
+        self.offset = offset
+        self.sha = hashlib.sha256()
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.offset,
+            'complete': self.offset == self.size,
+        }
+
+
+class UploadManager:
+    """
+    Sessions d'upload. Chaque session est aussi décrite par un petit JSON
+    à côté du fichier partiel, ce qui permet de reprendre après un
+    redémarrage du serveur (le hash est alors recalculé une fois).
+    """
+
+    def __init__(self, folder, max_bytes, session_ttl=24 * 3600):
+        self.folder = folder
+        self.sessions_folder = os.path.join(folder, 'sessions')
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.sessions_folder, exist_ok=True)
+
+    def partial_path(self, session):
+        return os.path.join(self.sessions_folder, session.id + '.part')
+
+    def final_path(self, session):
+        return os.path.join(self.folder, session.filename)
+
+    def create(self, filename, size, sha256=None):
+        """Ouvre une session ; `filename` doit déjà être sécurisé"""
+        if size <= 0:
+            raise UploadError('Taille invalide')
+        if size > self.max_bytes:
+            raise UploadError(f'Fichier trop volumineux (max {self.max_bytes} octets)', 413)
+        upload_id = str(uuid.uuid4())
+        session = UploadSession(upload_id, f"{upload_id}_{filename}", size, sha256)
+        open(self.partial_path(session), 'wb').close()
+        self._save(session)
+        with self._lock:
+            self._prune()
+            self._sessions[upload_id] = session
+        return session
+
+    def get(self, upload_id):
+        with self._lock:
+            session = self._sessions.get(upload_id)
+        if session is None:
+            session = self._restore(upload_id)
+        if session is None:
+            raise UploadError('Session d\'upload inconnue', 404)
+        return session
+
+    def write_chunk(self, upload_id, offset, stream, length, chunk_sha256=None):
+        """
+        Écrit un morceau lu depuis `stream` à `offset`. Le morceau doit
+        commencer exactement à l'offset courant ; s'il est invalide
+        (longueur, SHA-256 du morceau), le fichier est ramené à l'offset
+        précédent et le hash n'avance pas.
+        """
+        session = self.get(upload_id)
+        with session.lock:
+            if offset != session.offset:
+                raise UploadError('Offset inattendu', 409, offset=session.offset)
+            if length is None or length <= 0:
+                raise UploadError('Content-Length requis')
+            if offset + length > session.size:
+                raise UploadError('Le morceau dépasse la taille annoncée', 416, offset=session.offset)
+
+            sha = session.sha.copy()
+            chunk_sha = hashlib.sha256() if chunk_sha256 else None
+            written = 0
+            with open(self.partial_path(session), 'r+b') as f:
+                f.seek(offset)
+                while written < length:
+                    block = stream.read(min(CHUNK_READ_SIZE, length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    sha.update(block)
+                    if chunk_sha:
+                        chunk_sha.update(block)
+                    written += len(block)
+                valid = written == length and (
+                    chunk_sha is None or chunk_sha.hexdigest() == chunk_sha256.lower())
+                if not valid:
+                    f.truncate(offset)
+
+            if written != length:
+                raise UploadError('Morceau incomplet', 400, offset=session.offset)
+            if not valid:
+                raise UploadError('SHA-256 du morceau invalide', 422, offset=session.offset)
+
+            session.sha = sha
+            session.offset += length
+            session.updated_at = time.time()
+            self._save(session)
+            return session
+
+    def finalize(self, upload_id):
+        """Vérifie taille et hash puis publie le fichier ; retourne (session, sha256)"""
+        session = self.get(upload_id)
+        with session.lock:
+            if session.offset != session.size:
+                raise UploadError('Upload incomplet', 409, offset=session.offset)
+            digest = session.sha.hexdigest()
+            if session.expected_sha256 and digest != session.expected_sha256:
+                self._drop(session)
+                raise UploadError('SHA-256 du fichier invalide', 422)
+            os.replace(self.partial_path(session), self.final_path(session))
+            self._drop(session, keep_file=True)
+        return session, digest
+
+    def _metadata_path(self, upload_id):
+        return os.path.join(self.sessions_folder, upload_id + '.json')
+
+    def _save(self, session):
+        with open(self._metadata_path(session.id), 'w') as f:
+            json.dump({'filename': session.filename, 'size': session.size,
+                       'sha256': session.expected_sha256}, f)
+
+    def _restore(self, upload_id):
+        """Recharge une session après redémarrage (hash recalculé sur la partie reçue)"""
+        try:
+            with open(self._metadata_path(os.path.basename(upload_id))) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        session = UploadSession(upload_id, meta['filename'], meta['size'], meta.get('sha256'))
+        path = self.partial_path(session)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(CHUNK_READ_SIZE), b''):
+                session.sha.update(block)
+                session.offset += len(block)
+        with self._lock:
+            return self._sessions.setdefault(upload_id, session)
+
+    def _drop(self, session, keep_file=False):
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        paths = [self._metadata_path(session.id)]
+        if not keep_file:
+            paths.append(self.partial_path(session))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _prune(self):
+        """Oublie les sessions abandonnées depuis plus de session_ttl secondes"""
+        limit = time.time() - self.session_ttl
+        for upload_id, session in list(self._sessions.items()):
+            if session.updated_at < limit:
+                del self._sessions[upload_id]
+                for path in (self.partial_path(session), self._metadata_path(upload_id)):
+                    if os.path.exists(path):
+                        os.remove(path)
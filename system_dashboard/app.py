@@ -1,18 +1,43 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request
+import os
 import psutil
 import platform
 from datetime import datetime
+from sampler import Sampler
+from history import MetricsHistory
+from snapshot import SnapshotCache
+from processes import ProcessCollector, SORT_KEYS
+from partitions import PartitionInventory
+from exposition import MetricsExporter, CONTENT_TYPE
 
 app = Flask(__name__)
+# Intervalle d'échantillonnage du CPU (secondes)
+app.config['SAMPLE_INTERVAL'] = float(os.environ.get('DASHBOARD_SAMPLE_INTERVAL', 1.0))
+
+# Un seul thread mesure le CPU, les requêtes lisent le dernier échantillon
+sampler = Sampler(app.config['SAMPLE_INTERVAL'])
+
+# Historique côté serveur (buffers circulaires 1 s / 10 s / 1 min), alimenté
+# par l'échantillonneur dès le démarrage
+history = MetricsHistory()
+sampler.add_listener(lambda snapshot: history.record(snapshot['time'], snapshot['values']))
+
+# Top des processus, rescanné (incrémentalement) à chaque tick de l'échantillonneur
+processes = ProcessCollector(top_n=int(os.environ.get('DASHBOARD_PROCESS_TOP', 10)))
+sampler.add_listener(lambda snapshot: processes.scan())
+sampler.start()
+
+# Inventaire des partitions (relu au changement de la table des montages) ;
+# un montage qui ne répond pas dans le délai est marqué stale
+inventory = PartitionInventory(timeout=float(os.environ.get('DASHBOARD_DISK_TIMEOUT', 0.5)))
+
+# Texte Prometheus rendu une fois par tick, servi tel quel par /metrics
+exporter = MetricsExporter(partitions=inventory, processes=processes)
+sampler.add_listener(exporter.update)
 
 def get_cpu_info():
-    """Récupère les informations CPU"""
-    return {
-        'percent': psutil.cpu_percent(interval=1),
-        'count': psutil.cpu_count(),
-        'freq': psutil.cpu_freq().current if psutil.cpu_freq() else 0,
-        'per_cpu': psutil.cpu_percent(interval=1, percpu=True)
-    }
+    """Récupère les informations CPU (dernier échantillon, sans attente)"""
+    return sampler.cpu()
 
 def get_memory_info():
     """Récupère les informations mémoire"""
@@ -31,30 +56,59 @@ def get_memory_info():
 def get_disk_info():
     """Récupère les informations disque"""
     partitions = []
-    for partition in psutil.disk_partitions():
-        try:
-            usage = psutil.disk_usage(partition.mountpoint)
-            partitions.append({
-                'device': partition.device,
-                'mountpoint': partition.mountpoint,
-                'fstype': partition.fstype,
-                'total': usage.total / (1024**3),
-                'used': usage.used / (1024**3),
-                'free': usage.free / (1024**3),
-                'percent': usage.percent
-            })
-        except PermissionError:
-            continue
+    for partition, usage, stale in inventory.usage():
+        partitions.append({
+            'device': partition.device,
+            'mountpoint': partition.mountpoint,
+            'fstype': partition.fstype,
+            # Montage qui ne répond pas : dernières valeurs connues (ou None)
+            'total': usage.total / (1024**3) if usage else None,
+            'used': usage.used / (1024**3) if usage else None,
+            'free': usage.free / (1024**3) if usage else None,
+            'percent': usage.percent if usage else None,
+            'stale': stale
+        })
     return partitions
 
+def _net_rates(rates):
+    return {
+        'sent_rate': rates['bytes_sent'] / 1024,  # KB/s
+        'recv_rate': rates['bytes_recv'] / 1024,
+        'packets_sent_rate': rates['packets_sent'],  # paquets/s
+        'packets_recv_rate': rates['packets_recv'],
+    }
+
 def get_network_info():
-    """Récupère les informations réseau"""
+    """Récupère les informations réseau (compteurs depuis le démarrage et débits)"""
     net_io = psutil.net_io_counters()
+    rates = sampler.io()['net']
     return {
         'bytes_sent': net_io.bytes_sent / (1024**2),  # MB
         'bytes_recv': net_io.bytes_recv / (1024**2),
         'packets_sent': net_io.packets_sent,
-        'packets_recv': net_io.packets_recv
+        'packets_recv': net_io.packets_recv,
+        **_net_rates(rates['total']),
+        'interfaces': {nic: _net_rates(r) for nic, r in rates['interfaces'].items()},
+    }
+
+def _disk_rates(rates):
+    result = {
+        'read_rate': rates['read_bytes'] / 1024,  # KB/s
+        'write_rate': rates['write_bytes'] / 1024,
+        'read_iops': rates['read_iops'],
+        'write_iops': rates['write_iops'],
+        'await': rates['await'],  # ms par opération
+    }
+    if 'busy_percent' in rates:
+        result['busy_percent'] = rates['busy_percent']
+    return result
+
+def get_disk_io_info():
+    """Débits des disques (total et par disque), calculés par l'échantillonneur"""
+    rates = sampler.io()['disk']
+    return {
+        **_disk_rates(rates['total']),
+        'disks': {name: _disk_rates(r) for name, r in rates['disks'].items()},
     }
 
 def get_load_average():
@@ -89,6 +143,23 @@ def get_system_info():
         'uptime': str(uptime).split('.')[0]
     }
 
+def get_all_metrics():
+    """Récupère toutes les métriques système"""
+    return {
+        'cpu': get_cpu_info(),
+        'memory': get_memory_info(),
+        'disk': get_disk_info(),
+        'disk_io': get_disk_io_info(),
+        'network': get_network_info(),
+        'load': get_load_average(),
+        'system': get_system_info(),
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+# Image complète calculée au plus une fois par tick de l'échantillonneur,
+# quel que soit le nombre de navigateurs qui interrogent l'API
+snapshots = SnapshotCache(get_all_metrics, max_age=app.config['SAMPLE_INTERVAL'])
+
 @app.route('/')
 def index():
     """Page principale du dashboard"""
@@ -97,15 +168,7 @@ def index():
 @app.route('/api/metrics')
 def get_metrics():
     """API pour récupérer toutes les métriques"""
-    return jsonify({
-        'cpu': get_cpu_info(),
-        'memory': get_memory_info(),
-        'disk': get_disk_info(),
-        'network': get_network_info(),
-        'load': get_load_average(),
-        'system': get_system_info(),
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
+    return jsonify(snapshots.get())
 
 @app.route('/api/cpu')
 def get_cpu():
@@ -115,12 +178,63 @@ def get_cpu():
 @app.route('/api/memory')
 def get_memory():
     """API pour récupérer uniquement les infos mémoire"""
-    return jsonify(get_memory_info())
+    return jsonify(snapshots.get()['memory'])
 
 @app.route('/api/load')
 def get_load():
     """API pour récupérer uniquement le load average"""
-    return jsonify(get_load_average())
+    return jsonify(snapshots.get()['load'])
+
+@app.route('/api/history')
+def get_history():
+    """
+    Historique d'une métrique: ?metric=cpu&from=<ts>&to=<ts>&step=<s>
+    (timestamps Unix, dernière heure par défaut). Retourne min/max/moyenne par pas.
+    """
+    metric = request.args.get('metric')
+    if not metric:
+        return jsonify({'metrics': history.metrics(), 'stats': history.stats()})
+    result = history.query(metric,
+                           request.args.get('from', type=float),
+                           request.args.get('to', type=float),
+                           request.args.get('step', type=int))
+    if result is None:
+        return jsonify({'error': f'Métrique inconnue: {metric}'}), 404
+    return jsonify(result)
+
+@app.route('/api/processes')
+def get_processes():
+    """
+    Top des processus par CPU, RSS et I/O (dernier scan) ; ?sort=cpu|rss|io
+    pour un seul classement
+    """
+    snapshot = processes.latest()
+    sort = request.args.get('sort')
+    if sort is None:
+        return jsonify(snapshot)
+    if sort not in SORT_KEYS:
+        return jsonify({'error': f'Tri inconnu: {sort}'}), 400
+    return jsonify({'sort': sort, 'processes': snapshot[sort], 'total': snapshot['total']})
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """Réutilisations / recalculs de l'image des métriques"""
+    return jsonify(dict(snapshots.stats(), partitions=inventory.stats()))
+
+@app.route('/metrics')
+def get_prometheus_metrics():
+    """Métriques au format texte Prometheus (octets bruts, compteurs cumulés)"""
+    body = exporter.body(timeout=5)
+    if body is None:
+        return Response("Premier échantillon pas encore disponible\n", status=503, mimetype='text/plain')
+    text, compressed = body
+    if 'gzip' in request.accept_encodings:
+        response = Response(compressed, content_type=CONTENT_TYPE)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(text, content_type=CONTENT_TYPE)
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,193 @@
+"""
+Exposition des métriques au format texte Prometheus
+
+Le texte est rendu une fois par tick de l'échantillonneur (listener), puis
+servi tel quel par /metrics : le coût d'un scrape est celui d'une copie de
+buffer, quel que soit le nombre de scrapers et leur intervalle. Une copie
+compressée (gzip) est préparée au même moment pour les scrapers qui
+l'acceptent.
+
+Contrairement à /api/metrics, les valeurs sont dans les unités de base
+(octets, secondes, hertz, ratio 0-1) et les compteurs cumulés sont exposés
+bruts (type counter, suffixe _total) : rate() et increase() se calculent
+côté Prometheus.
+"""
+
+import gzip
+import math
+import threading
+import time
+
+import psutil
+
+from sampler import whole_disks
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'dashboard'
+
+# Champs de psutil.cpu_times() exposés comme `mode` (guest et guest_nice sont
+# déjà comptés dans user et nice sous Linux)
+CPU_MODES = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal')
+
+# Compteurs réseau par interface : champ psutil -> (nom, aide)
+NET_COUNTERS = (
+    ('bytes_recv', 'network_receive_bytes_total', "Octets reçus"),
+    ('bytes_sent', 'network_transmit_bytes_total', "Octets émis"),
+    ('packets_recv', 'network_receive_packets_total', "Paquets reçus"),
+    ('packets_sent', 'network_transmit_packets_total', "Paquets émis"),
+    ('errin', 'network_receive_errors_total', "Erreurs en réception"),
+    ('errout', 'network_transmit_errors_total', "Erreurs en émission"),
+    ('dropin', 'network_receive_drop_total', "Paquets entrants abandonnés"),
+    ('dropout', 'network_transmit_drop_total', "Paquets sortants abandonnés"),
+)
+
+# Compteurs disques par disque entier : champ psutil -> (nom, aide, facteur)
+DISK_COUNTERS = (
+    ('read_bytes', 'disk_read_bytes_total', "Octets lus", 1),
+    ('write_bytes', 'disk_written_bytes_total', "Octets écrits", 1),
+    ('read_count', 'disk_reads_completed_total', "Lectures terminées", 1),
+    ('write_count', 'disk_writes_completed_total', "Écritures terminées", 1),
+    ('read_time', 'disk_read_time_seconds_total', "Temps passé en lecture", 0.001),
+    ('write_time', 'disk_write_time_seconds_total', "Temps passé en écriture", 0.001),
+    ('busy_time', 'disk_io_time_seconds_total', "Temps avec des I/O en cours", 0.001),
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class _Writer:
+    """Accumule les familles de métriques (HELP, TYPE puis échantillons)"""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text, samples):
+        """`samples` : liste de (labels, valeur) ; famille omise si elle est vide"""
+        if not samples:
+            return
+        name = f'{PREFIX}_{name}'
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            if labels:
+                rendered = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                self.lines.append(f'{name}{{{rendered}}} {_format(value)}')
+            else:
+                self.lines.append(f'{name} {_format(value)}')
+
+    def gauge(self, name, help_text, value):
+        self.family(name, 'gauge', help_text, [({}, value)])
+
+    def render(self):
+        return ('\n'.join(self.lines) + '\n').encode('utf-8')
+
+
+class MetricsExporter:
+    """Texte d'exposition pré-rendu, remplacé d'un bloc à chaque tick"""
+
+    def __init__(self, partitions=None, processes=None):
+        self._partitions = partitions  # PartitionInventory (optionnel)
+        self._processes = processes    # ProcessCollector (optionnel)
+        self._body = None              # (texte, texte gzip)
+        self._ready = threading.Event()
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    def update(self, snapshot):
+        """Listener de l'échantillonneur : rend le texte du dernier échantillon"""
+        started = time.perf_counter()
+        body = self.render(snapshot)
+        self._body = (body, gzip.compress(body, compresslevel=6))
+        self.render_seconds = time.perf_counter() - started
+        self.renders += 1
+        self._ready.set()
+
+    def body(self, timeout=None):
+        """(texte, texte gzip) du dernier rendu ; None si rien n'a encore été rendu"""
+        self._ready.wait(timeout)
+        return self._body
+
+    def render(self, snapshot):
+        counters = snapshot['counters']
+        out = _Writer()
+
+        out.gauge('sample_timestamp_seconds',
+                  "Heure (Unix) du dernier échantillon", snapshot['time'])
+        out.gauge('boot_time_seconds', "Heure (Unix) du démarrage", psutil.boot_time())
+
+        # CPU
+        out.family('cpu_seconds_total', 'counter', "Temps CPU par cœur et par mode",
+                   [({'cpu': cpu, 'mode': mode}, getattr(times, mode))
+                    for cpu, times in enumerate(counters['per_cpu'])
+                    for mode in CPU_MODES if hasattr(times, mode)])
+        out.gauge('cpu_usage_ratio', "Utilisation CPU sur le dernier intervalle (0-1)",
+                  snapshot['cpu_percent'] / 100)
+        out.family('cpu_core_usage_ratio', 'gauge',
+                   "Utilisation par cœur sur le dernier intervalle (0-1)",
+                   [({'cpu': cpu}, percent / 100) for cpu, percent in enumerate(snapshot['per_cpu'])])
+        if snapshot['cpu_freq']:
+            out.gauge('cpu_frequency_hertz', "Fréquence CPU courante", snapshot['cpu_freq'] * 1e6)
+
+        # Mémoire et load
+        mem = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        out.gauge('memory_total_bytes', "Mémoire physique totale", mem.total)
+        out.gauge('memory_available_bytes', "Mémoire disponible", mem.available)
+        out.gauge('memory_used_bytes', "Mémoire utilisée", mem.used)
+        out.gauge('swap_total_bytes', "Swap total", swap.total)
+        out.gauge('swap_used_bytes', "Swap utilisé", swap.used)
+        out.family('swap_in_bytes_total', 'counter', "Octets lus depuis le swap",
+                   [({}, swap.sin)])
+        out.family('swap_out_bytes_total', 'counter', "Octets écrits dans le swap",
+                   [({}, swap.sout)])
+        values = snapshot['values']
+        for key in ('load1', 'load5', 'load15'):
+            if key in values:
+                out.gauge(key, f"Load average ({key[4:]} min)", values[key])
+
+        # Réseau (toutes les interfaces, lo compris)
+        nics = sorted(counters['net'].items())
+        for field, name, help_text in NET_COUNTERS:
+            out.family(name, 'counter', help_text,
+                       [({'interface': nic}, getattr(c, field)) for nic, c in nics])
+
+        # Disques entiers, comme les débits de l'échantillonneur
+        disks = [(name, counters['disk'][name]) for name in sorted(whole_disks(counters['disk']))]
+        for field, name, help_text, factor in DISK_COUNTERS:
+            out.family(name, 'counter', help_text,
+                       [({'disk': disk}, getattr(c, field) * factor)
+                        for disk, c in disks if hasattr(c, field)])
+
+        # Systèmes de fichiers (dernières valeurs connues pour un montage bloqué)
+        if self._partitions is not None:
+            mounts = [({'device': p.device, 'mountpoint': p.mountpoint, 'fstype': p.fstype}, usage, stale)
+                      for p, usage, stale in self._partitions.usage()]
+            for field, name, help_text in (('total', 'filesystem_size_bytes', "Taille du système de fichiers"),
+                                           ('used', 'filesystem_used_bytes', "Espace utilisé"),
+                                           ('free', 'filesystem_free_bytes', "Espace libre pour les utilisateurs")):
+                out.family(name, 'gauge', help_text,
+                           [(labels, getattr(usage, field)) for labels, usage, stale in mounts if usage])
+            out.family('filesystem_stale', 'gauge',
+                       "1 si le montage n'a pas répondu dans le délai (valeurs précédentes)",
+                       [(labels, stale) for labels, usage, stale in mounts])
+
+        if self._processes is not None and self._processes.latest():
+            out.gauge('processes', "Nombre de processus", self._processes.latest()['total'])
+
+        # Coût du rendu précédent (le rendu courant n'est pas encore mesuré)
+        out.gauge('exporter_render_seconds', "Durée du dernier rendu de ce texte", self.render_seconds)
+        return out.render()
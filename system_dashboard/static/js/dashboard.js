@@ -4,6 +4,7 @@ let cpuHistory = [];
 let memoryHistory = [];
 let networkSentHistory = [];
 let networkRecvHistory = [];
+let latestProcesses = null;
 const maxDataPoints = 30; // 30 secondes d'historique
 
 // Couleurs du thème
@@ -135,14 +136,14 @@ function initCharts() {
             data: {
                 labels: [],
                 datasets: [{
-                    label: 'Envoyé (MB)',
+                    label: 'Envoyé (KB/s)',
                     data: [],
                     borderColor: colors.success,
                     backgroundColor: colors.successLight,
                     tension: 0.4,
                     fill: true
                 }, {
-                    label: 'Reçu (MB)',
+                    label: 'Reçu (KB/s)',
                     data: [],
                     borderColor: colors.info,
                     backgroundColor: colors.infoLight,
@@ -164,7 +165,7 @@ function initCharts() {
                         beginAtZero: true,
                         ticks: {
                             callback: function(value) {
-                                return value + ' MB';
+                                return value + ' KB/s';
                             }
                         }
                     }
@@ -210,6 +211,7 @@ async function updateMetrics() {
         
         // Mise à jour Réseau
         updateNetwork(data.network);
+        updateDiskIO(data.disk_io);
         
         // Mise à jour Système
         updateSystem(data.system);
@@ -218,15 +220,12 @@ async function updateMetrics() {
         const timeLabel = new Date().toLocaleTimeString('fr-FR');
         cpuHistory.push(data.cpu.percent);
         memoryHistory.push(data.memory.percent);
-        networkSentHistory.push(data.network.bytes_sent);
-        networkRecvHistory.push(data.network.bytes_recv);
+        networkSentHistory.push(data.network.sent_rate);
+        networkRecvHistory.push(data.network.recv_rate);
         
-        if (cpuHistory.length > maxDataPoints) {
-            cpuHistory.shift();
-            memoryHistory.shift();
-            networkSentHistory.shift();
-            networkRecvHistory.shift();
-        }
+        [cpuHistory, memoryHistory, networkSentHistory, networkRecvHistory].forEach(history => {
+            while (history.length > maxDataPoints) history.shift();
+        });
         
         // CPU Chart
         if (cpuChart) {
@@ -270,6 +269,41 @@ async function updateMetrics() {
     }
 }
 
+// Top processus depuis l'API
+async function refreshProcesses() {
+    try {
+        const response = await fetch('/api/processes');
+        updateProcesses(await response.json());
+    } catch (error) {
+        console.error('Erreur lors de la récupération des processus:', error);
+    }
+}
+
+// Historique conservé par le serveur: les graphiques ne repartent pas de zéro au rechargement
+async function loadHistory() {
+    const params = `from=${Date.now() / 1000 - maxDataPoints * 2}&step=2`;
+    const seed = async (metric, history, chart, dataset = 0, scale = 1) => {
+        const response = await fetch(`/api/history?metric=${metric}&${params}`);
+        if (!response.ok || !chart) return;
+        const data = await response.json();
+        history.push(...data.avg.slice(-maxDataPoints).map(value => value * scale));
+        chart.data.labels = data.t.slice(-maxDataPoints).map(t => new Date(t * 1000).toLocaleTimeString('fr-FR'));
+        chart.data.datasets[dataset].data = history;
+        chart.update('none');
+    };
+    try {
+        // Débits réseau stockés en octets/s, affichés en KB/s
+        await Promise.all([
+            seed('cpu', cpuHistory, cpuChart),
+            seed('memory', memoryHistory, memoryChart),
+            seed('net_sent', networkSentHistory, networkChart, 0, 1 / 1024),
+            seed('net_recv', networkRecvHistory, networkChart, 1, 1 / 1024),
+        ]);
+    } catch (error) {
+        console.error("Erreur lors du chargement de l'historique:", error);
+    }
+}
+
 // Mise à jour Load Average
 function updateLoadAverage(load) {
     document.getElementById('load1-value').textContent = load.load1.toFixed(2);
@@ -340,11 +374,24 @@ function updateDisks(disks) {
     tbody.innerHTML = '';
     
     disks.forEach(disk => {
-        const color = disk.percent > 80 ? 'danger' : disk.percent > 50 ? 'warning' : 'success';
+        // Montage qui ne répond pas : dernières valeurs connues, signalées par un badge
+        const staleBadge = disk.stale ? ' <span class="badge bg-warning text-dark">ne répond pas</span>' : '';
+        if (disk.percent === null) {
+            tbody.innerHTML += `
+                <tr>
+                    <td><strong>${disk.device}</strong></td>
+                    <td>${disk.mountpoint}${staleBadge}</td>
+                    <td><span class="badge bg-secondary">${disk.fstype}</span></td>
+                    <td colspan="4" class="text-muted">--</td>
+                </tr>
+            `;
+            return;
+        }
+        const color = disk.stale ? 'secondary' : disk.percent > 80 ? 'danger' : disk.percent > 50 ? 'warning' : 'success';
         tbody.innerHTML += `
             <tr>
                 <td><strong>${disk.device}</strong></td>
-                <td>${disk.mountpoint}</td>
+                <td>${disk.mountpoint}${staleBadge}</td>
                 <td><span class="badge bg-secondary">${disk.fstype}</span></td>
                 <td>${disk.total.toFixed(2)} GB</td>
                 <td>${disk.used.toFixed(2)} GB</td>
@@ -362,12 +409,53 @@ function updateDisks(disks) {
     });
 }
 
+// Mise à jour Processus (tri choisi dans le sélecteur)
+function updateProcesses(processes) {
+    latestProcesses = processes;
+    const sort = document.getElementById('process-sort').value;
+    const tbody = document.getElementById('process-table-body');
+    document.getElementById('process-total').textContent = `(${processes.total} processus)`;
+    tbody.innerHTML = '';
+    
+    (processes[sort] || []).forEach(proc => {
+        const color = proc.cpu_percent > 80 ? 'danger' : proc.cpu_percent > 30 ? 'warning' : 'secondary';
+        tbody.innerHTML += `
+            <tr>
+                <td>${proc.pid}</td>
+                <td><strong>${proc.name}</strong></td>
+                <td>${proc.username || '--'}</td>
+                <td><span class="badge bg-${color}">${proc.cpu_percent.toFixed(1)}%</span></td>
+                <td>${proc.rss.toFixed(1)} MB</td>
+                <td>${proc.io_read.toFixed(2)} MB/s</td>
+                <td>${proc.io_write.toFixed(2)} MB/s</td>
+            </tr>
+        `;
+    });
+}
+
+// Débit en KB/s, affiché en MB/s au-delà de 1 MB/s
+function formatRate(kb) {
+    return kb >= 1024 ? (kb / 1024).toFixed(2) + ' MB/s' : kb.toFixed(1) + ' KB/s';
+}
+
 // Mise à jour Réseau
 function updateNetwork(network) {
     document.getElementById('net-sent').textContent = network.bytes_sent.toFixed(2) + ' MB';
     document.getElementById('net-recv').textContent = network.bytes_recv.toFixed(2) + ' MB';
     document.getElementById('packets-sent').textContent = network.packets_sent.toLocaleString();
     document.getElementById('packets-recv').textContent = network.packets_recv.toLocaleString();
+    document.getElementById('net-sent-rate').textContent = formatRate(network.sent_rate);
+    document.getElementById('net-recv-rate').textContent = formatRate(network.recv_rate);
+    document.getElementById('packets-sent-rate').textContent = Math.round(network.packets_sent_rate).toLocaleString();
+    document.getElementById('packets-recv-rate').textContent = Math.round(network.packets_recv_rate).toLocaleString();
+}
+
+// Mise à jour I/O disques (débits calculés par le serveur)
+function updateDiskIO(diskIo) {
+    document.getElementById('disk-read-rate').textContent = formatRate(diskIo.read_rate);
+    document.getElementById('disk-write-rate').textContent = formatRate(diskIo.write_rate);
+    document.getElementById('disk-iops').textContent = Math.round(diskIo.read_iops + diskIo.write_iops).toLocaleString();
+    document.getElementById('disk-await').textContent = diskIo.await.toFixed(1) + ' ms';
 }
 
 // Mise à jour Système
@@ -384,8 +472,13 @@ function updateSystem(system) {
 // Initialisation au chargement de la page
 document.addEventListener('DOMContentLoaded', function() {
     initCharts();
-    updateMetrics();
+    loadHistory().then(updateMetrics);
+    refreshProcesses();
+    document.getElementById('process-sort').addEventListener('change', () => {
+        if (latestProcesses) updateProcesses(latestProcesses);
+    });
     
     // Mise à jour toutes les 2 secondes
     setInterval(updateMetrics, 2000);
+    setInterval(refreshProcesses, 2000);
 });
@@ -1,27 +1,98 @@
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
+import os
+
+# Transport : 'threading' (serveur de développement, quelques dizaines de
+# sockets) ou 'eventlet' (production, milliers de sockets). eventlet doit
+# patcher la bibliothèque standard avant tout autre import.
+ASYNC_MODE = os.environ.get('DASHBOARD_ASYNC_MODE', 'threading')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+    from eventlet import tpool
+
+from flask import Flask, render_template, jsonify, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import psutil
 import platform
 from datetime import datetime
 import threading
 import time
+from concurrent.futures import Future
+from sampler import Sampler
+from history import MetricsHistory
+from broadcast import Channel, parse_subscription, static_system_info, ENCODINGS
+from snapshot import SnapshotCache
+from processes import ProcessCollector, SORT_KEYS
+from partitions import PartitionInventory
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'votre_cle_secrete_ici'
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Intervalle d'échantillonnage du CPU (secondes)
+app.config['SAMPLE_INTERVAL'] = float(os.environ.get('DASHBOARD_SAMPLE_INTERVAL', 1.0))
+# Intervalle d'échantillonnage sans client connecté : 0 (défaut) = échantillonnage
+# suspendu ; par exemple 10 pour garder l'historique 10 s / 1 min continu
+app.config['IDLE_SAMPLE_INTERVAL'] = float(os.environ.get('DASHBOARD_IDLE_INTERVAL', 0))
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
+
+def offload(func, *args):
+    """
+    Exécute un relevé psutil bloquant (lecture de /proc, statfs...) hors de
+    la boucle d'événements : dans un vrai thread en mode eventlet, directement
+    en mode threading
+    """
+    if ASYNC_MODE == 'eventlet':
+        return tpool.execute(func, *args)
+    return func(*args)
+
+def submit_blocking(func, *args):
+    """
+    Future d'un appel bloquant exécuté dans un vrai thread du tpool (mode
+    eventlet) : un statfs bloqué n'immobilise que ce thread, pas la boucle
+    """
+    future = Future()
+    def run():
+        try:
+            future.set_result(tpool.execute(func, *args))
+        except Exception as e:
+            future.set_exception(e)
+    eventlet.spawn_n(run)
+    return future
+
+# Un seul thread mesure le CPU, les émissions lisent le dernier échantillon.
+# Sans client connecté, il est suspendu (ou passe à l'intervalle de veille,
+# voir update_idle_state)
+sampler = Sampler(app.config['IDLE_SAMPLE_INTERVAL'] or None, offload=offload)
+
+# Historique côté serveur (buffers circulaires 1 s / 10 s / 1 min), alimenté
+# par l'échantillonneur dès le démarrage
+history = MetricsHistory()
+sampler.add_listener(lambda snapshot: history.record(snapshot['time'], snapshot['values']))
+
+# Top des processus, rescanné (incrémentalement) à chaque tick de l'échantillonneur
+processes = ProcessCollector(top_n=int(os.environ.get('DASHBOARD_PROCESS_TOP', 10)))
+sampler.add_listener(lambda snapshot: offload(processes.scan))
+sampler.start()
+
+# Inventaire des partitions (relu au changement de la table des montages) ;
+# un montage qui ne répond pas dans le délai est marqué stale. En mode
+# eventlet, les statfs passent par le tpool au lieu d'un pool de threads verts
+inventory = PartitionInventory(
+    timeout=float(os.environ.get('DASHBOARD_DISK_TIMEOUT', 0.5)),
+    submit=submit_blocking if ASYNC_MODE == 'eventlet' else None)
 
 # Variable globale pour contrôler le thread de mise à jour
 update_thread = None
 thread_lock = threading.Lock()
 
+# Abonnements: un canal (room) par combinaison groupes / intervalle / encodage
+channels = {}         # room -> Channel
+client_channels = {}  # sid -> room
+channels_lock = threading.Lock()
+# Levé tant qu'au moins un client est abonné ; le thread de diffusion dort sinon
+clients_present = threading.Event()
+
 def get_cpu_info():
-    """Récupère les informations CPU"""
-    return {
-        'percent': psutil.cpu_percent(interval=1),
-        'count': psutil.cpu_count(),
-        'freq': psutil.cpu_freq().current if psutil.cpu_freq() else 0,
-        'per_cpu': psutil.cpu_percent(interval=1, percpu=True)
-    }
+    """Récupère les informations CPU (dernier échantillon, sans attente)"""
+    return sampler.cpu()
 
 def get_memory_info():
     """Récupère les informations mémoire"""
@@ -40,20 +111,18 @@ def get_memory_info():
 def get_disk_info():
     """Récupère les informations disque"""
     partitions = []
-    for partition in psutil.disk_partitions():
-        try:
-            usage = psutil.disk_usage(partition.mountpoint)
-            partitions.append({
-                'device': partition.device,
-                'mountpoint': partition.mountpoint,
-                'fstype': partition.fstype,
-                'total': usage.total / (1024**3),
-                'used': usage.used / (1024**3),
-                'free': usage.free / (1024**3),
-                'percent': usage.percent
-            })
-        except PermissionError:
-            continue
+    for partition, usage, stale in inventory.usage():
+        partitions.append({
+            'device': partition.device,
+            'mountpoint': partition.mountpoint,
+            'fstype': partition.fstype,
+            # Montage qui ne répond pas : dernières valeurs connues (ou None)
+            'total': usage.total / (1024**3) if usage else None,
+            'used': usage.used / (1024**3) if usage else None,
+            'free': usage.free / (1024**3) if usage else None,
+            'percent': usage.percent if usage else None,
+            'stale': stale
+        })
     return partitions
 
 def get_network_info():
@@ -66,6 +135,42 @@ def get_network_info():
         'packets_recv': net_io.packets_recv
     }
 
+def _net_rates(rates):
+    return {
+        'sent_rate': rates['bytes_sent'] / 1024,  # KB/s
+        'recv_rate': rates['bytes_recv'] / 1024,
+        'packets_sent_rate': rates['packets_sent'],  # paquets/s
+        'packets_recv_rate': rates['packets_recv'],
+    }
+
+def get_network_rates():
+    """Débits réseau (total et par interface), calculés par l'échantillonneur"""
+    rates = sampler.io()['net']
+    return {
+        **_net_rates(rates['total']),
+        'interfaces': {nic: _net_rates(r) for nic, r in rates['interfaces'].items()},
+    }
+
+def _disk_rates(rates):
+    result = {
+        'read_rate': rates['read_bytes'] / 1024,  # KB/s
+        'write_rate': rates['write_bytes'] / 1024,
+        'read_iops': rates['read_iops'],
+        'write_iops': rates['write_iops'],
+        'await': rates['await'],  # ms par opération
+    }
+    if 'busy_percent' in rates:
+        result['busy_percent'] = rates['busy_percent']
+    return result
+
+def get_disk_io_info():
+    """Débits des disques (total et par disque), calculés par l'échantillonneur"""
+    rates = sampler.io()['disk']
+    return {
+        **_disk_rates(rates['total']),
+        'disks': {name: _disk_rates(r) for name, r in rates['disks'].items()},
+    }
+
 def get_load_average():
     """Récupère le load average (Linux uniquement)"""
     load = psutil.getloadavg()
@@ -90,34 +195,144 @@ def get_system_info():
         'uptime': str(uptime).split('.')[0]
     }
 
-def get_all_metrics():
-    """Récupère toutes les métriques système"""
+def get_host_metrics():
+    """Métriques lues dans /proc (tout sauf le CPU, déjà échantillonné, et les disques)"""
     return {
-        'cpu': get_cpu_info(),
         'memory': get_memory_info(),
-        'disk': get_disk_info(),
         'network': get_network_info(),
         'load': get_load_average(),
         'system': get_system_info(),
+    }
+
+def get_all_metrics():
+    """Récupère toutes les métriques système"""
+    metrics = {
+        'cpu': get_cpu_info(),
+        **offload(get_host_metrics),
+        # Les statfs ont leur propre pool et leur délai (voir PartitionInventory)
+        'disk': get_disk_info(),
+        'disk_io': get_disk_io_info(),
+        'processes': processes.latest(),
         'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
+    # Les débits viennent de l'échantillonneur (mémoire), hors du pool de threads
+    metrics['network'].update(get_network_rates())
+    return metrics
+
+# Image complète calculée au plus une fois par tick de l'échantillonneur, puis
+# partagée entre le thread de diffusion, les connexions et les rafraîchissements
+snapshots = SnapshotCache(get_all_metrics, max_age=app.config['SAMPLE_INTERVAL'])
 
 def background_metrics_updater():
-    """Thread en arrière-plan qui émet les métriques toutes les 2 secondes"""
+    """
+    Thread en arrière-plan: à chaque seconde, diffuse aux canaux arrivés à
+    échéance le delta de leurs groupes (calculé une fois par canal).
+    Sans client connecté, il attend la prochaine connexion sans rien calculer.
+    """
     while True:
+        clients_present.wait()
         try:
-            metrics = get_all_metrics()
-            socketio.emit('metrics_update', metrics, namespace='/')
-            time.sleep(2)
+            now = time.monotonic()
+            with channels_lock:
+                due = [channel for channel in channels.values() if channel.next_due <= now]
+            if due:
+                metrics = snapshots.get()
+                for channel in due:
+                    channel.schedule(metrics, now)
+                    message = channel.next_message(metrics)
+                    if message:
+                        socketio.emit(message[0], message[1], to=channel.room)
         except Exception as e:
             print(f"Erreur dans le thread de mise à jour: {e}")
-            time.sleep(2)
+        socketio.sleep(1)
+
+def leave_channel(sid):
+    """Retire le client de son canal (appelé sous channels_lock) ; retourne la room quittée"""
+    room = client_channels.pop(sid, None)
+    if room in channels:
+        channels[room].members.discard(sid)
+        if not channels[room].members:
+            del channels[room]
+    return room
+
+def update_idle_state():
+    """
+    Compte des clients (appelé sous channels_lock) : échantillonnage normal
+    s'il y en a au moins un, suspendu sinon (ou intervalle de veille s'il est configuré)
+    """
+    if client_channels:
+        sampler.set_interval(app.config['SAMPLE_INTERVAL'])
+        clients_present.set()
+    else:
+        clients_present.clear()
+        sampler.set_interval(app.config['IDLE_SAMPLE_INTERVAL'] or None)
+
+def subscribe_client(sid, data=None):
+    """Place le client dans le canal correspondant à son abonnement"""
+    groups, interval, encoding = parse_subscription(data)
+    with channels_lock:
+        previous = leave_channel(sid)
+        channel = Channel(groups, interval, encoding)
+        channel = channels.setdefault(channel.room, channel)
+        channel.members.add(sid)
+        client_channels[sid] = channel.room
+        update_idle_state()
+    if previous and previous != channel.room:
+        leave_room(previous)
+    join_room(channel.room)
+    return channel
+
+def emit_full_snapshot(channel):
+    """Image complète des groupes du canal, pour le seul client courant"""
+    emit('metrics_full', channel.encode(channel.select(snapshots.get())))
 
 @app.route('/')
 def index():
     """Page principale du dashboard"""
     return render_template('dashboard.html')
 
+@app.route('/api/history')
+def get_history():
+    """
+    Historique d'une métrique: ?metric=cpu&from=<ts>&to=<ts>&step=<s>
+    (timestamps Unix, dernière heure par défaut). Retourne min/max/moyenne par pas.
+    """
+    metric = request.args.get('metric')
+    if not metric:
+        return jsonify({'metrics': history.metrics(), 'stats': history.stats()})
+    result = history.query(metric,
+                           request.args.get('from', type=float),
+                           request.args.get('to', type=float),
+                           request.args.get('step', type=int))
+    if result is None:
+        return jsonify({'error': f'Métrique inconnue: {metric}'}), 404
+    return jsonify(result)
+
+@app.route('/api/processes')
+def get_processes():
+    """
+    Top des processus par CPU, RSS et I/O (dernier scan) ; ?sort=cpu|rss|io
+    pour un seul classement
+    """
+    snapshot = processes.latest()
+    sort = request.args.get('sort')
+    if sort is None:
+        return jsonify(snapshot)
+    if sort not in SORT_KEYS:
+        return jsonify({'error': f'Tri inconnu: {sort}'}), 400
+    return jsonify({'sort': sort, 'processes': snapshot[sort], 'total': snapshot['total']})
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """Réutilisations / recalculs de l'image des métriques, état de veille"""
+    stats = snapshots.stats()
+    with channels_lock:
+        stats['clients'] = len(client_channels)
+        stats['channels'] = {room: channel.effective_interval for room, channel in channels.items()}
+    stats['sample_interval'] = sampler.interval
+    stats['partitions'] = inventory.stats()
+    return jsonify(stats)
+
 @socketio.on('connect')
 def handle_connect():
     """Gestion de la connexion WebSocket"""
@@ -125,22 +340,39 @@ def handle_connect():
     global update_thread
     with thread_lock:
         if update_thread is None:
-            update_thread = threading.Thread(target=background_metrics_updater)
-            update_thread.daemon = True
-            update_thread.start()
+            update_thread = socketio.start_background_task(background_metrics_updater)
     
-    # Envoyer immédiatement les métriques actuelles
-    emit('metrics_update', get_all_metrics())
+    # Abonnement par défaut (réveille l'échantillonneur), puis infos système
+    # statiques envoyées une seule fois
+    channel = subscribe_client(request.sid)
+    emit('system_info', static_system_info(snapshots.get()['system']))
+    emit_full_snapshot(channel)
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """
+    Abonnement du client: {groups: [...], interval: secondes, encoding: 'json'|'msgpack'}
+    """
+    channel = subscribe_client(request.sid, data)
+    emit('subscribed', {'groups': list(channel.groups), 'interval': channel.interval,
+                        'encoding': channel.encoding, 'encodings': list(ENCODINGS)})
+    emit_full_snapshot(channel)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Gestion de la déconnexion WebSocket"""
     print('Client déconnecté')
+    with channels_lock:
+        leave_channel(request.sid)
+        update_idle_state()
 
 @socketio.on('request_metrics')
 def handle_request_metrics():
     """Gestion de la demande manuelle de métriques"""
-    emit('metrics_update', get_all_metrics())
+    with channels_lock:
+        channel = channels.get(client_channels.get(request.sid))
+    if channel is not None:
+        emit_full_snapshot(channel)
 
 if __name__ == '__main__':
     print("="*50)
@@ -148,5 +380,9 @@ if __name__ == '__main__':
     print("="*50)
     print(f"  URL: http://localhost:5000")
     print(f"  Plateforme: {platform.system()}")
+    print(f"  Transport: {ASYNC_MODE}")
     print("="*50)
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
+    if ASYNC_MODE == 'eventlet':
+        socketio.run(app, host='0.0.0.0', port=5000)
+    else:
+        socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
@@ -0,0 +1,159 @@
+"""
+Diffusion des métriques par abonnements et deltas
+
+Chaque client s'abonne à des groupes de métriques (cpu, memory, disk,
+disk_io, network, load, system, processes) à un intervalle donné. Les clients qui ont le même
+abonnement partagent un canal (une room Socket.IO) : le delta est calculé
+et sérialisé une seule fois par canal, quel que soit le nombre d'écrans.
+
+Un delta ne contient que les champs qui ont changé depuis le dernier envoi
+du canal, et sous `_removed` les clés qui ont disparu ; une image complète est renvoyée régulièrement pour resynchroniser
+les clients arrivés entre deux envois.
+
+L'intervalle effectif d'un canal s'adapte à l'activité : il double (jusqu'à
+BACKOFF_MAX fois l'intervalle demandé) tant que cpu et mémoire sont stables,
+et passe à 1 s dès qu'une variation brusque apparaît.
+"""
+
+import time
+
+try:
+    import msgpack
+except ImportError:  # msgpack est optionnel
+    msgpack = None
+
+GROUPS = ('cpu', 'memory', 'disk', 'disk_io', 'network', 'load', 'system', 'processes')
+DEFAULT_INTERVAL = 2
+ALLOWED_INTERVALS = (1, 2, 5, 10, 30)
+ENCODINGS = ('json', 'msgpack') if msgpack else ('json',)
+KEYFRAME_EVERY = 30  # une image complète tous les N envois
+REMOVED_KEY = '_removed'  # clés supprimées depuis l'envoi précédent, dans un delta
+
+# Intervalle adaptatif (variations en points de pourcentage depuis le dernier envoi)
+BACKOFF_MAX = 4       # intervalle effectif max = BACKOFF_MAX x intervalle demandé
+STABLE_CHANGE = 2.0   # en dessous : valeurs stables, on espace les envois
+SPIKE_CHANGE = 15.0   # au-dessus : pic, envois à l'intervalle le plus court
+
+# Champs de get_system_info() qui ne changent pas : envoyés une seule fois
+STATIC_SYSTEM_FIELDS = ('platform', 'platform_release', 'platform_version',
+                        'architecture', 'hostname', 'processor', 'boot_time')
+
+
+def compact(value, digits=2):
+    """Arrondit les flottants pour que le bruit de mesure ne génère pas de delta"""
+    if isinstance(value, float):
+        return round(value, digits)
+    if isinstance(value, dict):
+        return {k: compact(v, digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [compact(v, digits) for v in value]
+    return value
+
+
+def diff(old, new):
+    """
+    Champs de `new` différents de `old` (récursif sur les dicts, les listes
+    sont renvoyées entières si elles ont changé). Les clés de `old` absentes
+    de `new` (interface ou disque disparu) sont listées dans `_removed` au
+    niveau du dict concerné. Retourne None si rien ne change.
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None if old == new else new
+    delta = {}
+    for key, value in new.items():
+        if key not in old:
+            delta[key] = value
+            continue
+        changed = diff(old[key], value)
+        if changed is not None:
+            delta[key] = changed
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta[REMOVED_KEY] = removed
+    return delta or None
+
+
+def parse_subscription(data):
+    """Normalise une demande d'abonnement du client (groupes, intervalle, encodage)"""
+    data = data or {}
+    groups = [g for g in (data.get('groups') or GROUPS) if g in GROUPS] or list(GROUPS)
+    try:
+        interval = float(data.get('interval', DEFAULT_INTERVAL))
+    except (TypeError, ValueError):
+        interval = DEFAULT_INTERVAL
+    interval = min(ALLOWED_INTERVALS, key=lambda allowed: abs(allowed - interval))
+    encoding = data.get('encoding') if data.get('encoding') in ENCODINGS else 'json'
+    return tuple(sorted(set(groups))), interval, encoding
+
+
+class Channel:
+    """Un abonnement partagé: groupes + intervalle + encodage"""
+
+    def __init__(self, groups, interval, encoding):
+        self.groups = groups
+        self.interval = interval
+        self.encoding = encoding
+        self.room = f"metrics:{interval}:{encoding}:{','.join(groups)}"
+        self.members = set()
+        self.baseline = None
+        self.sends = 0
+        self.next_due = 0.0
+        self.effective_interval = interval
+        self.reference = None  # valeurs surveillées au dernier envoi
+
+    def select(self, metrics):
+        """Sous-ensemble des métriques du canal (sans les champs système statiques)"""
+        selected = {group: metrics[group] for group in self.groups if group in metrics}
+        if 'system' in selected:
+            selected['system'] = {k: v for k, v in selected['system'].items()
+                                  if k not in STATIC_SYSTEM_FIELDS}
+        selected['timestamp'] = metrics.get('timestamp')
+        return compact(selected)
+
+    def next_message(self, metrics):
+        """
+        ('metrics_full' | 'metrics_delta', payload) à diffuser pour ce tick,
+        ou None si rien n'a changé.
+        """
+        current = self.select(metrics)
+        keyframe = self.baseline is None or self.sends % KEYFRAME_EVERY == 0
+        payload = current if keyframe else diff(self.baseline, current)
+        self.baseline = current
+        self.sends += 1
+        if payload is None:
+            return None
+        # Heure d'émission (hors baseline) : permet de mesurer la latence de diffusion
+        payload = dict(payload, sent_at=round(time.time(), 3))
+        return ('metrics_full' if keyframe else 'metrics_delta'), self.encode(payload)
+
+    def watched(self, metrics):
+        """Pourcentages qui pilotent l'intervalle adaptatif (selon les groupes du canal)"""
+        return {group: metrics[group]['percent'] for group in ('cpu', 'memory')
+                if group in self.groups and group in metrics}
+
+    def schedule(self, metrics, now):
+        """Fixe la prochaine échéance du canal d'après la variation depuis le dernier envoi"""
+        values = self.watched(metrics)
+        if not values or not self.reference:
+            self.effective_interval = self.interval
+        else:
+            change = max(abs(value - self.reference.get(key, value)) for key, value in values.items())
+            if change >= SPIKE_CHANGE:
+                self.effective_interval = ALLOWED_INTERVALS[0]
+            elif change < STABLE_CHANGE:
+                self.effective_interval = min(self.effective_interval * 2,
+                                              self.interval * BACKOFF_MAX)
+            else:
+                self.effective_interval = self.interval
+        self.reference = values
+        self.next_due = now + self.effective_interval
+
+    def encode(self, payload):
+        if self.encoding == 'msgpack':
+            return msgpack.packb(payload, use_bin_type=True)
+        return payload
+
+
+def static_system_info(system):
+    """Champs système statiques, envoyés une fois à la connexion"""
+    return {k: system[k] for k in STATIC_SYSTEM_FIELDS if k in system}
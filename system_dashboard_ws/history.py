@@ -0,0 +1,158 @@
+"""
+Historique des métriques côté serveur
+
+Chaque métrique est conservée dans des buffers circulaires de taille fixe
+(module array), à plusieurs résolutions :
+- 1 s pendant 1 h
+- 10 s pendant 24 h
+- 1 min pendant 30 jours
+
+Chaque case garde min, max, moyenne et nombre de points de son intervalle,
+les requêtes renvoient donc des agrégats déjà calculés. La mémoire utilisée
+est fixée à la création, quelle que soit la durée de fonctionnement.
+"""
+
+import threading
+import time
+from array import array
+
+# (pas en secondes, durée de rétention en secondes)
+DEFAULT_TIERS = (
+    (1, 3600),
+    (10, 24 * 3600),
+    (60, 30 * 24 * 3600),
+)
+
+
+class RingTier:
+    """Buffer circulaire d'une résolution ; la case d'un instant t est (t // step) % size"""
+
+    def __init__(self, step, retention):
+        self.step = step
+        self.size = retention // step
+        self.buckets = array('q', [-1]) * self.size  # numéro d'intervalle de la case (-1 = vide)
+        self.mins = array('f', [0.0]) * self.size
+        self.maxs = array('f', [0.0]) * self.size
+        self.avgs = array('f', [0.0]) * self.size
+        self.counts = array('H', [0]) * self.size
+
+    def add(self, timestamp, value):
+        bucket = int(timestamp // self.step)
+        i = bucket % self.size
+        if self.buckets[i] != bucket:
+            self.buckets[i] = bucket
+            self.mins[i] = self.maxs[i] = self.avgs[i] = value
+            self.counts[i] = 1
+            return
+        count = self.counts[i]
+        if value < self.mins[i]:
+            self.mins[i] = value
+        if value > self.maxs[i]:
+            self.maxs[i] = value
+        self.avgs[i] += (value - self.avgs[i]) / (count + 1)
+        if count < 0xFFFF:
+            self.counts[i] = count + 1
+
+    def covers(self, start, now):
+        """Vrai si l'instant `start` est encore dans la rétention de ce niveau (à une case près)"""
+        return start >= now - (self.size + 1) * self.step
+
+    def points(self, start, end):
+        """(bucket, min, max, avg, count) des cases non vides entre start et end"""
+        first = int(start // self.step)
+        last = int(end // self.step)
+        first = max(first, last - self.size + 1)
+        for bucket in range(first, last + 1):
+            i = bucket % self.size
+            if self.buckets[i] == bucket:
+                yield bucket, self.mins[i], self.maxs[i], self.avgs[i], self.counts[i]
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in
+                   (self.buckets, self.mins, self.maxs, self.avgs, self.counts))
+
+
+class MetricsHistory:
+    """Historique multi-résolution de métriques scalaires (cpu, memory...)"""
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tier_specs = tiers
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def record(self, timestamp, values):
+        """Ajoute un échantillon {métrique: valeur} à tous les niveaux"""
+        with self._lock:
+            for metric, value in values.items():
+                if value is None:
+                    continue
+                tiers = self._metrics.get(metric)
+                if tiers is None:
+                    tiers = self._metrics[metric] = [RingTier(step, retention)
+                                                     for step, retention in self.tier_specs]
+                for tier in tiers:
+                    tier.add(timestamp, value)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics)
+
+    def query(self, metric, start=None, end=None, step=None):
+        """
+        Agrégats min / max / moyenne de `metric` entre start et end (timestamps
+        Unix), regroupés par `step` secondes. Le niveau utilisé est le plus
+        fin qui couvre encore `start` et dont le pas ne dépasse pas `step`.
+        Retourne None si la métrique est inconnue.
+        """
+        now = time.time()
+        end = now if end is None else end
+        start = end - 3600 if start is None else start
+        with self._lock:
+            tiers = self._metrics.get(metric)
+            if tiers is None:
+                return None
+            candidates = [t for t in tiers if t.covers(start, now)] or [tiers[-1]]
+            if step:
+                tier = next((t for t in reversed(candidates) if t.step <= step), candidates[0])
+            else:
+                tier = candidates[0]
+            step = max(tier.step, int(step or tier.step))
+            raw = list(tier.points(start, end))
+
+        # Regroupement des cases par `step` (moyenne pondérée par le nombre de points)
+        result = {'metric': metric, 'step': step, 'resolution': tier.step,
+                  't': [], 'min': [], 'max': [], 'avg': []}
+        group = None
+        for bucket, low, high, avg, count in raw:
+            key = (bucket * tier.step) // step * step
+            if group is None or group[0] != key:
+                if group is not None:
+                    self._emit(result, group)
+                group = [key, low, high, avg * count, count]
+            else:
+                group[1] = min(group[1], low)
+                group[2] = max(group[2], high)
+                group[3] += avg * count
+                group[4] += count
+        if group is not None:
+            self._emit(result, group)
+        return result
+
+    @staticmethod
+    def _emit(result, group):
+        key, low, high, total, count = group
+        result['t'].append(key)
+        result['min'].append(round(low, 2))
+        result['max'].append(round(high, 2))
+        result['avg'].append(round(total / count, 2) if count else None)
+
+    def stats(self):
+        with self._lock:
+            per_metric = sum(t.nbytes() for t in next(iter(self._metrics.values()), []))
+            return {
+                'metrics': len(self._metrics),
+                'tiers': [{'step': step, 'retention': retention}
+                          for step, retention in self.tier_specs],
+                'bytes_per_metric': per_metric,
+                'bytes': per_metric * len(self._metrics),
+            }
@@ -0,0 +1,166 @@
+"""
+Test de charge du dashboard WebSocket
+
+Ouvre N clients Socket.IO sur un serveur local, les abonne, puis mesure
+pendant une durée donnée la latence de diffusion de chaque message reçu
+(heure de réception - champ `sent_at` posé par le serveur à l'émission).
+Affiche les percentiles de latence, les débits et les échecs de connexion.
+
+Le client et le serveur doivent tourner sur la même machine (mêmes horloges).
+
+Usage :
+    DASHBOARD_ASYNC_MODE=eventlet python app.py
+    python loadtest.py --clients 2000 --duration 30
+    python loadtest.py --clients 500 --groups cpu,memory --interval 1 --json result.json
+
+Nécessite le client asyncio de python-socketio :
+    pip install "python-socketio[asyncio_client]"
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import socketio
+
+try:
+    import msgpack
+except ImportError:  # msgpack est optionnel
+    msgpack = None
+
+
+def percentile(sorted_values, pct):
+    """Percentile (rang le plus proche) d'une liste déjà triée"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.latencies = []
+        self.messages = {'metrics_full': 0, 'metrics_delta': 0}
+        self.bytes = 0
+        self.connected = 0
+        self.failures = []
+        self.connect_times = []
+        self.measuring = False
+
+    def subscription(self):
+        subscription = {'interval': self.args.interval, 'encoding': self.args.encoding}
+        if self.args.groups:
+            subscription['groups'] = self.args.groups.split(',')
+        return subscription
+
+    def on_message(self, event, payload):
+        received = time.time()
+        if not self.measuring:
+            return
+        if isinstance(payload, (bytes, bytearray)):
+            self.bytes += len(payload)
+            payload = msgpack.unpackb(payload)
+        else:
+            self.bytes += len(json.dumps(payload))
+        self.messages[event] += 1
+        if 'sent_at' in payload:
+            self.latencies.append((received - payload['sent_at']) * 1000)
+
+    async def open_client(self, limit):
+        client = socketio.AsyncClient(reconnection=False)
+        for event in self.messages:
+            client.on(event, lambda payload, event=event: self.on_message(event, payload))
+        async with limit:
+            started = time.perf_counter()
+            try:
+                await client.connect(self.args.url, transports=['websocket'],
+                                     wait_timeout=self.args.timeout)
+                await client.emit('subscribe', self.subscription())
+            except Exception as e:
+                self.failures.append(str(e) or type(e).__name__)
+                return None
+            self.connect_times.append((time.perf_counter() - started) * 1000)
+            self.connected += 1
+        return client
+
+    async def run(self):
+        limit = asyncio.Semaphore(self.args.concurrency)
+        print(f"Connexion de {self.args.clients} clients à {self.args.url}...")
+        started = time.perf_counter()
+        clients = await asyncio.gather(*(self.open_client(limit) for _ in range(self.args.clients)))
+        clients = [c for c in clients if c is not None]
+        ramp = time.perf_counter() - started
+        print(f"{self.connected} connectés en {ramp:.1f} s ({len(self.failures)} échecs), "
+              f"mesure pendant {self.args.duration} s...")
+
+        self.measuring = True
+        await asyncio.sleep(self.args.duration)
+        self.measuring = False
+
+        await asyncio.gather(*(c.disconnect() for c in clients), return_exceptions=True)
+        return self.report(ramp)
+
+    def report(self, ramp):
+        latencies = sorted(self.latencies)
+        connects = sorted(self.connect_times)
+        received = sum(self.messages.values())
+        result = {
+            'url': self.args.url,
+            'clients': self.args.clients,
+            'connected': self.connected,
+            'connect_failures': len(self.failures),
+            'failure_samples': sorted(set(self.failures))[:5],
+            'ramp_seconds': round(ramp, 2),
+            'connect_ms': {p: _round(percentile(connects, p)) for p in (50, 99)},
+            'duration': self.args.duration,
+            'subscription': self.subscription(),
+            'messages': self.messages,
+            'messages_per_second': round(received / self.args.duration, 1),
+            'bytes_per_second': round(self.bytes / self.args.duration),
+            'latency_ms': {
+                'p50': _round(percentile(latencies, 50)),
+                'p90': _round(percentile(latencies, 90)),
+                'p99': _round(percentile(latencies, 99)),
+                'p999': _round(percentile(latencies, 99.9)),
+                'max': _round(latencies[-1] if latencies else None),
+            },
+        }
+        return result
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du dashboard WebSocket")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--clients', type=int, default=1000, help="nombre de sockets")
+    parser.add_argument('--duration', type=float, default=30, help="durée de mesure (s)")
+    parser.add_argument('--concurrency', type=int, default=100,
+                        help="connexions ouvertes en parallèle pendant la montée en charge")
+    parser.add_argument('--groups', default='', help="groupes abonnés (cpu,memory,...), tous par défaut")
+    parser.add_argument('--interval', type=float, default=1, help="intervalle demandé (s)")
+    parser.add_argument('--encoding', default='json', choices=('json', 'msgpack'))
+    parser.add_argument('--timeout', type=float, default=10, help="délai de connexion (s)")
+    parser.add_argument('--json', help="écrit le résultat dans ce fichier")
+    args = parser.parse_args()
+    if args.encoding == 'msgpack' and msgpack is None:
+        parser.error("--encoding msgpack nécessite le paquet msgpack")
+
+    result = asyncio.run(LoadTest(args).run())
+    latency = result['latency_ms']
+    print(f"Messages: {sum(result['messages'].values())} "
+          f"({result['messages_per_second']}/s, {result['bytes_per_second']} o/s)")
+    print(f"Latence de diffusion (ms): p50={latency['p50']} p90={latency['p90']} "
+          f"p99={latency['p99']} p99.9={latency['p999']} max={latency['max']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Résultat écrit dans {args.json}")
+
+
+if __name__ == '__main__':
+    main()
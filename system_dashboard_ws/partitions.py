@@ -0,0 +1,125 @@
+"""
+Inventaire des partitions et occupation des disques
+
+psutil.disk_partitions() relit et analyse toute la table des montages : ici
+l'inventaire est gardé en mémoire et n'est relu que lorsque
+/proc/self/mountinfo signale un changement (montage, démontage, remontage).
+Le noyau lève POLLPRI sur ce fichier à chaque modification de la table ; sans
+poll() (eventlet le retire du module select, ou hors Linux), le contenu du
+fichier est comparé à celui du dernier inventaire.
+
+psutil.disk_usage() (statfs) peut bloquer indéfiniment sur un montage réseau
+qui ne répond plus (NFS, CIFS, FUSE). Chaque montage est donc interrogé dans
+un pool de threads avec un délai `timeout` : un montage qui ne répond pas à
+temps est marqué `stale` avec ses dernières valeurs connues, sans retarder
+l'image des métriques. Tant que son appel précédent n'est pas revenu, il
+n'est pas réinterrogé : un montage bloqué n'occupe qu'un seul thread.
+"""
+
+import select
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import psutil
+
+MOUNTINFO = '/proc/self/mountinfo'
+
+
+class PartitionInventory:
+    """Partitions montées (relues au changement de la table) et leur occupation"""
+
+    def __init__(self, timeout=0.5, max_workers=8, submit=None):
+        self.timeout = timeout
+        # submit(func, *args) -> concurrent.futures.Future ; par défaut un pool
+        # de threads dédié (l'appelant peut fournir le sien, ex. tpool d'eventlet)
+        self._submit = submit or ThreadPoolExecutor(
+            max_workers, thread_name_prefix='disk-usage').submit
+        self._partitions = None
+        self._pending = {}  # point de montage -> appel disk_usage pas encore exploité
+        self._usage = {}    # point de montage -> dernier résultat connu
+        self._lock = threading.Lock()
+        self.refreshes = 0  # relectures de l'inventaire
+        self._mountinfo = None
+        self._poller = None
+        self._content = None
+        try:
+            self._mountinfo = open(MOUNTINFO, 'rb')
+            self._mountinfo.read()  # arme la notification
+            self._poller = select.poll()
+            self._poller.register(self._mountinfo, select.POLLPRI | select.POLLERR)
+        except (OSError, AttributeError):
+            self._poller = None
+
+    def _changed(self):
+        """True si la table des montages a changé depuis le dernier inventaire"""
+        if self._poller is not None:
+            if not self._poller.poll(0):
+                return False
+            self._mountinfo.seek(0)
+            self._mountinfo.read()  # réarme la notification
+            return True
+        try:
+            with open(MOUNTINFO, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return True  # pas de mountinfo : relecture à chaque appel
+        if content == self._content:
+            return False
+        self._content = content
+        return True
+
+    def partitions(self):
+        """Partitions montées, relues seulement si la table des montages a changé"""
+        if self._changed() or self._partitions is None:
+            self._partitions = psutil.disk_partitions()
+            self.refreshes += 1
+        return self._partitions
+
+    def usage(self):
+        """
+        Liste de (partition, usage, stale) : `usage` est le résultat de
+        psutil.disk_usage (None si le montage n'a jamais répondu), `stale`
+        vaut True s'il n'a pas répondu dans le délai. Les montages
+        inaccessibles (PermissionError...) sont omis.
+        """
+        with self._lock:
+            partitions = self.partitions()
+            submitted = []
+            for partition in partitions:
+                if partition.mountpoint in self._pending:
+                    continue  # appel précédent toujours en cours
+                future = self._submit(psutil.disk_usage, partition.mountpoint)
+                self._pending[partition.mountpoint] = future
+                submitted.append(future)
+            if submitted:
+                wait(submitted, timeout=self.timeout)
+
+            result = []
+            mounted = set()
+            for partition in partitions:
+                mountpoint = partition.mountpoint
+                mounted.add(mountpoint)
+                future = self._pending.get(mountpoint)
+                stale = future is not None and not future.done()
+                if future is not None and not stale:
+                    del self._pending[mountpoint]
+                    try:
+                        self._usage[mountpoint] = future.result()
+                    except OSError:
+                        self._usage.pop(mountpoint, None)
+                        continue
+                result.append((partition, self._usage.get(mountpoint), stale))
+
+            for mountpoint in [m for m in self._usage if m not in mounted]:
+                del self._usage[mountpoint]
+            for mountpoint in [m for m, f in self._pending.items() if m not in mounted and f.done()]:
+                del self._pending[mountpoint]
+            return result
+
+    def stats(self):
+        return {
+            'partitions': len(self._partitions or ()),
+            'refreshes': self.refreshes,
+            'pending': sorted(self._pending),
+            'timeout': self.timeout,
+        }
@@ -0,0 +1,194 @@
+"""
+Top des processus (CPU, mémoire résidente, I/O disque)
+
+Les objets psutil.Process sont gardés d'un tick à l'autre : le %CPU et le
+débit d'I/O sont des différences entre deux relevés du même processus, sans
+la fenêtre d'attente de cpu_percent(interval=...).
+
+Le balayage est incrémental pour que son coût reste de quelques ms même
+avec des milliers de processus : à chaque tick, seuls sont relus
+- les processus « chauds » (tops CPU et I/O du tick précédent, ou au-dessus
+  de HOT_CPU_PERCENT),
+- puis les autres à tour de rôle, tant que le budget `budget_ms` du tick
+  n'est pas épuisé. Le budget est du temps CPU du thread (time.thread_time) :
+  sur une machine saturée, le scan n'est pas privé de relevés parce qu'il
+  attend son tour sur le processeur.
+Les nouveaux processus sont relus en priorité. Au premier relevé, le %CPU
+est la moyenne depuis le lancement : un processus qui s'emballe devient
+chaud dès que son tour arrive, puis il est suivi à chaque tick. Les tops sont extraits avec
+heapq.nlargest.
+
+scan() est appelé par un seul thread (listener de l'échantillonneur) ;
+latest() lit le dernier résultat, remplacé d'un bloc à chaque scan.
+"""
+
+import heapq
+import time
+
+import psutil
+
+HOT_CPU_PERCENT = 1.0  # au-dessus, le processus est relu à chaque tick
+SORT_KEYS = ('cpu', 'rss', 'io')
+
+
+class _Entry:
+    """État mémorisé d'un processus entre deux relevés"""
+
+    __slots__ = ('pid', 'proc', 'name', 'username', 'cpu_time', 'io_bytes', 'stamp',
+                 'cpu_percent', 'rss', 'io_read', 'io_write', 'io_rate')
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.proc = None  # psutil.Process créé au premier relevé
+        self.name = None
+        self.username = None
+        self.cpu_time = None
+        self.io_bytes = None
+        self.stamp = None
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.io_read = 0.0
+        self.io_write = 0.0
+        self.io_rate = 0.0
+
+    def refresh(self, now):
+        """Relit CPU, RSS et I/O ; lève psutil.NoSuchProcess si le processus a disparu"""
+        if self.proc is None:
+            self.proc = psutil.Process(self.pid)
+        proc = self.proc
+        with proc.oneshot():
+            times = proc.cpu_times()
+            self.rss = proc.memory_info().rss
+            try:
+                io = proc.io_counters()
+                io_bytes = (io.read_bytes, io.write_bytes)
+            except (psutil.AccessDenied, AttributeError):
+                io_bytes = None
+        cpu_time = times.user + times.system
+        if self.stamp is None:
+            # Premier relevé : moyenne depuis le lancement du processus
+            lifetime = time.time() - proc.create_time()
+            self.cpu_percent = cpu_time / lifetime * 100 if lifetime > 0 else 0.0
+        elif now > self.stamp:
+            elapsed = now - self.stamp
+            self.cpu_percent = max(0.0, (cpu_time - self.cpu_time) / elapsed * 100)
+            if io_bytes and self.io_bytes:
+                self.io_read = max(0, io_bytes[0] - self.io_bytes[0]) / elapsed
+                self.io_write = max(0, io_bytes[1] - self.io_bytes[1]) / elapsed
+                self.io_rate = self.io_read + self.io_write
+        self.cpu_time = cpu_time
+        self.io_bytes = io_bytes
+        self.stamp = now
+
+    def identify(self):
+        """Nom et utilisateur, lus une seule fois et seulement pour les processus affichés"""
+        if self.name is not None:
+            return
+        try:
+            self.name = self.proc.name()
+            self.username = self.proc.username()
+        except (psutil.Error, KeyError):
+            self.name = self.name or '?'
+
+    def as_dict(self):
+        self.identify()
+        return {
+            'pid': self.pid,
+            'name': self.name,
+            'username': self.username,
+            'cpu_percent': round(self.cpu_percent, 1),  # 100 = un cœur entier
+            'rss': round(self.rss / (1024**2), 1),  # MB
+            'io_read': round(self.io_read / (1024**2), 2),  # MB/s
+            'io_write': round(self.io_write / (1024**2), 2),
+        }
+
+
+class ProcessCollector:
+    """Tops N des processus par CPU, RSS et I/O, mis à jour par scan()"""
+
+    def __init__(self, top_n=10, budget_ms=5.0):
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self._entries = {}   # pid -> _Entry
+        self._rotation = []  # pids relus à tour de rôle
+        self._cursor = 0
+        self.rotation_ticks = 0  # ticks du dernier tour complet
+        self._ticks = 0
+        self._hot = set()
+        self._snapshot = None
+        self.scan()
+
+    def scan(self):
+        """Un tick : relit les processus chauds, puis les autres dans la limite du budget"""
+        started = time.thread_time()
+        now = time.monotonic()
+        pids = psutil.pids()
+        alive = set(pids)
+
+        for pid in [pid for pid in self._entries if pid not in alive]:
+            del self._entries[pid]
+        fresh = [pid for pid in pids if pid not in self._entries]
+        for pid in fresh:
+            self._entries[pid] = _Entry(pid)
+        # Les nouveaux processus passent en tête du tour (premier suspect d'un pic)
+        self._rotation[self._cursor:self._cursor] = fresh
+
+        scanned = 0
+        for pid in list(self._hot):
+            scanned += self._refresh(pid, now)
+
+        # Au plus un passage par processus et par tick
+        deadline = started + self.budget_ms / 1000
+        for _ in range(len(self._entries)):
+            if time.thread_time() >= deadline:
+                break
+            if self._cursor >= len(self._rotation):
+                self._rotation = list(self._entries)
+                self._cursor = 0
+                self.rotation_ticks = self._ticks
+                self._ticks = 0
+                if not self._rotation:
+                    break
+            pid = self._rotation[self._cursor]
+            self._cursor += 1
+            if pid not in self._hot:
+                scanned += self._refresh(pid, now)
+        self._ticks += 1
+
+        entries = [e for e in self._entries.values() if e.stamp is not None]
+        tops = {
+            'cpu': heapq.nlargest(self.top_n, (e for e in entries if e.cpu_percent > 0),
+                                  key=lambda e: e.cpu_percent),
+            'rss': heapq.nlargest(self.top_n, entries, key=lambda e: e.rss),
+            'io': heapq.nlargest(self.top_n, (e for e in entries if e.io_rate > 0),
+                                 key=lambda e: e.io_rate),
+        }
+        # La RSS varie lentement : le tour suffit à la tenir à jour
+        self._hot = {e.pid for e in tops['cpu'] + tops['io']}
+        self._hot.update(e.pid for e in entries if e.cpu_percent >= HOT_CPU_PERCENT)
+
+        snapshot = {key: [e.as_dict() for e in top] for key, top in tops.items()}
+        snapshot['total'] = len(self._entries)
+        snapshot['scanned'] = scanned
+        snapshot['rotation_ticks'] = self.rotation_ticks
+        snapshot['scan_cpu_ms'] = round((time.thread_time() - started) * 1000, 2)
+        self._snapshot = snapshot
+        return snapshot
+
+    def _refresh(self, pid, now):
+        """Relit un processus ; 1 s'il a été relu, 0 sinon"""
+        entry = self._entries.get(pid)
+        if entry is None:
+            return 0
+        try:
+            entry.refresh(now)
+        except psutil.NoSuchProcess:
+            del self._entries[pid]
+            return 0
+        except psutil.Error:
+            return 0
+        return 1
+
+    def latest(self):
+        """Dernier résultat de scan()"""
+        return self._snapshot
@@ -0,0 +1,298 @@
+"""
+Échantillonneur CPU, réseau et disques en arrière-plan
+
+Un seul thread relève les compteurs de temps CPU, réseau (par interface) et
+disques (par disque) à intervalle fixe et calcule utilisation et débits à
+partir de la différence entre deux relevés, rapportée au temps monotonic
+écoulé.
+Les endpoints lisent le dernier échantillon en mémoire : leur temps de
+réponse ne dépend plus de la fenêtre de mesure, et le nombre de clients
+ne change pas le coût de l'échantillonnage.
+
+Chaque échantillon contient aussi `values`, les métriques scalaires
+(cpu, memory, swap, load1, net_sent, disk_read...) transmises aux
+listeners (historique), et `counters`, les compteurs cumulés bruts du
+relevé (exposition Prometheus).
+
+Les relevés psutil passent par `offload(func, *args)` : en mode eventlet,
+l'application les exécute dans un vrai thread pour ne pas bloquer la boucle
+d'événements.
+
+L'intervalle peut être changé à chaud (`set_interval`), par exemple pour
+ralentir ou suspendre l'échantillonnage quand personne ne regarde ; le
+thread se réveille alors immédiatement et reprend par un relevé rapide.
+
+latest() n'attend le thread que quelques intervalles : s'il n'a produit
+aucun échantillon (suspendu avant le premier relevé, thread mort), ou si
+l'échantillonnage est suspendu et le dernier échantillon date de plus de
+INLINE_MAX_AGE, un relevé est fait directement dans l'appelant.
+"""
+
+import os
+import threading
+import time
+
+import psutil
+
+
+def _cpu_total(times):
+    # Sous Linux, guest et guest_nice sont déjà comptés dans user et nice
+    return sum(times) - getattr(times, 'guest', 0) - getattr(times, 'guest_nice', 0)
+
+
+def _call(func, *args):
+    return func(*args)
+
+
+# Attente maximale du thread dans latest(), en intervalles d'échantillonnage
+LATEST_WAIT_INTERVALS = 3
+# Fenêtre d'un relevé fait directement par latest()
+INLINE_WINDOW = 0.1
+# Âge maximal (s) de l'échantillon servi par latest() pendant une suspension
+INLINE_MAX_AGE = 1.0
+
+
+# Périphériques virtuels exclus des débits disques
+VIRTUAL_DISK_PREFIXES = ('loop', 'ram', 'zram')
+# Interfaces exclues du total réseau
+LOOPBACK_INTERFACES = ('lo',)
+
+
+def _rate(before, after, elapsed):
+    # Un compteur qui recule (remise à zéro, débordement) compte pour 0
+    return max(0, after - before) / elapsed
+
+
+def whole_disks(names):
+    """Disques entiers (sans partitions ni périphériques virtuels)"""
+    try:
+        block = set(os.listdir('/sys/block'))
+    except OSError:
+        block = None
+    return [name for name in names
+            if (block is None or name in block) and not name.startswith(VIRTUAL_DISK_PREFIXES)]
+
+
+def net_rates(before, after, elapsed):
+    """Débits par interface (octets/s, paquets/s) entre deux relevés pernic, et leur total"""
+    interfaces = {}
+    for nic, a in after.items():
+        b = before.get(nic)
+        if b is None:
+            continue
+        interfaces[nic] = {
+            'bytes_sent': _rate(b.bytes_sent, a.bytes_sent, elapsed),
+            'bytes_recv': _rate(b.bytes_recv, a.bytes_recv, elapsed),
+            'packets_sent': _rate(b.packets_sent, a.packets_sent, elapsed),
+            'packets_recv': _rate(b.packets_recv, a.packets_recv, elapsed),
+        }
+    total = {key: sum(rates[key] for nic, rates in interfaces.items()
+                      if nic not in LOOPBACK_INTERFACES)
+             for key in ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv')}
+    return {'total': total, 'interfaces': interfaces}
+
+
+def disk_rates(before, after, elapsed):
+    """
+    Débits par disque entre deux relevés perdisk : octets/s, IOPS, await
+    (temps moyen par opération, ms) et occupation (%), et leur total
+    """
+    disks = {}
+    io_time = 0
+    for name in whole_disks(after):
+        a, b = after[name], before.get(name)
+        if b is None:
+            continue
+        reads = max(0, a.read_count - b.read_count)
+        writes = max(0, a.write_count - b.write_count)
+        waited = max(0, a.read_time - b.read_time) + max(0, a.write_time - b.write_time)
+        io_time += waited
+        disks[name] = {
+            'read_bytes': _rate(b.read_bytes, a.read_bytes, elapsed),
+            'write_bytes': _rate(b.write_bytes, a.write_bytes, elapsed),
+            'read_iops': reads / elapsed,
+            'write_iops': writes / elapsed,
+            'await': waited / (reads + writes) if reads + writes else 0.0,
+        }
+        if hasattr(a, 'busy_time'):
+            disks[name]['busy_percent'] = min(100.0, _rate(b.busy_time, a.busy_time, elapsed) / 10)
+    total = {key: sum(rates[key] for rates in disks.values())
+             for key in ('read_bytes', 'write_bytes', 'read_iops', 'write_iops')}
+    ios = (total['read_iops'] + total['write_iops']) * elapsed
+    total['await'] = io_time / ios if ios else 0.0
+    return {'total': total, 'disks': disks}
+
+
+def cpu_busy_percent(before, after):
+    """Pourcentage d'utilisation entre deux relevés de psutil.cpu_times()"""
+    total = _cpu_total(after) - _cpu_total(before)
+    if total <= 0:
+        return 0.0
+    idle = sum(getattr(after, f, 0) - getattr(before, f, 0) for f in ('idle', 'iowait'))
+    return round(max(0.0, min(100.0, (total - idle) / total * 100)), 1)
+
+
+class Sampler:
+    """Thread unique qui tient à jour le dernier échantillon des métriques"""
+
+    def __init__(self, interval=1.0, offload=None):
+        self.interval = interval
+        self._offload = offload or _call
+        self.cpu_count = psutil.cpu_count()
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._listeners = []
+        self._wake = threading.Event()
+
+    def add_listener(self, callback):
+        """`callback(snapshot)` est appelé par le thread après chaque échantillon"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Démarre le thread (sans effet s'il tourne déjà)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+            self._thread.start()
+
+    def set_interval(self, interval):
+        """
+        Nouvel intervalle (None = suspendu). En accélérant, le prochain
+        latest() attend le relevé rapide qui suit au lieu de servir un
+        échantillon ancien.
+        """
+        with self._lock:
+            if interval == self.interval:
+                return
+            if interval is not None and (self.interval is None or interval < self.interval):
+                self._ready.clear()
+            self.interval = interval
+        self._wake.set()
+
+    def latest(self):
+        """
+        Dernier échantillon ; n'attend qu'avant le tout premier relevé (ou
+        après une accélération), au plus LATEST_WAIT_INTERVALS intervalles.
+        Sans aucun échantillon au bout de cette attente, ou pendant une
+        suspension avec un échantillon trop ancien, relevé direct (gardé
+        comme dernier échantillon, sans appeler les listeners).
+        """
+        self.start()
+        interval = self.interval
+        if interval is not None:
+            self._ready.wait(LATEST_WAIT_INTERVALS * interval)
+        with self._lock:
+            snapshot = self._snapshot
+        stale = (interval is None and snapshot is not None
+                 and time.monotonic() - snapshot['monotonic'] > INLINE_MAX_AGE)
+        if snapshot is None or stale:
+            before = self._offload(self._read_counters)
+            time.sleep(INLINE_WINDOW)
+            snapshot = self._measure(before, self._offload(self._read_counters))
+            with self._lock:
+                if self._snapshot is None or self._snapshot['monotonic'] < snapshot['monotonic']:
+                    self._snapshot = snapshot
+        return snapshot
+
+    def io(self):
+        """Débits réseau et disques du dernier échantillon ({'net': ..., 'disk': ...})"""
+        snapshot = self.latest()
+        return {'net': snapshot['net_rates'], 'disk': snapshot['disk_rates']}
+
+    def cpu(self):
+        """Infos CPU au format de get_cpu_info()"""
+        snapshot = self.latest()
+        return {
+            'percent': snapshot['cpu_percent'],
+            'count': self.cpu_count,
+            'freq': snapshot['cpu_freq'],
+            'per_cpu': snapshot['per_cpu'],
+        }
+
+    @staticmethod
+    def _scalar_values(snapshot):
+        """Métriques scalaires de l'échantillon, pour l'historique"""
+        mem = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        net, disk = snapshot['net_rates']['total'], snapshot['disk_rates']['total']
+        values = {
+            'cpu': snapshot['cpu_percent'],
+            'memory': mem.percent,
+            'swap': swap.percent,
+            'net_sent': net['bytes_sent'],
+            'net_recv': net['bytes_recv'],
+            'disk_read': disk['read_bytes'],
+            'disk_write': disk['write_bytes'],
+            'disk_iops': disk['read_iops'] + disk['write_iops'],
+        }
+        try:
+            values['load1'], values['load5'], values['load15'] = psutil.getloadavg()
+        except (AttributeError, OSError):
+            pass
+        return values
+
+    @staticmethod
+    def _read_counters():
+        """Compteurs cumulés (CPU global et par cœur, réseau, disques) et heure monotonic"""
+        return {
+            'cpu': psutil.cpu_times(),
+            'per_cpu': psutil.cpu_times(percpu=True),
+            'net': psutil.net_io_counters(pernic=True),
+            'disk': psutil.disk_io_counters(perdisk=True) or {},
+            'monotonic': time.monotonic(),
+        }
+
+    def _measure(self, before, after):
+        """Échantillon calculé entre deux relevés de _read_counters()"""
+        freq = self._offload(psutil.cpu_freq)
+        elapsed = after['monotonic'] - before['monotonic']
+        snapshot = {
+            'time': time.time(),
+            'monotonic': after['monotonic'],
+            'cpu_percent': cpu_busy_percent(before['cpu'], after['cpu']),
+            'per_cpu': [cpu_busy_percent(b, a)
+                        for b, a in zip(before['per_cpu'], after['per_cpu'])],
+            'cpu_freq': freq.current if freq else 0,
+            'net_rates': net_rates(before['net'], after['net'], elapsed),
+            'disk_rates': disk_rates(before['disk'], after['disk'], elapsed),
+            'counters': after,
+        }
+        snapshot['values'] = self._offload(self._scalar_values, snapshot)
+        return snapshot
+
+    def _run(self):
+        next_tick = None
+        while True:
+            if next_tick is None:
+                # (Re)démarrage : nouvelle référence et relevé rapide pour ne
+                # pas faire attendre le client qui vient d'arriver
+                before = self._offload(self._read_counters)
+                next_tick = time.monotonic() + min(self.interval or 0.1, 0.1)
+            interval = self.interval
+            timeout = None if interval is None else max(0.0, next_tick - time.monotonic())
+            if self._wake.wait(timeout):
+                self._wake.clear()
+                next_tick = None
+                continue
+            next_tick += interval
+            try:
+                after = self._offload(self._read_counters)
+                snapshot = self._measure(before, after)
+                before = after
+            except Exception as e:
+                print(f"Erreur dans l'échantillonneur: {e}")
+                continue
+            with self._lock:
+                self._snapshot = snapshot
+            self._ready.set()
+            for callback in self._listeners:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    print(f"Erreur dans un listener de l'échantillonneur: {e}")
+            # Ne pas rattraper les ticks perdus (machine suspendue, surcharge)
+            if next_tick < time.monotonic():
+                next_tick = time.monotonic() + interval
@@ -0,0 +1,89 @@
+"""
+Cache partagé de l'image complète des métriques
+
+L'image (cpu, mémoire, disques, réseau, load, système) est calculée au plus
+une fois par tick, quel que soit le nombre de clients : tant qu'elle a moins
+de `max_age` secondes, elle est servie depuis la mémoire. Quand elle a
+expiré, un seul appelant la recalcule ; les appels simultanés attendent ce
+calcul au lieu d'en lancer un autre (single-flight).
+
+L'image renvoyée est partagée entre tous les appelants : ne pas la modifier.
+"""
+
+import threading
+import time
+
+
+class _Flight:
+    """Calcul en cours, attendu par les appels simultanés"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SnapshotCache:
+    """Image des métriques recalculée au plus une fois toutes les `max_age` secondes"""
+
+    def __init__(self, compute, max_age=1.0):
+        self.compute = compute
+        self.max_age = max_age
+        self._value = None
+        self._stamp = 0.0
+        self._flight = None
+        self._lock = threading.Lock()
+        self.hits = 0        # servie depuis la mémoire
+        self.waits = 0       # attente d'un calcul déjà en cours
+        self.computes = 0    # recalculs
+        self.errors = 0
+
+    def get(self):
+        """Image courante ; ne la recalcule que si elle a expiré"""
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._stamp < self.max_age:
+                self.hits += 1
+                return self._value
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+            else:
+                self.waits += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        started = time.monotonic()
+        try:
+            flight.value = self.compute()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._flight = None
+                self.errors += 1
+            flight.done.set()
+            raise
+        with self._lock:
+            self._value = flight.value
+            self._stamp = started
+            self._flight = None
+            self.computes += 1
+        flight.done.set()
+        return flight.value
+
+    def stats(self):
+        with self._lock:
+            served = self.hits + self.waits + self.computes
+            return {
+                'max_age': self.max_age,
+                'hits': self.hits,
+                'waits': self.waits,
+                'computes': self.computes,
+                'errors': self.errors,
+                'reuse_ratio': round((self.hits + self.waits) / served, 3) if served else None,
+                'age': round(time.monotonic() - self._stamp, 3) if self._value is not None else None,
+            }
@@ -4,10 +4,13 @@ let cpuHistory = [];
 let memoryHistory = [];
 let networkSentHistory = [];
 let networkRecvHistory = [];
+let latestProcesses = null;
 const maxDataPoints = 30; // 30 secondes d'historique
 
 // WebSocket
 let socket;
+let metricsState = {};   // dernière image complète, mise à jour par les deltas
+let systemStatic = {};   // champs système envoyés une seule fois à la connexion
 
 // Couleurs du thème
 const colors = {
@@ -147,14 +150,14 @@ function initCharts() {
             data: {
                 labels: [],
                 datasets: [{
-                    label: 'Envoyé (MB)',
+                    label: 'Envoyé (KB/s)',
                     data: [],
                     borderColor: colors.success,
                     backgroundColor: colors.successLight,
                     tension: 0.4,
                     fill: true
                 }, {
-                    label: 'Reçu (MB)',
+                    label: 'Reçu (KB/s)',
                     data: [],
                     borderColor: colors.info,
                     backgroundColor: colors.infoLight,
@@ -176,7 +179,7 @@ function initCharts() {
                         beginAtZero: true,
                         ticks: {
                             callback: function(value) {
-                                return value + ' MB';
+                                return value + ' KB/s';
                             }
                         }
                     }
@@ -194,37 +197,27 @@ function updateMetricsFromSocket(data) {
     // Mise à jour du timestamp
     document.getElementById('last-update').textContent = data.timestamp;
     
-    // Mise à jour Load Average
-    updateLoadAverage(data.load);
-    
-    // Mise à jour CPU
-    updateCPU(data.cpu);
-    
-    // Mise à jour Mémoire
-    updateMemory(data.memory);
-    
-    // Mise à jour Disques
-    updateDisks(data.disk);
-    
-    // Mise à jour Réseau
-    updateNetwork(data.network);
-    
-    // Mise à jour Système
-    updateSystem(data.system);
+    // L'abonnement peut ne couvrir qu'une partie des groupes
+    if (data.load) updateLoadAverage(data.load);
+    if (data.cpu) updateCPU(data.cpu);
+    if (data.memory) updateMemory(data.memory);
+    if (data.disk) updateDisks(data.disk);
+    if (data.network) updateNetwork(data.network);
+    if (data.disk_io) updateDiskIO(data.disk_io);
+    if (data.system) updateSystem({...systemStatic, ...data.system});
+    if (data.processes) updateProcesses(data.processes);
+    if (!data.cpu || !data.memory || !data.network) return;
     
     // Mise à jour des graphiques
     const timeLabel = new Date().toLocaleTimeString('fr-FR');
     cpuHistory.push(data.cpu.percent);
     memoryHistory.push(data.memory.percent);
-    networkSentHistory.push(data.network.bytes_sent);
-    networkRecvHistory.push(data.network.bytes_recv);
+    networkSentHistory.push(data.network.sent_rate);
+    networkRecvHistory.push(data.network.recv_rate);
     
-    if (cpuHistory.length > maxDataPoints) {
-        cpuHistory.shift();
-        memoryHistory.shift();
-        networkSentHistory.shift();
-        networkRecvHistory.shift();
-    }
+    [cpuHistory, memoryHistory, networkSentHistory, networkRecvHistory].forEach(history => {
+        while (history.length > maxDataPoints) history.shift();
+    });
     
     // CPU Chart
     if (cpuChart) {
@@ -334,11 +327,24 @@ function updateDisks(disks) {
     tbody.innerHTML = '';
     
     disks.forEach(disk => {
-        const color = disk.percent > 80 ? 'danger' : disk.percent > 50 ? 'warning' : 'success';
+        // Montage qui ne répond pas : dernières valeurs connues, signalées par un badge
+        const staleBadge = disk.stale ? ' <span class="badge bg-warning text-dark">ne répond pas</span>' : '';
+        if (disk.percent === null) {
+            tbody.innerHTML += `
+                <tr>
+                    <td><strong>${disk.device}</strong></td>
+                    <td>${disk.mountpoint}${staleBadge}</td>
+                    <td><span class="badge bg-secondary">${disk.fstype}</span></td>
+                    <td colspan="4" class="text-muted">--</td>
+                </tr>
+            `;
+            return;
+        }
+        const color = disk.stale ? 'secondary' : disk.percent > 80 ? 'danger' : disk.percent > 50 ? 'warning' : 'success';
         tbody.innerHTML += `
             <tr>
                 <td><strong>${disk.device}</strong></td>
-                <td>${disk.mountpoint}</td>
+                <td>${disk.mountpoint}${staleBadge}</td>
                 <td><span class="badge bg-secondary">${disk.fstype}</span></td>
                 <td>${disk.total.toFixed(2)} GB</td>
                 <td>${disk.used.toFixed(2)} GB</td>
@@ -356,12 +362,53 @@ function updateDisks(disks) {
     });
 }
 
+// Mise à jour Processus (tri choisi dans le sélecteur)
+function updateProcesses(processes) {
+    latestProcesses = processes;
+    const sort = document.getElementById('process-sort').value;
+    const tbody = document.getElementById('process-table-body');
+    document.getElementById('process-total').textContent = `(${processes.total} processus)`;
+    tbody.innerHTML = '';
+    
+    (processes[sort] || []).forEach(proc => {
+        const color = proc.cpu_percent > 80 ? 'danger' : proc.cpu_percent > 30 ? 'warning' : 'secondary';
+        tbody.innerHTML += `
+            <tr>
+                <td>${proc.pid}</td>
+                <td><strong>${proc.name}</strong></td>
+                <td>${proc.username || '--'}</td>
+                <td><span class="badge bg-${color}">${proc.cpu_percent.toFixed(1)}%</span></td>
+                <td>${proc.rss.toFixed(1)} MB</td>
+                <td>${proc.io_read.toFixed(2)} MB/s</td>
+                <td>${proc.io_write.toFixed(2)} MB/s</td>
+            </tr>
+        `;
+    });
+}
+
+// Débit en KB/s, affiché en MB/s au-delà de 1 MB/s
+function formatRate(kb) {
+    return kb >= 1024 ? (kb / 1024).toFixed(2) + ' MB/s' : kb.toFixed(1) + ' KB/s';
+}
+
 // Mise à jour Réseau
 function updateNetwork(network) {
     document.getElementById('net-sent').textContent = network.bytes_sent.toFixed(2) + ' MB';
     document.getElementById('net-recv').textContent = network.bytes_recv.toFixed(2) + ' MB';
     document.getElementById('packets-sent').textContent = network.packets_sent.toLocaleString();
     document.getElementById('packets-recv').textContent = network.packets_recv.toLocaleString();
+    document.getElementById('net-sent-rate').textContent = formatRate(network.sent_rate);
+    document.getElementById('net-recv-rate').textContent = formatRate(network.recv_rate);
+    document.getElementById('packets-sent-rate').textContent = Math.round(network.packets_sent_rate).toLocaleString();
+    document.getElementById('packets-recv-rate').textContent = Math.round(network.packets_recv_rate).toLocaleString();
+}
+
+// Mise à jour I/O disques (débits calculés par le serveur)
+function updateDiskIO(diskIo) {
+    document.getElementById('disk-read-rate').textContent = formatRate(diskIo.read_rate);
+    document.getElementById('disk-write-rate').textContent = formatRate(diskIo.write_rate);
+    document.getElementById('disk-iops').textContent = Math.round(diskIo.read_iops + diskIo.write_iops).toLocaleString();
+    document.getElementById('disk-await').textContent = diskIo.await.toFixed(1) + ' ms';
 }
 
 // Mise à jour Système
@@ -393,6 +440,65 @@ function updateConnectionStatus(connected) {
     }
 }
 
+// Historique conservé par le serveur: les graphiques ne repartent pas de zéro au rechargement
+async function loadHistory() {
+    const params = `from=${Date.now() / 1000 - maxDataPoints * 2}&step=2`;
+    const seed = async (metric, history, chart, dataset = 0, scale = 1) => {
+        const response = await fetch(`/api/history?metric=${metric}&${params}`);
+        if (!response.ok || !chart) return;
+        const data = await response.json();
+        history.push(...data.avg.slice(-maxDataPoints).map(value => value * scale));
+        chart.data.labels = data.t.slice(-maxDataPoints).map(t => new Date(t * 1000).toLocaleTimeString('fr-FR'));
+        chart.data.datasets[dataset].data = history;
+        chart.update('none');
+    };
+    try {
+        // Débits réseau stockés en octets/s, affichés en KB/s
+        await Promise.all([
+            seed('cpu', cpuHistory, cpuChart),
+            seed('memory', memoryHistory, memoryChart),
+            seed('net_sent', networkSentHistory, networkChart, 0, 1 / 1024),
+            seed('net_recv', networkRecvHistory, networkChart, 1, 1 / 1024),
+        ]);
+    } catch (error) {
+        console.error("Erreur lors du chargement de l'historique:", error);
+    }
+}
+
+// Applique un delta : les objets sont fusionnés récursivement, le reste remplacé,
+// les clés listées dans `_removed` (interface ou disque disparu) supprimées
+function mergeDelta(target, delta) {
+    Object.entries(delta).forEach(([key, value]) => {
+        if (key === '_removed') {
+            value.forEach(removed => delete target[removed]);
+        } else if (value && typeof value === 'object' && !Array.isArray(value)
+                && target[key] && typeof target[key] === 'object' && !Array.isArray(target[key])) {
+            mergeDelta(target[key], value);
+        } else {
+            target[key] = value;
+        }
+    });
+    return target;
+}
+
+// Décode un message (JSON ou msgpack selon l'abonnement)
+function decodePayload(payload) {
+    if (payload instanceof ArrayBuffer || ArrayBuffer.isView(payload)) {
+        return MessagePack.decode(payload);
+    }
+    return payload;
+}
+
+// Abonnement demandé dans l'URL : ?groups=cpu,memory&interval=5&encoding=msgpack
+function subscriptionFromUrl() {
+    const params = new URLSearchParams(window.location.search);
+    const subscription = {};
+    if (params.get('groups')) subscription.groups = params.get('groups').split(',');
+    if (params.get('interval')) subscription.interval = Number(params.get('interval'));
+    if (params.get('encoding') && window.MessagePack) subscription.encoding = params.get('encoding');
+    return subscription;
+}
+
 // Initialisation WebSocket
 function initWebSocket() {
     console.log('Initialisation de la connexion WebSocket...');
@@ -401,6 +507,8 @@ function initWebSocket() {
     socket.on('connect', function() {
         console.log('WebSocket connecté!');
         updateConnectionStatus(true);
+        const subscription = subscriptionFromUrl();
+        if (Object.keys(subscription).length) socket.emit('subscribe', subscription);
     });
     
     socket.on('disconnect', function() {
@@ -408,9 +516,22 @@ function initWebSocket() {
         updateConnectionStatus(false);
     });
     
-    socket.on('metrics_update', function(data) {
-        console.log('Métriques reçues via WebSocket');
-        updateMetricsFromSocket(data);
+    socket.on('system_info', function(data) {
+        systemStatic = data;
+    });
+    
+    socket.on('subscribed', function(data) {
+        console.log('Abonnement:', data);
+    });
+    
+    socket.on('metrics_full', function(payload) {
+        metricsState = decodePayload(payload);
+        updateMetricsFromSocket(metricsState);
+    });
+    
+    socket.on('metrics_delta', function(payload) {
+        mergeDelta(metricsState, decodePayload(payload));
+        updateMetricsFromSocket(metricsState);
     });
     
     socket.on('connect_error', function(error) {
@@ -423,5 +544,8 @@ function initWebSocket() {
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Initialisation du dashboard...');
     initCharts();
-    initWebSocket();
+    loadHistory().then(initWebSocket);
+    document.getElementById('process-sort').addEventListener('change', () => {
+        if (latestProcesses) updateProcesses(latestProcesses);
+    });
 });